@@ -1,32 +1,80 @@
-from sklearn.neighbors import NearestNeighbors
+import os
+import sys
+import time
+from threading import Thread
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from transformers import AutoModelForCausalLM, AutoModelForSeq2SeqLM,  AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoModelForSeq2SeqLM,  AutoTokenizer, TextIteratorStreamer
+from vector_index import create_index, recall_at_k
+from streaming_ingest import create_embeddings_streaming
 
-def load_data_from_file(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        documents = [line.strip() for line in f if line.strip()]
-    return documents
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from embedding_cache import EmbeddingCache
+from embedding_service import get_embedding_service
 
-def create_embeddings(documents, model):
-    embeddings = model.encode(documents, convert_to_tensor=True)
-    return np.array(embeddings)
+# The retriever model (all-MiniLM-L6-v2) runs on the shared embedding service: "onnx" (onnxruntime,
+# the same runtime as ChromaDB) or "torch" (sentence-transformers). EMBEDDING_QUANTIZE uses int8 weights
+EMBEDDING_BACKEND = "onnx"
+EMBEDDING_QUANTIZE = False
+# Embeddings of the knowledge base are cached here, so only new or changed lines are encoded on restart
+EMBEDDING_CACHE_DIR = "./embedding_cache"
+# Number of lines encoded per batch while streaming the knowledge base file
+ENCODE_BATCH_SIZE = 1024
+# Set to a .npy path to keep the embedding matrix memory-mapped on disk instead of in RAM
+EMBEDDINGS_FILE = None
 
-def build_index(embeddings):
-    index = NearestNeighbors(n_neighbors=5, metric='euclidean')  # or 'cosine'
+# Index backend used for retrieval: "exact" (brute force), "ivf" (approximate, faster on large corpora),
+# "int8" or "binary" (quantized codes in RAM, rescored against the full-precision embeddings)
+INDEX_BACKEND = "exact"
+# Backend specific parameters, e.g. {"nlist": 1024, "nprobe": 16} for "ivf" or {"rescore_factor": 20} for "binary"
+INDEX_PARAMS = {}
+
+def build_index(embeddings, backend="exact", **params):
+    index = create_index(backend, **params)
     index.fit(embeddings)
     return index
 
+def report_recall(index, embeddings, k=5, sample_size=1000):
+    """Print recall@k of an approximate index against the exact brute-force index."""
+    k = min(k, len(embeddings))
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(embeddings), size=min(sample_size, len(embeddings)), replace=False)
+    exact_index = build_index(embeddings, backend="exact")
+    recall = recall_at_k(index, exact_index, embeddings[sample], k=k)
+    print(f"Recall@{k} of '{index.backend}' index against exact search: {recall:.3f}")
+
 def retrieve_documents(query, model, index, documents, k=1):
     query_embedding = model.encode([query], convert_to_tensor=False)
     distances, indices = index.kneighbors(query_embedding, n_neighbors=k)
     print(f"Distances: {distances}, Indices: {indices}")
     return [documents[idx] for idx in indices[0]]
 
-def generate_answer_stream(query, retrieved_docs, tokenizer, model):
+class TimedTextIteratorStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer that also records when the first generated token arrives and how many tokens are generated."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.first_token_time = None
+        self.token_count = 0
+
+    def put(self, value):
+        if not (self.skip_prompt and self.next_tokens_are_prompt):
+            if self.first_token_time is None:
+                self.first_token_time = time.perf_counter()
+            self.token_count += value.numel()
+        super().put(value)
+
+def generate_answer_stream(query, retrieved_docs, tokenizer, model, stats=None, max_new_tokens=150):
     """
-    Generate answer using streaming tokens (generator).
-    Only works with models that support `generate` with `return_dict_in_generate=True` and `output_scores=True`.
+    Generate an answer and yield it piece by piece while the model is still generating.
+
+    Generation runs in a background thread. A TextIteratorStreamer detokenizes the
+    output incrementally, so each yielded piece is complete text (whole words)
+    instead of single subword tokens.
+
+    If a `stats` dict is given, it is filled with generation metrics once the
+    stream is exhausted: time_to_first_token (s), total_time (s),
+    generated_tokens and tokens_per_second.
     """
     import torch
 
@@ -34,52 +82,73 @@ def generate_answer_stream(query, retrieved_docs, tokenizer, model):
     prompt = f"Context: {context}\nAnswer with facts from the context. Here is the question: {query}\nAnswer: "
     inputs = tokenizer(prompt, return_tensors="pt", truncation=True)
 
-    # Stream tokens one by one
-    streamer = None
-    try:
-        from transformers import TextStreamer
-        streamer = TextStreamer(tokenizer)
-    except ImportError:
-        pass  # Fallback to manual decoding if TextStreamer is not available
-
-    # Generate response with streaming
-    output_ids = []
-    for output in model.generate(
-        inputs.input_ids,
-        attention_mask=inputs.attention_mask,
-        max_length=150,
-        num_return_sequences=1,
-        do_sample=False,
-        return_dict_in_generate=True,
-        output_scores=True,
-    ).sequences[0]:
-        output_ids.append(output.item())
-        if streamer:
-            streamer.put(torch.tensor([output]))
-        else:
-            yield tokenizer.decode([output], skip_special_tokens=True)
-
-    if streamer:
-        streamer.end()
+    # skip_prompt drops the prompt (or the decoder start token for seq2seq models) from the output
+    streamer = TimedTextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+    errors = []
+
+    def generate():
+        try:
+            with torch.no_grad():
+                model.generate(
+                    inputs.input_ids,
+                    attention_mask=inputs.attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    num_return_sequences=1,
+                    do_sample=False,
+                    streamer=streamer,
+                )
+        except Exception as e:
+            # Unblock the consumer loop below and re-raise the error there
+            errors.append(e)
+            streamer.end()
+
+    start_time = time.perf_counter()
+    generation_thread = Thread(target=generate, daemon=True)
+    generation_thread.start()
+
+    for text in streamer:
+        if text:
+            yield text
+
+    generation_thread.join()
+    if errors:
+        raise errors[0]
+    total_time = time.perf_counter() - start_time
+
+    if stats is not None:
+        first_token_time = streamer.first_token_time or time.perf_counter()
+        stats["time_to_first_token"] = first_token_time - start_time
+        stats["total_time"] = total_time
+        stats["generated_tokens"] = streamer.token_count
+        stats["tokens_per_second"] = streamer.token_count / total_time if total_time > 0 else 0.0
 
 def main():
-    # Load data
+    print("Loading retriever model...")
+    retriever_model = get_embedding_service(backend=EMBEDDING_BACKEND, quantize=EMBEDDING_QUANTIZE)
+    embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, retriever_model.model_id)
+
+    # Stream the data file and create embeddings batch by batch, then build the index
     print("Loading data...")
     data_file = "./data.txt"
-    documents = load_data_from_file(data_file)
+    documents, embeddings = create_embeddings_streaming(
+        data_file,
+        retriever_model,
+        batch_size=ENCODE_BATCH_SIZE,
+        output_path=EMBEDDINGS_FILE,
+        cache=embedding_cache,
+    )
     print(f"Loaded {len(documents)} documents.")
-    if not documents:
+    print(f"Embedding cache: {embedding_cache.stats()}")
+    if not len(documents):
         print("No documents found in the file.")
         return
-    
-    print("Loading retriever model...")
-    retriever_model = SentenceTransformer('all-MiniLM-L6-v2')
 
-    # Create embeddings and index
-    embeddings = create_embeddings(documents, retriever_model)
-    index = build_index(embeddings)    
+    index = build_index(embeddings, backend=INDEX_BACKEND, **INDEX_PARAMS)
     #print (embeddings.shape)    
-    print("Index built successfully.")
+    print(f"Index built successfully ({INDEX_BACKEND}).")
+    if INDEX_BACKEND != "exact":
+        report_recall(index, embeddings)
     
     model_name = "google/flan-t5-base"
     
@@ -101,9 +170,15 @@ def main():
     #answer = generate_answer_stdalone(query, tokenizer, gen_model)
     #answer = generate_answer(query, retrieved_docs, tokenizer, gen_model)
     print("Streaming Answer:", end=" ", flush=True)
-    for token in generate_answer_stream(query, retrieved_docs, tokenizer, gen_model):
-        print(token, end="", flush=True)
+    generation_stats = {}
+    for text in generate_answer_stream(query, retrieved_docs, tokenizer, gen_model, stats=generation_stats):
+        print(text, end="", flush=True)
     print()
+    print(
+        f"Time to first token: {generation_stats['time_to_first_token']:.3f}s, "
+        f"{generation_stats['generated_tokens']} tokens in {generation_stats['total_time']:.2f}s "
+        f"({generation_stats['tokens_per_second']:.1f} tokens/s)"
+    )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Streaming, bounded-memory ingest for the local RAG retriever.
+
+The knowledge base file is read line by line and encoded in fixed-size batches.
+Each batch of embeddings is written straight into a preallocated matrix (in
+memory, or a memory-mapped .npy file on disk), so peak memory depends on the
+batch size and not on the size of the corpus.
+
+The document texts themselves are not kept in memory either: `LineDocuments`
+only stores the byte offset of every line and reads a line from the file when
+it is accessed.
+"""
+
+from array import array
+from itertools import islice
+
+import numpy as np
+
+
+def iter_documents(file_path):
+    """Yield the non-empty, stripped lines of a text file one at a time."""
+    # newline="\n" splits lines exactly where LineDocuments does
+    with open(file_path, "r", encoding="utf-8", newline="\n") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_batches(iterable, batch_size):
+    """Yield lists of up to `batch_size` items from `iterable`."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class LineDocuments:
+    """
+    Read-only, list-like access to the non-empty lines of a text file.
+
+    Only the byte offset of each line is kept in memory (8 bytes per line),
+    the text is read from the file on access.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        offsets = array("q")
+        position = 0
+        with open(file_path, "rb") as f:
+            for line in f:
+                # Same emptiness test as iter_documents, so both see the same lines
+                if line.decode("utf-8").strip():
+                    offsets.append(position)
+                position += len(line)
+        self._offsets = np.frombuffer(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        with open(self.file_path, "rb") as f:
+            f.seek(self._offsets[index])
+            return f.readline().decode("utf-8").strip()
+
+    def __iter__(self):
+        return iter_documents(self.file_path)
+
+
+def create_embeddings_streaming(file_path, model, batch_size=1024, output_path=None, cache=None):
+    """
+    Encode every line of `file_path` in batches into a preallocated embedding matrix.
+
+    Args:
+        file_path (str): Knowledge base file with one document per line.
+        model: EmbeddingService (or SentenceTransformer) used to encode the documents.
+        batch_size (int): Number of lines encoded per `model.encode` call.
+        output_path (str, optional): Write the embeddings to this .npy file as a
+            memory-mapped array instead of keeping them in RAM.
+        cache (EmbeddingCache, optional): Skip encoding lines whose embeddings are cached.
+
+    Returns:
+        tuple: (documents, embeddings)
+            - documents: LineDocuments giving access to the text of each line.
+            - embeddings: float32 array of shape (len(documents), dim).
+    """
+    documents = LineDocuments(file_path)
+    shape = (len(documents), model.get_sentence_embedding_dimension())
+    if output_path:
+        embeddings = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=shape)
+    else:
+        embeddings = np.empty(shape, dtype=np.float32)
+
+    def encode(texts):
+        # convert_to_numpy returns a float32 NumPy array directly, without an intermediate tensor
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+    batches = iter_batches(iter_documents(file_path), batch_size)
+    if cache is not None:
+        batch_embeddings = cache.encode_stream(batches, encode)
+    else:
+        batch_embeddings = (encode(batch) for batch in batches)
+
+    start = 0
+    for vectors in batch_embeddings:
+        embeddings[start:start + len(vectors)] = vectors
+        start += len(vectors)
+        print(f"\rEncoded {start}/{len(documents)} documents", end="", flush=True)
+    print()
+
+    if output_path:
+        embeddings.flush()
+    return documents, embeddings
@@ -0,0 +1,265 @@
+"""
+Vector index backends for the local RAG retriever.
+
+Every backend exposes the same `kneighbors(X, n_neighbors)` method as sklearn's
+NearestNeighbors, so `retrieve_documents` in rag-hello-world.py works with any
+of them:
+
+  - "exact": brute-force search with sklearn NearestNeighbors. Always returns the
+    true nearest neighbours and is used as the reference when measuring recall.
+  - "ivf": inverted-file approximate nearest neighbour (ANN) index. The vectors
+    are clustered with k-means into `nlist` lists and a query only scans the
+    `nprobe` lists whose centroids are closest to it. A higher `nprobe` gives
+    better recall, a lower one gives faster queries.
+  - "int8" / "binary": quantized codes in RAM (1 byte per dimension or 1 bit per
+    dimension) with exact rescoring of a shortlist against the full-precision
+    vectors, which may stay memory-mapped on disk (see common/quantized_store.py).
+
+Indexes can be saved to and loaded from a single .npz file.
+"""
+
+import os
+import sys
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.neighbors import NearestNeighbors
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from quantized_store import QuantizedVectorStore
+
+
+class ExactIndex:
+    """Brute-force euclidean nearest neighbour search (the reference backend)."""
+
+    backend = "exact"
+
+    def __init__(self, metric="euclidean"):
+        self.metric = metric
+        self._embeddings = None
+        self._nn = None
+
+    def fit(self, embeddings):
+        self._embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._nn = NearestNeighbors(metric=self.metric, algorithm="brute")
+        self._nn.fit(self._embeddings)
+        return self
+
+    def kneighbors(self, X, n_neighbors=1):
+        return self._nn.kneighbors(np.asarray(X, dtype=np.float32), n_neighbors=n_neighbors)
+
+    def save(self, path):
+        np.savez(path, backend=self.backend, metric=self.metric, embeddings=self._embeddings)
+
+    @classmethod
+    def _from_arrays(cls, data):
+        return cls(metric=str(data["metric"])).fit(data["embeddings"])
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index with euclidean distance.
+
+    Args:
+        nlist (int, optional): Number of k-means clusters. Defaults to about 4 * sqrt(N).
+        nprobe (int): Number of closest clusters scanned per query (recall/speed knob).
+        random_state (int): Seed for the k-means clustering.
+    """
+
+    backend = "ivf"
+
+    def __init__(self, nlist=None, nprobe=8, random_state=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.random_state = random_state
+        self._centroids = None
+        self._vectors = None    # vectors sorted by list, so each list is a contiguous slice
+        self._ids = None        # original row number of each sorted vector
+        self._offsets = None    # list i occupies rows _offsets[i]:_offsets[i + 1]
+
+    def fit(self, embeddings):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n = len(embeddings)
+        nlist = self.nlist or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        kmeans = MiniBatchKMeans(
+            n_clusters=nlist,
+            batch_size=max(1024, 3 * nlist),
+            n_init=3,
+            random_state=self.random_state,
+        )
+        assignments = kmeans.fit_predict(embeddings)
+
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        self._set_arrays(
+            centroids=kmeans.cluster_centers_.astype(np.float32),
+            vectors=embeddings[order],
+            ids=order.astype(np.int64),
+            offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        )
+        self.nlist = nlist
+        return self
+
+    def _set_arrays(self, centroids, vectors, ids, offsets):
+        self._centroids = centroids
+        self._vectors = vectors
+        self._ids = ids
+        self._offsets = offsets
+        self._vector_sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+
+    def kneighbors(self, X, n_neighbors=1):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        if n_neighbors > len(self._vectors):
+            raise ValueError(f"n_neighbors={n_neighbors} is larger than the index ({len(self._vectors)} vectors)")
+
+        centroid_distances = _squared_euclidean(X, self._centroids)
+        all_distances = np.empty((len(X), n_neighbors), dtype=np.float32)
+        all_indices = np.empty((len(X), n_neighbors), dtype=np.int64)
+
+        for row, query in enumerate(X):
+            rows = self._candidate_rows(centroid_distances[row], n_neighbors)
+            candidates = self._vectors[rows]
+            # |q - v|^2 = |v|^2 - 2 q.v + |q|^2
+            distances = self._vector_sq_norms[rows] - 2.0 * (candidates @ query) + query @ query
+
+            top = np.argpartition(distances, n_neighbors - 1)[:n_neighbors]
+            top = top[np.argsort(distances[top])]
+            all_distances[row] = np.sqrt(np.maximum(distances[top], 0.0))
+            all_indices[row] = self._ids[rows[top]]
+
+        return all_distances, all_indices
+
+    def _candidate_rows(self, centroid_distances, n_neighbors):
+        # Probe the closest lists first and keep going past nprobe only when the
+        # probed lists hold fewer than n_neighbors vectors in total
+        probe_order = np.argsort(centroid_distances)
+        slices = []
+        found = 0
+        for probed, list_id in enumerate(probe_order):
+            if probed >= self.nprobe and found >= n_neighbors:
+                break
+            start, end = self._offsets[list_id], self._offsets[list_id + 1]
+            if end > start:
+                slices.append(np.arange(start, end))
+                found += end - start
+        return np.concatenate(slices)
+
+    def save(self, path):
+        np.savez(
+            path,
+            backend=self.backend,
+            nlist=self.nlist,
+            nprobe=self.nprobe,
+            random_state=self.random_state,
+            centroids=self._centroids,
+            vectors=self._vectors,
+            ids=self._ids,
+            offsets=self._offsets,
+        )
+
+    @classmethod
+    def _from_arrays(cls, data):
+        index = cls(nlist=int(data["nlist"]), nprobe=int(data["nprobe"]), random_state=int(data["random_state"]))
+        index._set_arrays(data["centroids"], data["vectors"], data["ids"], data["offsets"])
+        return index
+
+
+class QuantizedIndex:
+    """
+    Quantized euclidean search with full-precision rescoring.
+
+    Only the codes are held in RAM. The embeddings passed to `fit` are kept by
+    reference, so a memory-mapped matrix (EMBEDDINGS_FILE) is read from disk
+    only for the shortlisted candidates.
+
+    Args:
+        rescore_factor (int): Candidates rescored per query, as a multiple of n_neighbors.
+    """
+
+    backend = None  # Set by the subclasses
+
+    def __init__(self, rescore_factor=10):
+        self.rescore_factor = rescore_factor
+        self._store = QuantizedVectorStore(self.backend, metric="euclidean", rescore_factor=rescore_factor)
+
+    def fit(self, embeddings):
+        if not isinstance(embeddings, np.memmap):
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._store.fit(embeddings)
+        return self
+
+    def kneighbors(self, X, n_neighbors=1):
+        if n_neighbors > len(self._store):
+            raise ValueError(f"n_neighbors={n_neighbors} is larger than the index ({len(self._store)} vectors)")
+        squared, indices = self._store.search(X, k=n_neighbors)
+        return np.sqrt(np.maximum(squared, 0.0)), indices
+
+    def save(self, path):
+        # A memory-mapped matrix is referenced by its file name instead of being copied
+        vectors = self._store.vectors
+        source = {"vectors_file": vectors.filename} if isinstance(vectors, np.memmap) else {"vectors": vectors}
+        np.savez(path, backend=self.backend, rescore_factor=self.rescore_factor, **source)
+
+    @classmethod
+    def _from_arrays(cls, data):
+        if "vectors_file" in data:
+            vectors = np.load(str(data["vectors_file"]), mmap_mode="r")
+        else:
+            vectors = data["vectors"]
+        return cls(rescore_factor=int(data["rescore_factor"])).fit(vectors)
+
+
+class Int8Index(QuantizedIndex):
+    """Scalar quantization to one byte per dimension (4x less RAM than float32)."""
+
+    backend = "int8"
+
+
+class BinaryIndex(QuantizedIndex):
+    """One sign bit per dimension searched by Hamming distance (32x less RAM than float32)."""
+
+    backend = "binary"
+
+
+INDEX_BACKENDS = {
+    ExactIndex.backend: ExactIndex,
+    IVFIndex.backend: IVFIndex,
+    Int8Index.backend: Int8Index,
+    BinaryIndex.backend: BinaryIndex,
+}
+
+
+def create_index(backend="exact", **params):
+    """Create an unfitted index for the given backend name ("exact", "ivf", "int8" or "binary")."""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}'. Choose one of: {', '.join(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[backend](**params)
+
+
+def load_index(path):
+    """Load an index previously written with `index.save(path)`."""
+    with np.load(path) as data:
+        backend = str(data["backend"])
+        return INDEX_BACKENDS[backend]._from_arrays(data)
+
+
+def recall_at_k(index, reference_index, queries, k=10):
+    """
+    Fraction of the true k nearest neighbours (from `reference_index`) that
+    `index` also returns, averaged over all queries.
+    """
+    _, found = index.kneighbors(queries, n_neighbors=k)
+    _, expected = reference_index.kneighbors(queries, n_neighbors=k)
+    hits = sum(len(np.intersect1d(f, e)) for f, e in zip(found, expected))
+    return hits / (len(expected) * k)
+
+
+def _squared_euclidean(A, B):
+    return (
+        np.einsum("ij,ij->i", A, A)[:, None]
+        - 2.0 * (A @ B.T)
+        + np.einsum("ij,ij->i", B, B)[None, :]
+    )
@@ -1,23 +1,24 @@
+import argparse
 import os
-import numpy as np
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
-
-# Initialize environment variable for Gemini API key
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set. Please set it.")
-
-# Configure Gemini API
-print("Configuring Gemini API...")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash-lite')
-print("Gemini API configured.")
-
-# Initialize sentence transformer for embeddings
-print("Loading sentence transformer model...")
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
-print("Sentence transformer model loaded.")
+import sys
+from retrieval_engine import RetrievalEngine
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from embedding_cache import EmbeddingCache
+from embedding_service import get_embedding_service
+from tracing import EXPORTERS, configure_tracing, get_tracer
+
+# all-MiniLM-L6-v2 runs on the shared embedding service: "onnx" (onnxruntime, the same runtime as
+# ChromaDB in the later demos) or "torch" (sentence-transformers). EMBEDDING_QUANTIZE uses int8 weights
+EMBEDDING_BACKEND = "onnx"
+EMBEDDING_QUANTIZE = False
+GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
+# Knowledge base embeddings are cached here, so only new or changed entries are encoded on restart
+EMBEDDING_CACHE_DIR = "./embedding_cache"
+# None keeps float32 embeddings in RAM. "int8" (4x smaller) or "binary" (32x smaller) keep quantized
+# codes instead and rescore the best candidates exactly, for knowledge bases with millions of entries
+QUANTIZATION = None
 
 # Sample knowledge base (in-memory list; could be loaded from a file)
 knowledge_base = [
@@ -25,54 +26,126 @@ knowledge_base = [
     "Maxines's 7-year-old favorite food is Hesburger.",
     "Finnish Hornet crashed as part of an aerobatic display in May 2025."
 ]
-print(f"Knowledge base loaded with {len(knowledge_base)} entries.")
 
-# Compute embeddings for the knowledge base
-print("Computing knowledge base embeddings...")
-knowledge_embeddings = embedder.encode(knowledge_base)
-print("Embeddings computed.")
+# The Gemini model, the embedding model and the retrieval engine are created on first use,
+# so importing this module is fast and does not need an API key
+_model = None
+_embedder = None
+_retrieval_engine = None
 
-# Compute cosine similarity
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-# Retrieve relevant context
-def retrieve_context(query, top_k=2):
-    print(f"Retrieving top {top_k} context entries for query...")
-    query_embedding = embedder.encode([query])[0]
-    similarities = [cosine_similarity(query_embedding, emb) for emb in knowledge_embeddings] 
+def get_model():
+    """Configure the Gemini API on first use and return the generative model."""
+    global _model
+    if _model is None:
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set. Please set it.")
+        import google.generativeai as genai
+
+        print("Configuring Gemini API...")
+        genai.configure(api_key=gemini_api_key)
+        _model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        print("Gemini API configured.")
+    return _model
+
+
+def get_embedder():
+    """Load the embedding model on first use."""
+    global _embedder
+    if _embedder is None:
+        print(f"Loading embedding model ({EMBEDDING_BACKEND} backend)...")
+        _embedder = get_embedding_service(backend=EMBEDDING_BACKEND, quantize=EMBEDDING_QUANTIZE)
+        print("Embedding model loaded.")
+    return _embedder
+
 
-    embeddingSimilarities = list(zip(similarities, knowledge_base))
+def get_retrieval_engine():
+    """Embed the knowledge base on first use and return the engine that searches it."""
+    global _retrieval_engine
+    if _retrieval_engine is None:
+        print(f"Knowledge base loaded with {len(knowledge_base)} entries.")
+        print("Computing knowledge base embeddings...")
+        embedder = get_embedder()
+        embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, embedder.model_id)
+        knowledge_embeddings = embedding_cache.encode(knowledge_base, embedder.encode)
+        print(f"Embedding cache: {embedding_cache.stats()}")
+        # The engine keeps a normalized float32 copy of the embeddings (or quantized codes) for fast cosine search
+        _retrieval_engine = RetrievalEngine(knowledge_embeddings, quantization=QUANTIZATION)
+        print("Embeddings computed.")
+    return _retrieval_engine
 
-    print("Similarity scores:")
-    for a in embeddingSimilarities:
-        print(f"{a[0]}, {a[1]}") 
+# Retrieve relevant context for many queries at once
+def retrieve_contexts(queries, top_k=2, show_scores=False):
+    retrieval_engine = get_retrieval_engine()
+    tracer = get_tracer()
+    with tracer.span("embed_query", queries=len(queries)):
+        query_embeddings = get_embedder().encode(queries)
+    with tracer.span("vector_search", top_k=top_k):
+        _, indices = retrieval_engine.search(query_embeddings, top_k=top_k)
 
-    top_indices = np.argsort(similarities)[::-1][:top_k]
-    context = [knowledge_base[i] for i in top_indices]
-    
-    print(f"Retrieved context:\n  " + "\n  ".join(context))
-    return "\n".join(context)
+    if show_scores:
+        # Full per-entry score dump, only useful for small knowledge bases
+        all_scores = retrieval_engine.scores(query_embeddings)
+        for query, query_scores in zip(queries, all_scores):
+            print(f"Similarity scores for: {query}")
+            for score, entry in zip(query_scores, knowledge_base):
+                print(f"{score}, {entry}")
+
+    return ["\n".join(knowledge_base[i] for i in row) for row in indices]
+
+# Retrieve relevant context
+def retrieve_context(query, top_k=2, show_scores=False):
+    print(f"Retrieving top {top_k} context entries for query...")
+    context = retrieve_contexts([query], top_k=top_k, show_scores=show_scores)[0]
+    print(f"Retrieved context:\n  " + context.replace("\n", "\n  "))
+    return context
 
 # Query Gemini API
 def query_gemini(prompt):
     print("Sending prompt to Gemini API...")
-    response = model.generate_content(prompt)
+    with get_tracer().span("llm", model=GEMINI_MODEL_NAME) as span:
+        # Streamed, so the trace shows the time to the first token
+        response = get_model().generate_content(prompt, stream=True)
+        for _ in response:
+            span.first_token()
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            span.set(prompt_tokens=usage.prompt_token_count, completion_tokens=usage.candidates_token_count)
     print("Response received from Gemini API.")
     return response.text.strip()
 
 # Main RAG function
-def rag_query(question):
+def rag_query(question, top_k=2, show_scores=False):
     print(f"\nQuestion: {question}")
-    # Retrieve context
-    context = retrieve_context(question)
-    # Create prompt for Gemini
-    prompt = f"Context: {context}\n\nQuestion: {question}\nAnswer:"
-    # Get response from Gemini
-    answer = query_gemini(prompt)
+    tracer = get_tracer()
+    # Each stage is a span of the trace, see common/tracing.py
+    with tracer.span("rag_query", top_k=top_k):
+        # Retrieve context
+        context = retrieve_context(question, top_k=top_k, show_scores=show_scores)
+        # Create prompt for Gemini
+        with tracer.span("prompt_assembly") as span:
+            prompt = f"Context: {context}\n\nQuestion: {question}\nAnswer:"
+            span.set(prompt_chars=len(prompt))
+        # Get response from Gemini
+        answer = query_gemini(prompt)
     return answer
 
-# Example query
-question = "Tell me the colors of the MAOL tables of different years"
-answer = rag_query(question)
-print(f"\nAnswer: {answer}")
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="RAG with an in-memory knowledge base and Gemini")
+    parser.add_argument("--question", default="Tell me the colors of the MAOL tables of different years")
+    parser.add_argument("--top-k", type=int, default=2, help="Knowledge base entries used as context")
+    parser.add_argument("--show-scores", action="store_true", help="Print the similarity of every entry")
+    parser.add_argument("--trace", action="append", choices=list(EXPORTERS),
+                        help="Export per-stage timings (repeatable), see common/tracing.py")
+    args = parser.parse_args()
+
+    if args.trace:
+        configure_tracing(args.trace)
+
+    answer = rag_query(args.question, top_k=args.top_k, show_scores=args.show_scores)
+    print(f"\nAnswer: {answer}")
+
+
+if __name__ == "__main__":
+    main()
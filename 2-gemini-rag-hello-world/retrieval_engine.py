@@ -0,0 +1,91 @@
+"""
+Vectorized cosine similarity retrieval for an in-memory knowledge base.
+
+The knowledge base embeddings are normalized once and kept as a contiguous
+float32 matrix. Cosine similarity then becomes a plain dot product, so a whole
+batch of queries is scored with a single matrix multiplication, and the top-k
+entries are picked with a partial selection (np.argpartition) instead of a full
+sort of every score.
+
+For large knowledge bases the engine can keep quantized codes instead of the
+float32 matrix (`quantization="int8"` or `"binary"`). Searches then shortlist
+candidates by their codes and rescore them exactly against the original
+embeddings, which may be a memory-mapped array that stays on disk.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from quantized_store import QuantizedVectorStore
+
+
+def normalize_rows(vectors):
+    """Return a float32 copy of `vectors` with every row scaled to unit length."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # Leave all-zero rows as they are instead of dividing by zero
+    vectors /= norms
+    return vectors
+
+
+class RetrievalEngine:
+    """
+    Cosine top-k search over a fixed set of embeddings.
+
+    Args:
+        embeddings: Array of shape (n_entries, dim) with the knowledge base embeddings.
+        quantization (str, optional): None keeps a normalized float32 matrix, "int8" or
+            "binary" keep only quantized codes in RAM.
+        rescore_factor (int): With quantization, candidates rescored exactly per query
+            as a multiple of top_k.
+    """
+
+    def __init__(self, embeddings, quantization=None, rescore_factor=10):
+        self.quantization = quantization
+        if quantization is None:
+            self.matrix = np.ascontiguousarray(normalize_rows(embeddings))
+            self.store = None
+        else:
+            # No normalized copy: the store reads (and normalizes) rows of `embeddings` when rescoring
+            self.matrix = None
+            self.store = QuantizedVectorStore(quantization, metric="cosine", rescore_factor=rescore_factor)
+            self.store.fit(embeddings)
+
+    def __len__(self):
+        return len(self.store) if self.store is not None else len(self.matrix)
+
+    def scores(self, query_embeddings):
+        """Cosine similarity of every query (rows) against every entry (columns)."""
+        if self.store is not None:
+            return self.store.exact_scores(query_embeddings)
+        return normalize_rows(query_embeddings) @ self.matrix.T
+
+    def search(self, query_embeddings, top_k=2):
+        """
+        Find the `top_k` most similar entries for each query.
+
+        Args:
+            query_embeddings: Array of shape (n_queries, dim), or a single vector.
+            top_k (int): Number of entries to return per query.
+
+        Returns:
+            tuple: (scores, indices), both of shape (n_queries, top_k), best match first.
+        """
+        if self.store is not None:
+            return self.store.search(query_embeddings, k=top_k)
+
+        scores = self.scores(query_embeddings)
+        top_k = min(top_k, scores.shape[1])
+
+        # argpartition puts the top_k largest scores (in any order) in the last top_k columns
+        candidates = np.argpartition(scores, -top_k, axis=1)[:, -top_k:]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+        # Only the top_k candidates need to be sorted
+        order = np.argsort(-candidate_scores, axis=1)
+        indices = np.take_along_axis(candidates, order, axis=1)
+        return np.take_along_axis(candidate_scores, order, axis=1), indices
@@ -13,7 +13,13 @@ Key concepts covered:
     the distance scores returned (lower = more similar)
 """
 
-import chromadb
+import os
+import sys
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vector_store_manager import get_vector_store_manager
+from chroma_sync import sync_collection
 
 DATABASE_FILE_PATH = "./chroma_db_data"  # Path where ChromaDB will store its data
 
@@ -33,33 +39,30 @@ def initVectorDb():
         "DOC-010: WEATHER PROTOCOL: If wind speeds exceed 28 knots, the race is moved to 'Sector 7' (The Sheltered Lagoon). If it drops below 4 knots, a 'Paddle-Off' tiebreaker is held at the docks."
     ]
 
-    # PersistentClient stores the database on disk so data survives between runs
-    client = chromadb.PersistentClient(path=DATABASE_FILE_PATH)
-
-    # get_or_create_collection avoids errors if the collection already exists
+    # PersistentClient stores the database on disk so data survives between runs.
+    # The vector store manager opens it once per process and caches the collection handle.
+    # create=True uses get_or_create_collection, which avoids errors if the collection already exists.
     # ChromaDB uses its built-in embedding model (all-MiniLM-L6-v2 via onnxruntime) by default
-    collection = client.get_or_create_collection(name="sailing_knowledge_base")
-
-    # Assume the collection is already initialized if it contains the same number of documents as our example set
-    if(collection.count() == exampleSourceDocuments.__len__()):
-        print("Collection already initialized with example documents.")
-        return  
-    
-    # Add documents - ChromaDB automatically generates embeddings for them
-    collection.add(
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, "sailing_knowledge_base", create=True)
+
+    # Every document gets a stable id from its "DOC-xxx:" prefix. sync_collection stores a content hash
+    # with each document and only adds, re-embeds or deletes the documents that changed since the last run.
+    # ChromaDB automatically generates embeddings for the documents it writes.
+    result = sync_collection(
+        collection,
+        ids=[doc.split(":", 1)[0] for doc in exampleSourceDocuments],
         documents=exampleSourceDocuments,
-        ids=[str(i) for i in range(len(exampleSourceDocuments))]
     )
 
-    print(f"Inserted {len(exampleSourceDocuments)} documents into the collection.")
+    print(f"Synced {len(exampleSourceDocuments)} documents into the collection: {result}.")
     print("Vector database initialized successfully.")
 
 
 def queryVectorDb(query):
     print(f"Querying vector database for: {query}")
 
-    client = chromadb.PersistentClient(path=DATABASE_FILE_PATH)
-    collection = client.get_collection(name="sailing_knowledge_base")
+    # Reuses the client and collection handle opened earlier instead of reopening the database
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, "sailing_knowledge_base")
 
     # ChromaDB automatically embeds the query text using the same built-in model
     results = collection.query(
@@ -0,0 +1,203 @@
+"""
+Asyncio version of the RAG pipeline in rag-with-vectordb.py for answering many questions.
+
+`rag_query` answers one question at a time: retrieve, then call Gemini, then
+call Gemini again without context. Nearly all of that time is spent waiting on
+the network. `AsyncRagPipeline` works through a stream of questions concurrently:
+
+  - vector retrieval runs in worker threads (ChromaDB is synchronous) while
+    LLM calls for other questions are in flight,
+  - the call without RAG does not need the context, so it starts right away
+    instead of after the RAG answer,
+  - two semaphores cap the number of concurrent retrievals and LLM calls,
+  - results are yielded in question order or as soon as they complete.
+
+The LLM is injectable: anything with an `async generate(prompt) -> str` method
+works. `GeminiLLM` wraps a google.generativeai model, `FakeLLM` sleeps for a
+configurable latency so the pipeline can be exercised and benchmarked offline.
+
+Usage:
+
+    pipeline = AsyncRagPipeline(ChromaRetriever(DATABASE_FILE_PATH), GeminiLLM(model))
+    async for result in pipeline.run(questions, ordered=False):
+        print(result.question, result.answer)
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vector_store_manager import get_vector_store_manager
+
+
+@dataclass
+class RagResult:
+    index: int
+    question: str
+    answer: str = None
+    answer_without_rag: str = None
+    context: str = None
+    retrieval_seconds: float = 0.0
+    llm_seconds: float = 0.0
+    error: Exception = None
+
+
+class GeminiLLM:
+    """Async adapter for a google.generativeai GenerativeModel."""
+
+    def __init__(self, model):
+        self.model = model
+
+    async def generate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text.strip()
+
+
+class FakeLLM:
+    """Local stand-in for an LLM that answers after `latency` (+/- `jitter`) seconds."""
+
+    def __init__(self, latency=0.5, jitter=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    async def generate(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        return f"Fake answer to a prompt of {len(prompt)} characters"
+
+
+class ChromaRetriever:
+    """Returns the joined top documents of a ChromaDB collection for a question."""
+
+    def __init__(self, path, collection_name="sailing_knowledge_base", n_results=5):
+        self.path = path
+        self.collection_name = collection_name
+        self.n_results = n_results
+
+    def __call__(self, question):
+        collection = get_vector_store_manager().get_collection(self.path, self.collection_name)
+        results = collection.query(query_texts=[question], n_results=self.n_results)
+        return " ".join(results["documents"][0])
+
+
+class AsyncRagPipeline:
+    """
+    Answers a stream of questions with bounded concurrency.
+
+    Args:
+        retriever (callable): Synchronous function question -> context string. Runs in a worker thread.
+        llm: Object with an `async generate(prompt) -> str` method.
+        max_concurrent_retrievals (int): Upper limit of retrievals running at the same time.
+        max_concurrent_llm_calls (int): Upper limit of LLM requests in flight at the same time.
+        compare_without_rag (bool): Also ask the LLM without context, like query_without_rag.
+    """
+
+    def __init__(self, retriever, llm, max_concurrent_retrievals=4, max_concurrent_llm_calls=16,
+                 compare_without_rag=False):
+        self.retriever = retriever
+        self.llm = llm
+        self.max_concurrent_retrievals = max_concurrent_retrievals
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls
+        self.compare_without_rag = compare_without_rag
+
+    async def _generate(self, llm_semaphore, prompt):
+        async with llm_semaphore:
+            return await self.llm.generate(prompt)
+
+    async def _answer(self, index, question, retrieval_semaphore, llm_semaphore):
+        result = RagResult(index=index, question=question)
+        try:
+            without_rag = None
+            if self.compare_without_rag:
+                # Does not depend on the context, so it overlaps with retrieval
+                without_rag = asyncio.create_task(
+                    self._generate(llm_semaphore, f"Question: {question}\nAnswer:")
+                )
+
+            start = time.perf_counter()
+            async with retrieval_semaphore:
+                result.context = await asyncio.to_thread(self.retriever, question)
+            result.retrieval_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            prompt = f"Context: {result.context}\n\nQuestion: {question}\nAnswer:"
+            result.answer = await self._generate(llm_semaphore, prompt)
+            if without_rag is not None:
+                result.answer_without_rag = await without_rag
+            result.llm_seconds = time.perf_counter() - start
+        except Exception as e:
+            # One failing question should not stop the whole batch
+            result.error = e
+            if without_rag is not None and not without_rag.done():
+                without_rag.cancel()
+        return result
+
+    async def run(self, questions, ordered=True):
+        """
+        Answer questions from an iterable or async iterable.
+
+        Args:
+            questions: Questions to answer. Consumed lazily, so it can be an endless stream.
+            ordered (bool): Yield results in question order. Otherwise they are yielded as soon
+                as they complete.
+
+        Yields:
+            RagResult: One result per question. Failures are reported in `result.error`.
+        """
+        retrieval_semaphore = asyncio.Semaphore(self.max_concurrent_retrievals)
+        llm_semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+        # Questions read ahead of the results. Enough to keep both stages busy
+        # without creating a task for every question of a long stream up front.
+        max_in_flight = self.max_concurrent_retrievals + self.max_concurrent_llm_calls
+
+        in_flight = set()
+        finished = {}  # index -> result, only used for ordered output
+        next_index = 0
+
+        async def drain(return_when):
+            nonlocal next_index
+            done, _ = await asyncio.wait(in_flight, return_when=return_when)
+            in_flight.difference_update(done)
+            completed = sorted((task.result() for task in done), key=lambda r: r.index)
+            if not ordered:
+                return completed
+            for result in completed:
+                finished[result.index] = result
+            ready = []
+            while next_index in finished:
+                ready.append(finished.pop(next_index))
+                next_index += 1
+            return ready
+
+        index = 0
+        async for question in _aiter(questions):
+            in_flight.add(asyncio.create_task(self._answer(index, question, retrieval_semaphore, llm_semaphore)))
+            index += 1
+            # Ordered output must also wait for earlier slow questions, so count buffered results too
+            while len(in_flight) + len(finished) >= max_in_flight and in_flight:
+                for result in await drain(asyncio.FIRST_COMPLETED):
+                    yield result
+
+        while in_flight:
+            for result in await drain(asyncio.FIRST_COMPLETED):
+                yield result
+
+    async def answer_all(self, questions, ordered=True):
+        """Answer every question and return the results as a list."""
+        return [result async for result in self.run(questions, ordered=ordered)]
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
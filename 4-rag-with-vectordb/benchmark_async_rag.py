@@ -0,0 +1,78 @@
+"""
+Benchmark: throughput of the async RAG pipeline at different concurrency limits.
+
+Answers the same stream of questions with FakeLLM (a local stand-in with a
+fixed latency) and a retriever that either sleeps for a fixed time or queries
+the ChromaDB collection built by rag-with-vectordb.py (--chroma). A limit of 1
+is the same as the synchronous rag_query loop.
+
+    python benchmark_async_rag.py --questions 1000 --llm-latency 0.2 --concurrency 1 8 32 128
+"""
+
+import argparse
+import asyncio
+import time
+
+from async_rag import AsyncRagPipeline, ChromaRetriever, FakeLLM
+
+DATABASE_FILE_PATH = "./chroma_db_data"
+
+QUESTIONS = [
+    "What does a purple checkered flag mean?",
+    "Where is the Regatta Office? Emerald Bay Championship 2026",
+    "Who won last year?",
+    "What is the penalty for tacking in Obsidian Reach?",
+]
+
+
+def sleeping_retriever(seconds):
+    def retrieve(question):
+        time.sleep(seconds)
+        return f"Context for {question}"
+    return retrieve
+
+
+async def measure(pipeline, questions, ordered):
+    start = time.perf_counter()
+    results = await pipeline.answer_all(questions, ordered=ordered)
+    seconds = time.perf_counter() - start
+    errors = sum(result.error is not None for result in results)
+    return seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    parser.add_argument("--retrieval-latency", type=float, default=0.005, help="Seconds per fake retrieval")
+    parser.add_argument("--chroma", action="store_true", help="Retrieve from the real ChromaDB collection")
+    parser.add_argument("--retrieval-concurrency", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128],
+                        help="Concurrent LLM calls to test")
+    parser.add_argument("--unordered", action="store_true", help="Yield results as they complete")
+    args = parser.parse_args()
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+    retriever = ChromaRetriever(DATABASE_FILE_PATH) if args.chroma else sleeping_retriever(args.retrieval_latency)
+
+    print(f"{args.questions} questions, LLM latency {args.llm_latency * 1000:.0f} ms")
+    baseline = None
+    for limit in args.concurrency:
+        pipeline = AsyncRagPipeline(
+            retriever,
+            FakeLLM(latency=args.llm_latency),
+            # A limit of 1 everywhere reproduces the sequential loop
+            max_concurrent_retrievals=min(limit, args.retrieval_concurrency),
+            max_concurrent_llm_calls=limit,
+        )
+        seconds, errors = asyncio.run(measure(pipeline, questions, ordered=not args.unordered))
+        throughput = args.questions / seconds
+        baseline = baseline or throughput
+        print(
+            f"concurrency {limit:4d}: {seconds:7.2f}s {throughput:8.1f} questions/s "
+            f"({throughput / baseline:5.1f}x) {errors} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,141 @@
-import chromadb
+import argparse
 import os
-import google.generativeai as genai
-from sympy import pprint
+import sys
 from sailing_documents import exampleSourceDocuments
 
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vector_store_manager import get_vector_store_manager
+from chroma_sync import sync_collection
+from bulk_loader import bulk_upsert
+from semantic_cache import SemanticCache, retrieved_context_ids
+from bm25_index import BM25Index, HybridRetriever
+from embedding_service import get_embedding_service
+from tracing import EXPORTERS, configure_tracing, get_tracer
+
 DATABASE_FILE_PATH = "./chroma_db_data"  # Path where ChromaDB will store its data
+ANSWER_CACHE_FILE = "./answer_cache.json"  # Semantic cache of Gemini answers
+GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
 
-# Initialize environment variable for Gemini API key
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set. Please set it.")
+# Gemini, the embedding model and the answer cache are created on first use, so importing
+# this module is fast and does not need an API key
+_model = None
+_embedding_function = None
+_answer_cache = None
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash-lite')
+# BM25 index over the same documents plus the query router, built by initVectorDb()
+hybrid_retriever = None
 
 
-def initVectorDb():
-    print("Initializing vector database...")
+def get_model():
+    """Configure the Gemini API on first use and return the generative model."""
+    global _model
+    if _model is None:
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set. Please set it.")
+        import google.generativeai as genai
 
-    client = chromadb.PersistentClient(path=DATABASE_FILE_PATH)
+        genai.configure(api_key=gemini_api_key)
+        _model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return _model
 
-    # get_or_create_collection avoids errors if the collection already exists
-    # ChromaDB uses its built-in embedding model (all-MiniLM-L6-v2 via onnxruntime) by default
-    collection = client.get_or_create_collection(name="sailing_knowledge_base")
 
-    # Assume the collection is already initialized if it contains the same number of documents as our example set
-    if collection.count() == len(exampleSourceDocuments):
-        print("Collection already initialized with example documents.")
-        return
+def get_embedding_function():
+    """
+    The same model ChromaDB uses for the collection. Questions are embedded once with it
+    and the embedding is used both for the vector search and for the answer cache.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        # all-MiniLM-L6-v2 on onnxruntime, shared with the bulk loader
+        _embedding_function = get_embedding_service()
+    return _embedding_function
+
+
+def get_answer_cache():
+    """Returns stored answers when a similar question was asked before with the same retrieved documents."""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = SemanticCache(ANSWER_CACHE_FILE, similarity_threshold=0.9)
+    return _answer_cache
+
 
-    # Add documents - ChromaDB automatically generates embeddings for them
-    collection.add(
+def initVectorDb():
+    global hybrid_retriever
+    print("Initializing vector database...")
+
+    # The vector store manager opens the database once per process and caches the collection handle.
+    # create=True uses get_or_create_collection, which avoids errors if the collection already exists.
+    # ChromaDB uses its built-in embedding model (all-MiniLM-L6-v2 via onnxruntime) by default
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, "sailing_knowledge_base", create=True)
+
+    # Every document gets a stable id from its "DOC-xxx:" prefix. sync_collection stores a content hash
+    # with each document and only adds, re-embeds or deletes the documents that changed since the last run.
+    # The bulk loader embeds the written documents in parallel with the same built-in model and
+    # upserts them together with their embeddings.
+    result = sync_collection(
+        collection,
+        ids=[doc.split(":", 1)[0] for doc in exampleSourceDocuments],
         documents=exampleSourceDocuments,
-        ids=[str(i) for i in range(len(exampleSourceDocuments))]
+        upsert=bulk_upsert,
+    )
+    print(f"Synced {len(exampleSourceDocuments)} documents into the collection: {result}.")
+
+    # Lexical index for identifier lookups such as "DOC-004" or "Rule 14.2", see queryVectorDb()
+    # Lookups that match no document fall back to vector search and are embedded with the shared
+    # embedding function, so ChromaDB never loads its own copy of the model
+    hybrid_retriever = HybridRetriever(
+        BM25Index.from_collection(collection), vector_search, embed=lambda texts: get_embedding_function()(texts)
     )
-    print(f"Inserted {len(exampleSourceDocuments)} documents into the collection.")
     print("Vector database initialized successfully.")
 
 # Main RAG function
 def rag_query(question):
-    # Retrieve context
-    context = create_context_from_vector_db(question)
-    # Create prompt for Gemini
-    prompt = f"Context: {context}\n\nQuestion: {question}\nAnswer:"
-    # Get response from Gemini
-    answer = query_gemini(prompt)
+    tracer = get_tracer()
+    # Each stage is a span of the trace, see common/tracing.py
+    with tracer.span("rag_query") as root:
+        # Identifier lookups are answered by the BM25 index, so the embedding model is not needed
+        # for them. Their cache entries are keyed by the question text instead of its embedding,
+        # unless the lookup found nothing and the retriever embedded the question itself.
+        question_embedding = None
+        if hybrid_retriever is None or hybrid_retriever.route(question) != "lexical":
+            with tracer.span("embed_query"):
+                question_embedding = get_embedding_function()([question])[0]
+        answer_cache = get_answer_cache()
+        # Retrieve context
+        results = queryVectorDb(question, question_embedding)
+        context = " ".join(results['documents'][0])
+        context_ids = retrieved_context_ids(results)
+        if question_embedding is None:
+            question_embedding = results.get("query_embedding")
+
+        # A similar question with the same context was answered before
+        answer = answer_cache.lookup(question_embedding, context_ids, question=question)
+        root.set(cache_hit=answer is not None)
+        if answer is not None:
+            print("Answer served from the semantic cache.")
+            return answer
+
+        # Create prompt for Gemini
+        with tracer.span("prompt_assembly") as span:
+            prompt = f"Context: {context}\n\nQuestion: {question}\nAnswer:"
+            span.set(prompt_chars=len(prompt))
+        # Get response from Gemini
+        answer = query_gemini(prompt)
+        answer_cache.store(question, question_embedding, context_ids, answer)
     return answer
 
 # Query Gemini API
 def query_gemini(prompt):
-    response = model.generate_content(prompt)
+    with get_tracer().span("llm", model=GEMINI_MODEL_NAME) as span:
+        # Streamed, so the trace shows the time to the first token
+        response = get_model().generate_content(prompt, stream=True)
+        for _ in response:
+            span.first_token()
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            span.set(prompt_tokens=usage.prompt_token_count, completion_tokens=usage.candidates_token_count)
     return response.text.strip()
 
 # Retrieve context from vector database
@@ -60,21 +145,36 @@ def create_context_from_vector_db(question):
     return " ".join(results['documents'][0])
 
 
-def queryVectorDb(query):
+def queryVectorDb(query, query_embedding=None):
     print(f"Querying vector database for: {query}")
 
-    client = chromadb.PersistentClient(path=DATABASE_FILE_PATH)
-    collection = client.get_collection(name="sailing_knowledge_base")
+    with get_tracer().span("vector_search", n_results=5) as span:
+        if hybrid_retriever is None:
+            results = vector_search(query, 5, query_embedding)
+        else:
+            # Identifier lookups are answered by the BM25 index without embedding the query,
+            # questions without identifiers use vector search and mixed ones combine both
+            results = hybrid_retriever.query(query, n_results=5, query_embedding=query_embedding)
+            print(f"Query route: {results['route']}")
+            span.set(route=results["route"])
+    print(f"Found {len(results['documents'][0])} results for the query.")
+    #print("Results:")
+    #print(results)
+    return results
 
+
+def vector_search(query, n_results=5, query_embedding=None):
+    # Reuses the client and collection handle opened earlier instead of reopening the database
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, "sailing_knowledge_base")
+
+    if query_embedding is not None:
+        # Already embedded by the caller, no need to embed the question again
+        return collection.query(query_embeddings=[query_embedding], n_results=n_results)
     # ChromaDB automatically embeds the query text using the same built-in model
-    results = collection.query(
+    return collection.query(
         query_texts=[query],
-        n_results=5
+        n_results=n_results
     )
-    print(f"Found {len(results['documents'][0])} results for the query.")
-    #print("Results:")
-    #pprint(results)
-    return results
 
 def query_without_rag(question):
     prompt = f"Question: {question}\nAnswer:"
@@ -83,26 +183,43 @@ def query_without_rag(question):
     return answer
 
 
-initVectorDb()  # Initialize the vector database and insert example documents
+def main():
+    parser = argparse.ArgumentParser(description="RAG over a ChromaDB collection of sailing documents with Gemini")
+    # Other example questions:
+    #   "Where is the Regatta Office? Emerald Bay Championship 2026"
+    #   "Who won last year?"
+    #   "What is the penalty for tacking in Obsidian Reach?"
+    parser.add_argument("--question", default="What does a purple checkered flag mean?")
+    parser.add_argument("--no-compare", action="store_true", help="Skip the answer without RAG")
+    parser.add_argument("--trace", action="append", choices=list(EXPORTERS),
+                        help="Export per-stage timings (repeatable), see common/tracing.py")
+    args = parser.parse_args()
+
+    if args.trace:
+        configure_tracing(args.trace)
+
+    initVectorDb()  # Initialize the vector database and insert example documents
+
+    ##
+    ## Now we can perform a similarity search on the collection.
+    ##
+    search_query = args.question
+
+    RAGresults = rag_query(search_query)
+    print("RAG Results\n###########################################################")
+    # Print the results
+    print(f"Query: {search_query}")
+    print(f"LLM Response: {RAGresults}\n")
 
-##
-## Now we can perform a similarity search on the collection.
-##
+    if not args.no_compare:
+        print("************************************************************")
+        NoContextResults = query_without_rag(search_query)
+        print("No RAG Results\n###########################################################")
+        print(f"Query: {search_query}")
+        print(f"LLM Response: {NoContextResults}\n")
 
-# Here is our example search query in plain text.
-# search_query = "Where is the Regatta Office? Emerald Bay Championship 2026"
-search_query = "What does a purple checkered flag mean?"
-# search_query = "Who won last year?"
-# search_query = "What is the penalty for tacking in Obsidian Reach?"
+    print(f"Semantic cache: {get_answer_cache().stats()}")
 
-RAGresults = rag_query(search_query)
-print("RAG Results\n###########################################################")
-# Print the results
-print(f"Query: {search_query}")
-print(f"LLM Response: {RAGresults}\n")
 
-print("************************************************************")
-NoContextResults = query_without_rag(search_query)
-print("No RAG Results\n###########################################################")
-print(f"Query: {search_query}")
-print(f"LLM Response: {NoContextResults}\n")
+if __name__ == "__main__":
+    main()
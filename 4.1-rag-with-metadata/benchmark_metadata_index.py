@@ -0,0 +1,113 @@
+"""
+Benchmark: filtered retrieval through ChromaDB's where clause vs. MetadataIndex with exact scoring.
+
+Builds a synthetic collection with random embeddings whose `source_type`
+values have very different frequencies, so filtering on each of them sweeps the
+selectivity from a few documents to half of the collection. For every filter
+the same queries run
+
+  - through collection.query(..., where=...), and
+  - through MetadataIndex: resolve the filter to candidates, score them exactly.
+
+It prints the latency of both and the recall of ChromaDB's results against
+the exact ones. Use the crossover to choose max_exact_candidates.
+
+    python benchmark_metadata_index.py --documents 20000 --queries 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from metadata_index import MetadataIndex
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vector_store_manager import VectorStoreManager
+
+# Fraction of the documents that get each source_type
+SELECTIVITIES = [0.0005, 0.002, 0.01, 0.05, 0.2, 0.5]
+
+
+def synthetic_metadata(count, rng):
+    fractions = np.array(SELECTIVITIES + [max(0.0, 1 - sum(SELECTIVITIES))])
+    types = rng.choice(len(fractions), size=count, p=fractions / fractions.sum())
+    days = rng.integers(1, 29, size=count)
+    return [
+        {
+            "source_type": f"type_{SELECTIVITIES[t]}" if t < len(SELECTIVITIES) else "other",
+            "section": f"Section {i % 50}",
+            "published_by": ["Race Committee", "Jury", "Harbour Master"][i % 3],
+            "published_date": f"2026-05-{day:02d}",
+        }
+        for i, (t, day) in enumerate(zip(types, days))
+    ]
+
+
+def time_ms(fn, queries):
+    start = time.perf_counter()
+    results = [fn(query) for query in queries]
+    return 1000 * (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--n-results", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(args.documents, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    metadatas = synthetic_metadata(args.documents, rng)
+    ids = [f"doc-{i}" for i in range(args.documents)]
+
+    filters = [{"source_type": f"type_{s}"} for s in SELECTIVITIES]
+    # ChromaDB only compares numbers with $gte/$lte, so this one runs through the index only
+    filters.append({"$and": [{"published_date": {"$gte": "2026-05-01"}}, {"published_date": {"$lte": "2026-05-03"}}]})
+    filters.append({"$and": [{"published_by": "Jury"}, {"source_type": "type_0.05"}]})
+    filters.append(None)
+
+    with tempfile.TemporaryDirectory() as path:
+        manager = VectorStoreManager()
+        collection = manager.get_collection(path, "metadata_benchmark", create=True)
+        for start in range(0, args.documents, 5000):
+            end = start + 5000
+            collection.add(ids=ids[start:end], embeddings=embeddings[start:end], metadatas=metadatas[start:end])
+        index = MetadataIndex(ids, embeddings, metadatas)
+
+        print(f"{args.documents} documents, {args.queries} queries, top {args.n_results}")
+        print(f"{'filter':<62} {'matches':>8} {'chroma ms':>10} {'index ms':>9} {'recall':>7}  faster")
+        for where in filters:
+            matches = len(index.candidates(where))
+            label = str(where) if len(str(where)) <= 60 else str(where)[:57] + "..."
+            index_ms, exact_results = time_ms(
+                lambda q: [ids[row] for row in index.search(q, index.candidates(where), args.n_results)[0]],
+                queries,
+            )
+            try:
+                chroma_ms, chroma_results = time_ms(
+                    lambda q: collection.query(query_embeddings=[q], n_results=args.n_results, where=where,
+                                               include=["distances"])["ids"][0],
+                    queries,
+                )
+            except ValueError:
+                print(f"{label:<62} {matches:>8} {'n/a':>10} {index_ms:>9.2f} {'n/a':>7}  index")
+                continue
+            recall = np.mean([
+                len(set(found) & set(exact)) / max(1, len(exact))
+                for found, exact in zip(chroma_results, exact_results)
+            ])
+            faster = "index" if index_ms < chroma_ms else "chroma"
+            print(f"{label:<62} {matches:>8} {chroma_ms:>10.2f} {index_ms:>9.2f} {recall:>7.2f}  {faster}")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Token-budgeted context assembly for prompts with source citations.
+
+The original context put a full `[Source: title, section — url]` tag after
+every retrieved chunk, and near-identical chunks were all included. The
+context builder makes the prompt smaller:
+
+  - chunks that are near-duplicates of a more relevant chunk are dropped
+    (Jaccard similarity of their word 5-gram shingles),
+  - every chunk gets a short reference id like [S1], and each source label is
+    written only once, in a source list at the end of the context. Sections of
+    the same document (same URL apart from the #fragment) are listed under one
+    title and URL,
+  - chunks are added in relevance order until the token budget is used up,
+  - the result reports its token count and how many tokens it saved compared
+    with the original format.
+
+Tokens are estimated from the text length by default. Any function text -> int
+can be passed instead, e.g. a real tokenizer.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough token count: about 4 characters per token for English text."""
+    return math.ceil(len(text) / 4)
+
+
+def shingles(text, size=5):
+    """Set of word n-grams, used to recognise near-duplicate chunks."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def source_label(metadata):
+    return f"{metadata['source_title']}, {metadata['section']} — {metadata['source_url']}"
+
+
+def _document_header(metadata):
+    return f"{metadata['source_title']} — {metadata['source_url'].split('#', 1)[0]}"
+
+
+def _section_entry(reference_id, metadata):
+    _, _, fragment = metadata["source_url"].partition("#")
+    return f"  [{reference_id}] {metadata['section']}" + (f" (#{fragment})" if fragment else "")
+
+
+def source_list(source_metadatas):
+    """Source list with one header per document and one line per reference id."""
+    lines = []
+    headers = {}
+    for i, meta in enumerate(source_metadatas, start=1):
+        headers.setdefault(_document_header(meta), []).append(_section_entry(f"S{i}", meta))
+    for header, entries in headers.items():
+        lines.append(header)
+        lines.extend(entries)
+    return "\n".join(lines)
+
+
+def full_tag_context(documents, metadatas):
+    """The original format: every chunk followed by its full source tag."""
+    return "\n\n".join(f"{doc}\n[Source: {source_label(meta)}]" for doc, meta in zip(documents, metadatas))
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    source_metadatas: list = field(default_factory=list)  # One per reference id, S1 first
+    chunks_used: int = 0
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+    tokens: int = 0
+    full_tag_tokens: int = 0
+
+    @property
+    def tokens_saved(self):
+        return self.full_tag_tokens - self.tokens
+
+    def __str__(self):
+        return (
+            f"{self.tokens} tokens, {self.tokens_saved} saved ({self.chunks_used} chunks, "
+            f"{len(self.source_metadatas)} sources, {self.duplicates_dropped} near-duplicates and "
+            f"{self.over_budget_dropped} over budget dropped)"
+        )
+
+
+def build_context(documents, metadatas, token_budget=1000, duplicate_threshold=0.8, count_tokens=estimate_tokens):
+    """
+    Assemble a cited context from retrieved chunks.
+
+    Args:
+        documents (list[str]): Retrieved chunks, most relevant first.
+        metadatas (list[dict]): Metadata of each chunk (source_title, section, source_url).
+        token_budget (int): Maximum tokens of the context including the source list.
+        duplicate_threshold (float): Shingle Jaccard similarity from which a chunk counts as a duplicate.
+        count_tokens (callable): Function text -> number of tokens.
+
+    Returns:
+        BuiltContext
+    """
+    result = BuiltContext(text="", full_tag_tokens=count_tokens(full_tag_context(documents, metadatas)))
+    passages = []
+    reference_ids = {}  # source_url -> "S1", "S2", ...
+    headers = set()     # Documents already in the source list
+    kept_shingles = []
+    used_tokens = count_tokens("Sources:\n")
+
+    for doc, meta in zip(documents, metadatas):
+        doc_shingles = shingles(doc)
+        if any(jaccard(doc_shingles, kept) >= duplicate_threshold for kept in kept_shingles):
+            result.duplicates_dropped += 1
+            continue
+
+        url = meta["source_url"]
+        reference_id = reference_ids.get(url) or f"S{len(reference_ids) + 1}"
+        passage = f"[{reference_id}] {doc}"
+        cost = count_tokens(passage + "\n\n")
+        if url not in reference_ids:
+            cost += count_tokens(_section_entry(reference_id, meta) + "\n")
+            if _document_header(meta) not in headers:
+                cost += count_tokens(_document_header(meta) + "\n")
+        if used_tokens + cost > token_budget:
+            # A less relevant, shorter chunk may still fit
+            result.over_budget_dropped += 1
+            continue
+
+        used_tokens += cost
+        if url not in reference_ids:
+            reference_ids[url] = reference_id
+            headers.add(_document_header(meta))
+            result.source_metadatas.append(meta)
+        passages.append(passage)
+        kept_shingles.append(doc_shingles)
+
+    sources = source_list(result.source_metadatas)
+    result.text = "\n\n".join(passages) + (f"\n\nSources:\n{sources}" if sources else "")
+    result.chunks_used = len(passages)
+    result.tokens = count_tokens(result.text)
+    return result
@@ -0,0 +1,179 @@
+"""
+In-process metadata index for filtered vector search.
+
+With a `where` clause ChromaDB still runs its general vector search path, even
+when the filter leaves only a handful of documents. `MetadataIndex` keeps the
+metadata of the collection in memory:
+
+  - an inverted index (value -> sorted row numbers) for the equality fields
+    source_type, section and published_by,
+  - a sorted index for range fields (published_date, ISO dates compare as strings).
+
+A filter is resolved to the set of candidate rows first. When that set is
+small, the candidates are scored exactly against the query embedding with
+numpy (same squared L2 distance as the collection). Only when the filter is not
+selective enough does the query go to ChromaDB as before.
+
+Filters use a subset of ChromaDB's `where` syntax:
+
+    {"source_type": "sailing_instructions"}
+    {"published_by": {"$in": ["Race Committee", "Jury"]}}
+    {"published_date": {"$gte": "2026-05-01", "$lte": "2026-05-31"}}
+    {"$and": [...]}, {"$or": [...]}
+"""
+
+import numpy as np
+
+EQUALITY_FIELDS = ("source_type", "section", "published_by")
+RANGE_FIELDS = ("published_date",)
+
+
+class MetadataIndex:
+    """
+    Inverted and range indexes over document metadata, plus the embeddings for exact scoring.
+
+    Args:
+        ids (list[str]): Document ids.
+        embeddings (array-like): One embedding per document.
+        metadatas (list[dict]): One metadata dict per document.
+        documents (list[str], optional): Document texts, returned with the results.
+        equality_fields (tuple): Fields filtered by exact value.
+        range_fields (tuple): Fields filtered by value ranges.
+    """
+
+    def __init__(self, ids, embeddings, metadatas, documents=None,
+                 equality_fields=EQUALITY_FIELDS, range_fields=RANGE_FIELDS):
+        self.ids = list(ids)
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.embeddings.ndim != 2:  # Empty collection
+            self.embeddings = self.embeddings.reshape(len(self.ids), -1 if len(self.ids) else 0)
+        self.squared_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+        self.metadatas = list(metadatas)
+        self.documents = list(documents) if documents is not None else None
+
+        # field -> value -> sorted row numbers
+        self.inverted = {field: {} for field in equality_fields}
+        for row, metadata in enumerate(self.metadatas):
+            for field in equality_fields:
+                if field in metadata:
+                    self.inverted[field].setdefault(metadata[field], []).append(row)
+        for values in self.inverted.values():
+            for value, rows in values.items():
+                values[value] = np.array(rows, dtype=np.int64)
+
+        # field -> (sorted values, row numbers in that order)
+        self.ranges = {}
+        for field in range_fields:
+            rows = np.array([row for row, metadata in enumerate(self.metadatas) if field in metadata], dtype=np.int64)
+            values = np.array([self.metadatas[row][field] for row in rows])
+            order = np.argsort(values, kind="stable")
+            self.ranges[field] = (values[order], rows[order])
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs):
+        """Build the index from everything stored in a ChromaDB collection."""
+        data = collection.get(include=["embeddings", "metadatas", "documents"])
+        return cls(data["ids"], data["embeddings"], data["metadatas"], data["documents"], **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, where):
+        """Row numbers matching a `where` filter, sorted. All rows when `where` is None."""
+        if not where:
+            return np.arange(len(self.ids))
+        if len(where) > 1:
+            # Several fields in one dict are an implicit $and, as in ChromaDB
+            return self.candidates({"$and": [{key: value} for key, value in where.items()]})
+
+        (key, condition), = where.items()
+        if key == "$and":
+            result = self.candidates(condition[0])
+            for clause in condition[1:]:
+                result = np.intersect1d(result, self.candidates(clause), assume_unique=True)
+            return result
+        if key == "$or":
+            return np.unique(np.concatenate([self.candidates(clause) for clause in condition]))
+        return self._field_candidates(key, condition)
+
+    def _field_candidates(self, field, condition):
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        if field in self.ranges:
+            values, rows = self.ranges[field]
+            low, high = 0, len(values)
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    low = max(low, np.searchsorted(values, operand, side="left"))
+                    high = min(high, np.searchsorted(values, operand, side="right"))
+                elif operator in ("$gte", "$gt"):
+                    low = max(low, np.searchsorted(values, operand, side="left" if operator == "$gte" else "right"))
+                elif operator in ("$lte", "$lt"):
+                    high = min(high, np.searchsorted(values, operand, side="right" if operator == "$lte" else "left"))
+                elif operator == "$in":
+                    return np.unique(np.concatenate(
+                        [self._field_candidates(field, {"$eq": value}) for value in operand] or [np.array([], np.int64)]
+                    ))
+                else:
+                    raise ValueError(f"Unsupported operator {operator} for range field {field}")
+            return np.sort(rows[low:max(low, high)])
+
+        if field in self.inverted:
+            index = self.inverted[field]
+            empty = np.array([], dtype=np.int64)
+            (operator, operand), = condition.items()
+            if operator == "$eq":
+                return index.get(operand, empty)
+            if operator == "$in":
+                return np.unique(np.concatenate([index.get(value, empty) for value in operand] or [empty]))
+            if operator == "$ne":
+                return np.setdiff1d(np.arange(len(self.ids)), index.get(operand, empty), assume_unique=True)
+            raise ValueError(f"Unsupported operator {operator} for field {field}")
+
+        raise ValueError(f"Field {field} is not indexed")
+
+    def search(self, query_embedding, rows, n_results=5):
+        """Exact search among `rows`. Returns (row numbers, squared L2 distances), nearest first."""
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2
+        distances = self.squared_norms[rows] - 2 * (self.embeddings[rows] @ query) + query @ query
+        if len(rows) > n_results:
+            top = np.argpartition(distances, n_results)[:n_results]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(distances[top])]
+        return rows[top], np.maximum(distances[top], 0.0)
+
+    def query(self, collection, query_embedding, where=None, n_results=5, max_exact_candidates=5000):
+        """
+        Filtered nearest-neighbour search that picks the cheaper strategy.
+
+        Resolves `where` to candidates. Up to `max_exact_candidates` of them are scored
+        exactly in memory, otherwise the query goes to `collection.query`.
+
+        Returns:
+            dict: Same shape as a ChromaDB query result for a single query
+                (ids, documents, metadatas, distances).
+        """
+        rows = self.candidates(where)
+        if len(rows) > max_exact_candidates:
+            try:
+                return collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=where,
+                    include=["documents", "metadatas", "distances"],
+                )
+            except ValueError:
+                # ChromaDB rejects filters it cannot evaluate, e.g. $gte on date strings.
+                # The candidates are already known, so score them exactly instead.
+                pass
+
+        rows, distances = self.search(query_embedding, rows, n_results)
+        return {
+            "ids": [[self.ids[row] for row in rows]],
+            "documents": [[self.documents[row] for row in rows]] if self.documents is not None else None,
+            "metadatas": [[self.metadatas[row] for row in rows]],
+            "distances": [distances.tolist()],
+        }
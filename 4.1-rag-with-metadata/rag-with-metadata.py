@@ -1,87 +1,195 @@
-import chromadb
+import argparse
 import os
-import google.generativeai as genai
+import sys
 from sailing_documents_with_metadata import exampleSourceDocuments
+from metadata_index import MetadataIndex
+from context_builder import build_context
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vector_store_manager import get_vector_store_manager
+from chroma_sync import sync_collection
+from bulk_loader import bulk_upsert
+from semantic_cache import SemanticCache, retrieved_context_ids
+from bm25_index import BM25Index, HybridRetriever
+from embedding_service import get_embedding_service
+from tracing import EXPORTERS, configure_tracing, get_tracer
 
 DATABASE_FILE_PATH = "./chroma_db_data"
 COLLECTION_NAME = "sailing_knowledge_base_with_metadata"
-
-# Initialize environment variable for Gemini API key
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable not set. Please set it.")
-
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash-lite')
+ANSWER_CACHE_FILE = "./answer_cache.json"  # Semantic cache of Gemini answers
+CONTEXT_TOKEN_BUDGET = 1000  # Maximum size of the retrieved context in the prompt
+GEMINI_MODEL_NAME = "gemini-2.5-flash-lite"
+
+# Gemini, the embedding model and the answer cache are created on first use, so importing
+# this module is fast and does not need an API key
+_model = None
+_embedding_function = None
+_answer_cache = None
+
+# In-memory metadata index and BM25 index with query router over the collection, built by initVectorDb()
+metadata_index = None
+hybrid_retriever = None
+
+
+def get_model():
+    """Configure the Gemini API on first use and return the generative model."""
+    global _model
+    if _model is None:
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set. Please set it.")
+        import google.generativeai as genai
+
+        genai.configure(api_key=gemini_api_key)
+        _model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return _model
+
+
+def get_embedding_function():
+    """
+    Same embedding model as the collection. Each question is embedded once and the
+    embedding is shared by the vector search and the answer cache.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        # all-MiniLM-L6-v2 on onnxruntime, shared with the bulk loader
+        _embedding_function = get_embedding_service()
+    return _embedding_function
+
+
+def get_answer_cache():
+    """Reuses answers of similar earlier questions that were answered from the same documents."""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = SemanticCache(ANSWER_CACHE_FILE, similarity_threshold=0.9)
+    return _answer_cache
 
 
 def initVectorDb():
+    global metadata_index, hybrid_retriever
     print("Initializing vector database...")
 
-    client = chromadb.PersistentClient(path=DATABASE_FILE_PATH)
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, COLLECTION_NAME, create=True)
 
-    if collection.count() == len(exampleSourceDocuments):
-        print("Collection already initialized with example documents.")
-        return
-
-    # Unpack texts and metadata from the structured document list
+    # Unpack texts and metadata from the structured document list.
+    # The source URL is unique per document, so it doubles as a stable id.
     texts = [doc["text"] for doc in exampleSourceDocuments]
     metadatas = [doc["metadata"] for doc in exampleSourceDocuments]
-    ids = [str(i) for i in range(len(exampleSourceDocuments))]
-
-    collection.add(
-        documents=texts,
-        metadatas=metadatas,
-        ids=ids
+    ids = [doc["metadata"]["source_url"] for doc in exampleSourceDocuments]
+
+    # Only documents whose text or metadata changed since the last run are re-embedded,
+    # in parallel batches by the bulk loader
+    result = sync_collection(collection, ids=ids, documents=texts, metadatas=metadatas, upsert=bulk_upsert)
+    print(f"Synced {len(exampleSourceDocuments)} documents into the collection: {result}.")
+
+    # Filters are resolved against this index first, see queryVectorDb()
+    metadata_index = MetadataIndex.from_collection(collection)
+    # Identifiers like "Rule 14.2" are often in the section name, so it is indexed with the text
+    lexical_index = BM25Index.from_collection(collection, text=lambda doc, meta: f"{meta['section']}\n{doc}")
+    # Lookups that match no document fall back to vector search and are embedded with the shared
+    # embedding function, so ChromaDB never loads its own copy of the model
+    hybrid_retriever = HybridRetriever(
+        lexical_index, vector_search, embed=lambda texts: get_embedding_function()(texts)
     )
-    print(f"Inserted {len(exampleSourceDocuments)} documents into the collection.")
     print("Vector database initialized successfully.")
 
 
-def queryVectorDb(query, source_type_filter=None):
+def queryVectorDb(query, source_type_filter=None, query_embedding=None):
+    with get_tracer().span("vector_search", source_type=source_type_filter or "") as span:
+        results = _queryVectorDb(query, source_type_filter, query_embedding)
+        span.set(route=results.get("route", "vector"), results=len(results["documents"][0]))
+    return results
+
+
+def _queryVectorDb(query, source_type_filter=None, query_embedding=None):
     print(f"\nQuerying vector database for: '{query}'")
 
-    client = chromadb.PersistentClient(path=DATABASE_FILE_PATH)
-    collection = client.get_collection(name=COLLECTION_NAME)
+    # Shared client and collection handle, opened once per process
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, COLLECTION_NAME)
 
     # Optional: filter results to a specific source_type using ChromaDB's where clause
     where_clause = {"source_type": source_type_filter} if source_type_filter else None
 
-    results = collection.query(
-        query_texts=[query],
-        n_results=5,
-        where=where_clause,
-        include=["documents", "metadatas", "distances"]
-    )
+    if where_clause and metadata_index is not None and query_embedding is not None:
+        # Selective filters: look up the matching documents in the metadata index and score only
+        # those exactly. Falls back to ChromaDB when the filter matches too many documents.
+        results = metadata_index.query(collection, query_embedding, where_clause, n_results=5)
+        print(f"Found {len(results['documents'][0])} matching documents.")
+        return results
+
+    if where_clause is None and hybrid_retriever is not None:
+        # Identifier lookups ("Rule 14.2", "OB-N1") are answered by the BM25 index without
+        # embedding the query, mixed queries fuse the lexical and vector rankings
+        results = hybrid_retriever.query(query, n_results=5, query_embedding=query_embedding)
+        print(f"Query route: {results['route']}")
+    else:
+        results = vector_search(query, 5, query_embedding, where_clause)
     print(f"Found {len(results['documents'][0])} matching documents.")
     return results
 
 
-def create_context_with_sources(question, source_type_filter=None):
-    """Build a context string that includes inline source references for each chunk."""
-    results = queryVectorDb(question, source_type_filter)
+def vector_search(query, n_results=5, query_embedding=None, where=None):
+    collection = get_vector_store_manager().get_collection(DATABASE_FILE_PATH, COLLECTION_NAME)
+
+    # Use the caller's embedding when there is one, otherwise ChromaDB embeds the query text
+    query_args = {"query_embeddings": [query_embedding]} if query_embedding is not None else {"query_texts": [query]}
+    return collection.query(
+        **query_args,
+        n_results=n_results,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
 
-    context_parts = []
-    for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-        source_ref = (
-            f"[Source: {meta['source_title']}, "
-            f"{meta['section']} — {meta['source_url']}]"
-        )
-        context_parts.append(f"{doc}\n{source_ref}")
 
-    # Also return metadata separately so the caller can display a source list
-    return "\n\n".join(context_parts), results["metadatas"][0]
+def create_context_with_sources(question, source_type_filter=None, question_embedding=None):
+    """Build a context string where each chunk has a short [S#] reference to a source list."""
+    results = queryVectorDb(question, source_type_filter, question_embedding)
+
+    # Drops near-duplicate chunks, writes each source label once and fills the token budget
+    # in relevance order
+    with get_tracer().span("prompt_assembly") as span:
+        context = build_context(results["documents"][0], results["metadatas"][0], token_budget=CONTEXT_TOKEN_BUDGET)
+        span.set(context_tokens=context.tokens, tokens_saved=context.tokens_saved)
+    print(f"Context: {context}")
+
+    # Also return the metadata of the cited sources (S1, S2, ...), the ids of the retrieved
+    # documents, so the caller can display a source list, and the question embedding if
+    # retrieval computed one
+    return (
+        context.text, context.source_metadatas, retrieved_context_ids(results),
+        results.get("query_embedding", question_embedding),
+    )
 
 
 def rag_query_with_citations(question, source_type_filter=None):
-    context, retrieved_metadatas = create_context_with_sources(question, source_type_filter)
+    tracer = get_tracer()
+    # Each stage is a span of the trace, see common/tracing.py
+    with tracer.span("rag_query", source_type=source_type_filter or "") as root:
+        # Identifier lookups without a filter are answered by the BM25 index, so the embedding model
+        # is not needed for them. Their cache entries are keyed by the question text instead, unless
+        # the lookup found nothing and the retriever embedded the question itself.
+        question_embedding = None
+        if source_type_filter or hybrid_retriever is None or hybrid_retriever.route(question) != "lexical":
+            with tracer.span("embed_query"):
+                question_embedding = get_embedding_function()([question])[0]
+        answer_cache = get_answer_cache()
+        context, retrieved_metadatas, context_ids, question_embedding = create_context_with_sources(
+            question, source_type_filter, question_embedding
+        )
 
-    prompt = f"""You are a sailing race official assistant for the 2026 Emerald Bay Championship.
+        # A similar question answered from the same documents can reuse the stored answer
+        answer = answer_cache.lookup(question_embedding, context_ids, question=question)
+        root.set(cache_hit=answer is not None)
+        if answer is not None:
+            print("Answer served from the semantic cache.")
+            return answer, retrieved_metadatas
+
+        prompt = f"""You are a sailing race official assistant for the 2026 Emerald Bay Championship.
 Answer the question using ONLY the information provided in the context below.
-For every fact you include in your answer, cite the source using the label provided
-in the [Source: (source_title), (source_url)] tag that follows each passage.
+Each passage starts with a reference id like [S1]. For every fact you include in your
+answer, cite the passage it comes from with its reference id, e.g. [S1] or [S2][S3].
+The source list at the end of the context shows which document each id refers to.
 If the context does not contain enough information to answer, say so clearly.
 
 Context:
@@ -90,16 +198,27 @@ Context:
 Question: {question}
 Answer:"""
 
-    response = model.generate_content(prompt)
-    answer = response.text.strip()
+        answer = query_gemini(prompt)
+        answer_cache.store(question, question_embedding, context_ids, answer)
+
+        return answer, retrieved_metadatas
 
-    return answer, retrieved_metadatas
+
+def query_gemini(prompt):
+    with get_tracer().span("llm", model=GEMINI_MODEL_NAME) as span:
+        # Streamed, so the trace shows the time to the first token
+        response = get_model().generate_content(prompt, stream=True)
+        for _ in response:
+            span.first_token()
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            span.set(prompt_tokens=usage.prompt_token_count, completion_tokens=usage.candidates_token_count)
+    return response.text.strip()
 
 
 def query_without_rag(question):
     prompt = f"Question: {question}\nAnswer:"
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    return query_gemini(prompt)
 
 
 def print_sources(metadatas):
@@ -109,60 +228,62 @@ def print_sources(metadatas):
         key = meta["source_url"]
         if key not in seen:
             seen.add(key)
-            print(f"  [{meta['source_type']}] {meta['source_title']}")
+            # Numbered like the [S#] reference ids in the answer
+            print(f"  [S{len(seen)}] [{meta['source_type']}] {meta['source_title']}")
             print(f"    Section : {meta['section']}")
             print(f"    URL     : {meta['source_url']}")
             print(f"    Issued  : {meta['published_date']} by {meta['published_by']}")
 
 
-# ---------------------------------------------------------------------------
-# Initialize the database
-# ---------------------------------------------------------------------------
-
-initVectorDb()
-
-# ---------------------------------------------------------------------------
-# Demo queries
-# ---------------------------------------------------------------------------
-
 DIVIDER = "=" * 70
 
-# --- Query 1: Flag signal question ---
-query1 = "What does a purple checkered flag mean?"
-
-print(f"\n{DIVIDER}")
-print("QUERY 1 (with RAG + citations)")
-print(DIVIDER)
-answer1, metas1 = rag_query_with_citations(query1)
-print(f"Question : {query1}")
-print(f"\nAnswer   :\n{answer1}")
-print_sources(metas1)
-
-print(f"\n{DIVIDER}")
-print("QUERY 1 (without RAG — no context)")
-print(DIVIDER)
-print(f"Question : {query1}")
-print(f"\nAnswer   :\n{query_without_rag(query1)}")
-
-# --- Query 2: Hazard / safety question ---
-# query2 = "Are there any depth hazards I should be aware of near the course?"
-
-# print(f"\n{DIVIDER}")
-# print("QUERY 2 (with RAG + citations)")
-# print(DIVIDER)
-# answer2, metas2 = rag_query_with_citations(query2)
-# print(f"Question : {query2}")
-# print(f"\nAnswer   :\n{answer2}")
-# print_sources(metas2)
-
-# # --- Query 3: Metadata-filtered query (Sailing Instructions only) ---
-# query3 = "What are the rules for the Masters division?"
-
-# print(f"\n{DIVIDER}")
-# print("QUERY 3 (Sailing Instructions only — metadata filter demo)")
-# print(DIVIDER)
-# answer3, metas3 = rag_query_with_citations(query3, source_type_filter="sailing_instructions")
-# print(f"Question : {query3}")
-# print(f"Filter   : source_type = 'sailing_instructions'")
-# print(f"\nAnswer   :\n{answer3}")
-# print_sources(metas3)
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG with metadata filters and source citations over sailing documents")
+    # Other example questions:
+    #   "Are there any depth hazards I should be aware of near the course?"
+    #   "What are the rules for the Masters division?" with --source-type sailing_instructions
+    parser.add_argument("--question", default="What does a purple checkered flag mean?")
+    parser.add_argument("--source-type", help="Only retrieve documents of this source_type, e.g. sailing_instructions")
+    parser.add_argument("--no-compare", action="store_true", help="Skip the answer without RAG")
+    parser.add_argument("--trace", action="append", choices=list(EXPORTERS),
+                        help="Export per-stage timings (repeatable), see common/tracing.py")
+    args = parser.parse_args()
+
+    if args.trace:
+        configure_tracing(args.trace)
+
+    # ---------------------------------------------------------------------------
+    # Initialize the database
+    # ---------------------------------------------------------------------------
+
+    initVectorDb()
+
+    # ---------------------------------------------------------------------------
+    # Demo query
+    # ---------------------------------------------------------------------------
+
+    print(f"\n{DIVIDER}")
+    if args.source_type:
+        print(f"QUERY (with RAG + citations, source_type = '{args.source_type}')")
+    else:
+        print("QUERY (with RAG + citations)")
+    print(DIVIDER)
+    answer, metas = rag_query_with_citations(args.question, source_type_filter=args.source_type)
+    print(f"Question : {args.question}")
+    if args.source_type:
+        print(f"Filter   : source_type = '{args.source_type}'")
+    print(f"\nAnswer   :\n{answer}")
+    print_sources(metas)
+
+    if not args.no_compare:
+        print(f"\n{DIVIDER}")
+        print("QUERY (without RAG — no context)")
+        print(DIVIDER)
+        print(f"Question : {args.question}")
+        print(f"\nAnswer   :\n{query_without_rag(args.question)}")
+    print(f"\nSemantic cache: {get_answer_cache().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 import getpass
 import os
+import sys
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+# Per-stage timings of each question, enabled with e.g. RAG_TRACE=console (see common/tracing.py)
+from tracing import get_tracer
+tracer = get_tracer()
 
 if not os.environ.get('GOOGLE_API_KEY'):
     os.environ['GOOGLE_API_KEY'] = getpass.getpass("Enter your Google API Key for Gemini Access: ")
@@ -11,38 +18,50 @@ llm = init_chat_model('gemini-2.5-flash', model_provider='google_genai')
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
 
-from langchain_core.vectorstores import InMemoryVectorStore
-vector_store = InMemoryVectorStore(embeddings)
+# Chunks are kept in a normalized NumPy matrix that is snapshotted to disk, and document embeddings
+# are cached by text hash, so a restart does not call the embedding API again
+from numpy_vector_store import NumpyVectorStore
+VECTOR_STORE_PATH = "./vector_store"
+EMBEDDING_CACHE_DIR = "./embedding_cache"
+vector_store = NumpyVectorStore.load_or_create(VECTOR_STORE_PATH, embeddings, cache_dir=EMBEDDING_CACHE_DIR)
 
 
 
 import bs4
 from langchain import hub
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langgraph.graph import START, StateGraph
 from typing_extensions import List, TypedDict
+from incremental_web_loader import IncrementalWebLoader
+from ingestion_pipeline import format_stats
 
 
 # Load and chunk contents of the blog
-loader = WebBaseLoader(
-    web_paths=("https://lilianweng.github.io/posts/2023-06-23-agent/",),
+# The loader fetches all pages concurrently with conditional requests (ETag / Last-Modified) and
+# remembers a hash of each page in WEB_LOADER_STATE, so only pages that changed since the last
+# run are parsed, split and embedded. Add more URLs to index more pages.
+WEB_LOADER_STATE = "./web_loader_state.json"
+loader = IncrementalWebLoader(
+    ["https://lilianweng.github.io/posts/2023-06-23-agent/"],
+    state_path=WEB_LOADER_STATE,
     bs_kwargs=dict(
         parse_only=bs4.SoupStrainer(
             class_=("post-content", "post-title", "post-header")
         )
     ),
 )
-docs = loader.load()
-
-
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-all_splits = text_splitter.split_documents(docs)
-print(f"Split blog post into {len(all_splits)} sub-documents.")
 
-# Do the indexing of the chunks
-vector_store.add_documents(all_splits)
+# Do the indexing of the changed pages' chunks. Changed pages stream through a pipeline where
+# downloading, splitting, embedding and indexing run at the same time (see ingestion_pipeline.py).
+# The vector store is saved, so the next run starts from the snapshot
+result = loader.sync(vector_store, text_splitter)
+print(f"Web pages: {result['changed']} changed, {result['unchanged']} unchanged, {result['removed']} removed, "
+      f"{result['failed']} failed. The vector store holds {len(vector_store)} sub-documents.")
+if result["changed"]:
+    print(format_stats(result["pipeline"]))
+    print(f"Embedding cache: {vector_store.embedding_cache.stats()}")
 
 # Next define the prompt by loading it from the Langchain prompt hub
 # Here is the direct link 
@@ -59,13 +78,27 @@ class State(TypedDict):
 # Define application steps for the langraph
 # Each step is a function that takes the current state and returns an updated state.
 def retrieve(state: State):
-    retrieved_docs = vector_store.similarity_search(state["question"])
+    # Embedding and search are separate steps, so each has its own span in the trace
+    with tracer.span("embed_query"):
+        query_embedding = embeddings.embed_query(state["question"])
+    with tracer.span("vector_search") as span:
+        retrieved_docs = vector_store.similarity_search_by_vector(query_embedding)
+        span.set(results=len(retrieved_docs))
     return {"context": retrieved_docs}
 
 def generate(state: State):
-    docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-    messages = prompt.invoke({"question": state["question"], "context": docs_content})
-    response = llm.invoke(messages)
+    with tracer.span("prompt_assembly"):
+        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
+        messages = prompt.invoke({"question": state["question"], "context": docs_content})
+    with tracer.span("llm", model="gemini-2.5-flash") as span:
+        # Streamed and joined, so the trace shows the time to the first token
+        response = None
+        for chunk in llm.stream(messages):
+            span.first_token()
+            response = chunk if response is None else response + chunk
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            span.set(prompt_tokens=usage["input_tokens"], completion_tokens=usage["output_tokens"])
     return {"answer": response.content}
 
 # Compile application and test
@@ -79,10 +112,12 @@ graph = graph_builder.compile()
 
 # Now we can run the application by invoking the graph with an initial state.
 # Invoke will return the final state once the execution is complete.
-response = graph.invoke({"question": "What is Task Decomposition?"})
+with tracer.span("rag_query"):
+    response = graph.invoke({"question": "What is Task Decomposition?"})
 print(response["answer"])
     
 # another option is to use streaming response
-for step in graph.stream({"question": "What is Task Decomposition?"}, stream_mode="messages"):
-    print(f"Step: {step[0]}, Output: {step[1]}")
+with tracer.span("rag_query", stream_mode="messages"):
+    for step in graph.stream({"question": "What is Task Decomposition?"}, stream_mode="messages"):
+        print(f"Step: {step[0]}, Output: {step[1]}")
 
@@ -0,0 +1,97 @@
+"""
+Benchmark: staged ingestion vs. the streaming IngestionPipeline.
+
+Serves --pages generated pages from the local test site of
+benchmark_web_loader.py and ingests them into a NumpyVectorStore twice:
+
+  - staged:    load all pages, then split all of them, then embed and index all
+               chunks (what the demo did with WebBaseLoader)
+  - pipelined: IngestionPipeline over IncrementalWebLoader.lazy_load(), all four
+               stages running at once with bounded queues in between
+
+The embedding model is a stand-in that sleeps --embed-ms per batch plus
+--embed-ms-per-chunk per chunk, like a remote embedding API, so nothing has to
+be downloaded. With --trace-memory, the peak memory of each run is traced with
+tracemalloc (which slows both runs down considerably).
+
+    python benchmark_ingestion_pipeline.py --pages 300 --latency-ms 20
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmark_web_loader import LocalSite
+from incremental_web_loader import IncrementalWebLoader
+from ingestion_pipeline import IngestionPipeline, format_stats
+from numpy_vector_store import NumpyVectorStore
+
+
+class SlowEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic fake embeddings with the latency of an embedding API."""
+
+    batch_seconds: float = 0.0
+    chunk_seconds: float = 0.0
+
+    def embed_documents(self, texts):
+        time.sleep(self.batch_seconds + self.chunk_seconds * len(texts))
+        return super().embed_documents(texts)
+
+
+def run(name, ingest, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = ingest()
+    seconds = time.perf_counter() - start
+    memory = ""
+    if trace_memory:
+        memory = f"   peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:>7.1f} MB"
+        tracemalloc.stop()
+    print(f"{name:<10} {seconds:>8.2f} s{memory}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated network latency per request")
+    parser.add_argument("--embed-ms", type=float, default=50, help="Simulated latency per embedding call")
+    parser.add_argument("--embed-ms-per-chunk", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--trace-memory", action="store_true", help="Report peak memory (slower)")
+    args = parser.parse_args()
+
+    embeddings = SlowEmbeddings(size=384, batch_seconds=args.embed_ms / 1000,
+                                chunk_seconds=args.embed_ms_per_chunk / 1000)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=30)
+
+    with LocalSite(args.pages, latency=args.latency_ms / 1000) as site:
+        def staged():
+            store = NumpyVectorStore(embeddings)
+            loader = IncrementalWebLoader(site.urls, state_path=None)
+            documents = loader.load()["documents"]
+            chunks = text_splitter.split_documents(documents)
+            for start in range(0, len(chunks), args.batch_size):
+                store.add_documents(chunks[start:start + args.batch_size])
+            return len(chunks)
+
+        def pipelined():
+            store = NumpyVectorStore(embeddings)
+            loader = IncrementalWebLoader(site.urls, state_path=None)
+            pipeline = IngestionPipeline(text_splitter, store, batch_size=args.batch_size)
+            return pipeline.run(loader.lazy_load())
+
+        print(f"{args.pages} pages, {args.latency_ms:g} ms latency, "
+              f"embedding {args.embed_ms:g} ms + {args.embed_ms_per_chunk:g} ms/chunk\n")
+        chunks = run("staged", staged, args.trace_memory)
+        stats = run("pipelined", pipelined, args.trace_memory)
+        print(f"\n{chunks} chunks\n")
+        print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark: IncrementalWebLoader against sequential loading, on a local test site.
+
+Starts a local HTTP server that serves --pages generated blog pages with ETag
+and Last-Modified headers (answering conditional requests with 304) and an
+optional per-request delay that stands in for network latency. Then measures:
+
+  - sequential:  GET and parse every page one after another (what WebBaseLoader does)
+  - first crawl: IncrementalWebLoader with an empty state (everything is new)
+  - unchanged:   the same loader again, nothing changed on the site
+  - HEAD only:   a HEAD request per page with the same connection pool, the lower bound
+                 for checking every page
+  - 5% changed:  a crawl after editing every 20th page
+
+    python benchmark_web_loader.py --pages 500 --latency-ms 20
+
+`LocalSite` can also serve as a fixture for trying the loader without network access.
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from incremental_web_loader import IncrementalWebLoader
+
+PARAGRAPH = ("Task decomposition breaks a complicated goal into smaller steps that an agent can plan and "
+             "execute one at a time, reflecting on the results as it goes. ")
+
+
+class LocalSite:
+    """
+    A local HTTP server with generated pages at /page/<n>, run in a background thread.
+
+    Args:
+        pages (int): Number of pages.
+        latency (float): Seconds each request waits before it is answered.
+        validators (bool): Send ETag/Last-Modified and answer conditional requests with 304.
+    """
+
+    def __init__(self, pages, latency=0.0, validators=True):
+        self.latency = latency
+        self.validators = validators
+        self.revisions = [0] * pages
+        self.modified = [formatdate(usegmt=True)] * pages
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so the client's connection pool is used
+
+            def do_GET(self):
+                self.respond(body=True)
+
+            def do_HEAD(self):
+                self.respond(body=False)
+
+            def respond(self, body):
+                time.sleep(site.latency)
+                try:
+                    number = int(self.path.rsplit("/", 1)[1])
+                    html = site.page(number).encode("utf-8")
+                except (ValueError, IndexError):
+                    self.send_error(404)
+                    return
+                etag = '"' + hashlib.md5(html).hexdigest() + '"'
+                if site.validators and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(html)))
+                if site.validators:
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", site.modified[number])
+                self.end_headers()
+                if body:
+                    self.wfile.write(html)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def urls(self):
+        port = self.server.server_address[1]
+        return [f"http://127.0.0.1:{port}/page/{n}" for n in range(len(self.revisions))]
+
+    def page(self, number):
+        return (f"<html><head><title>Post {number}</title></head><body>"
+                f"<div class='post-title'>Post {number} (revision {self.revisions[number]})</div>"
+                f"<div class='post-content'>{PARAGRAPH * 20}</div></body></html>")
+
+    def edit(self, number):
+        self.revisions[number] += 1
+        self.modified[number] = formatdate(usegmt=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def load_sequentially(urls):
+    from bs4 import BeautifulSoup
+
+    for url in urls:
+        BeautifulSoup(requests.get(url, timeout=30).text, "html.parser").get_text()
+
+
+def head_all(urls, workers):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda url: session.head(url, timeout=30), urls))
+    session.close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated network latency per request")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent requests of the incremental loader")
+    parser.add_argument("--skip-sequential", action="store_true", help="Skip the slow sequential baseline")
+    args = parser.parse_args()
+
+    with LocalSite(args.pages, latency=args.latency_ms / 1000) as site, tempfile.TemporaryDirectory() as directory:
+        state_path = os.path.join(directory, "state.json")
+
+        def crawl():
+            loader = IncrementalWebLoader(site.urls, state_path=state_path, max_workers=args.workers)
+            result = loader.load()
+            loader.save_state()
+            loader.close()
+            return f"{len(result['documents'])} changed, {len(result['unchanged'])} unchanged"
+
+        rows = []
+        if not args.skip_sequential:
+            rows.append(("sequential",) + timed(lambda: load_sequentially(site.urls) or f"{args.pages} parsed"))
+        rows.append(("first crawl",) + timed(crawl))
+        rows.append(("unchanged",) + timed(crawl))
+        rows.append(("HEAD only",) + timed(lambda: head_all(site.urls, args.workers) or f"{args.pages} HEAD"))
+        for number in range(0, args.pages, 20):
+            site.edit(number)
+        rows.append(("5% changed",) + timed(crawl))
+
+    print(f"{args.pages} pages, {args.latency_ms:g} ms latency, {args.workers} workers\n")
+    print(f"{'run':<12} {'seconds':>8}  result")
+    for name, seconds, result in rows:
+        print(f"{name:<12} {seconds:>8.2f}  {result}")
+
+
+if __name__ == "__main__":
+    main()
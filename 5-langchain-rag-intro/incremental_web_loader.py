@@ -0,0 +1,278 @@
+"""
+Concurrent, incremental web loader for the LangChain demo.
+
+`WebBaseLoader` downloads and parses every URL, one after another, on every
+run. `IncrementalWebLoader` keeps a small state file with what it saw last time
+and only does work for pages that changed:
+
+  - All URLs are fetched concurrently by a thread pool that shares one
+    `requests.Session` with a connection pool of the same size, so
+    connections to the same host are reused.
+  - Requests are conditional: the stored ETag and Last-Modified values are
+    sent as If-None-Match / If-Modified-Since, and a "304 Not Modified" answer
+    has no body. An unchanged page costs about as much as a HEAD request.
+  - Servers without validators send the full page; it counts as unchanged
+    when the hash of its bytes matches the stored one, so it is not parsed.
+  - A changed page is parsed with BeautifulSoup. If its extracted text is the
+    same as before (e.g. only a timestamp in a skipped part of the page
+    changed), it is not re-split or re-embedded either.
+
+`lazy_load()` yields each changed page as soon as it is downloaded. `sync()`
+streams them through an `IngestionPipeline` into a vector store: the chunks of
+changed pages are replaced, the chunks of pages that are no longer listed are
+deleted and unchanged pages are left alone.
+
+    loader = IncrementalWebLoader(urls, state_path="./web_loader_state.json", bs_kwargs=...)
+    stats = loader.sync(vector_store, text_splitter)
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from langchain_core.documents import Document
+from requests.adapters import HTTPAdapter
+
+DEFAULT_STATE_PATH = "./web_loader_state.json"
+
+
+def _hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class IncrementalWebLoader:
+    """
+    Loads web pages concurrently and only returns the ones that changed since the last run.
+
+    Args:
+        urls (list[str]): Pages to load.
+        state_path (str): JSON file with validators, hashes and chunk ids of each page.
+        max_workers (int): Concurrent requests, also the size of the connection pool.
+        timeout (float): Seconds per request.
+        bs_kwargs (dict, optional): Passed to BeautifulSoup, e.g. {"parse_only": SoupStrainer(...)}
+            as for WebBaseLoader.
+        headers (dict, optional): Extra request headers, e.g. a User-Agent.
+    """
+
+    def __init__(self, urls, state_path=DEFAULT_STATE_PATH, max_workers=16, timeout=30, bs_kwargs=None, headers=None):
+        self.urls = list(dict.fromkeys(urls))
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.bs_kwargs = bs_kwargs or {}
+        self.state = self._load_state()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def _load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        """Write the page state atomically. Call it after the vector store has been saved."""
+        if not self.state_path:
+            return
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def close(self):
+        self.session.close()
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+
+    def _fetch(self, url):
+        """Conditional GET of one page. Returns (status, page state or None, html or None)."""
+        previous = self.state.get(url, {})
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return "unchanged", None, None
+        response.raise_for_status()
+
+        page = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": _hash(response.content),
+        }
+        if page["content_hash"] == previous.get("content_hash"):
+            # Same bytes from a server without (or with changed) validators
+            return "unchanged", page, None
+        return "changed", page, response.text
+
+    def fetch(self):
+        """
+        Fetch all URLs concurrently, yielding results as they complete.
+
+        Yields:
+            tuple: (url, status, page state, html), status being "changed", "unchanged" or "failed"
+                (with the exception in place of the html).
+        """
+        def fetch_one(url):
+            try:
+                return (url,) + self._fetch(url)
+            except requests.RequestException as e:
+                return url, "failed", None, e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for future in as_completed([pool.submit(fetch_one, url) for url in self.urls]):
+                yield future.result()
+
+    def parse(self, url, html):
+        """Turn a page into a Document like WebBaseLoader does: the text of the (filtered) soup."""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser", **self.bs_kwargs)
+        metadata = {"source": url}
+        if soup.title is not None:
+            metadata["title"] = soup.title.get_text()
+        return Document(page_content=soup.get_text(), metadata=metadata)
+
+    def _new_result(self):
+        return {"changed": 0, "unchanged": [], "removed": [], "failed": {}}
+
+    def lazy_load(self, result=None):
+        """
+        Fetch all pages and yield a Document for each page whose text changed, as soon as it arrives.
+
+        Page state is updated in memory; `save_state()` persists it. Pass a dict from `load()`'s
+        format as `result` to also count the changed pages and collect the unchanged, removed and
+        failed ones.
+        """
+        result = result if result is not None else self._new_result()
+        for url, status, page, body in self.fetch():
+            if status == "failed":
+                result["failed"][url] = repr(body)
+                continue
+            previous = self.state.get(url, {})
+            if status == "unchanged":
+                if page is not None:
+                    self.state[url] = {**previous, **page}
+                result["unchanged"].append(url)
+                continue
+
+            document = self.parse(url, body)
+            page["text_hash"] = _hash(document.page_content)
+            self.state[url] = {**previous, **page}
+            if page["text_hash"] == previous.get("text_hash"):
+                result["unchanged"].append(url)  # Only markup outside the extracted text changed
+            else:
+                result["changed"] += 1
+                yield document
+
+        listed = set(self.urls)
+        result["removed"] = [url for url in self.state if url not in listed]
+
+    def load(self):
+        """
+        Fetch all pages and parse the changed ones.
+
+        Returns:
+            dict: "documents" (Documents of pages whose text changed) and their number "changed",
+                "unchanged", "removed" (pages in the state that are no longer in `urls`), "failed"
+                ({url: error}) and "seconds".
+        """
+        start = time.perf_counter()
+        result = self._new_result()
+        result["documents"] = list(self.lazy_load(result))
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    # ------------------------------------------------------------------
+    # Applying changes to a vector store
+    # ------------------------------------------------------------------
+
+    def _forget_unindexed_pages(self, vector_store):
+        """
+        Drop the validators and hashes of pages whose chunks are not all in the vector store.
+
+        This happens when the store was deleted or saved before a crash while the state
+        survived. Those pages are then downloaded and indexed again as if they were new.
+
+        Returns:
+            int: Number of pages that will be re-indexed.
+        """
+        pages = [page for page in self.state.values() if page.get("chunk_ids") is None or page["chunk_ids"]]
+        ids = [chunk_id for page in pages for chunk_id in page.get("chunk_ids") or []]
+        try:
+            stored = {document.id for document in vector_store.get_by_ids(ids)} if ids else set()
+        except NotImplementedError:
+            return 0  # The store cannot be checked, trust the state
+        forgotten = 0
+        for page in pages:
+            if page.get("chunk_ids") is None or not stored.issuperset(page["chunk_ids"]):
+                for key in ("etag", "last_modified", "content_hash", "text_hash"):
+                    page.pop(key, None)
+                forgotten += 1
+        return forgotten
+
+    def sync(self, vector_store, text_splitter, batch_size=64):
+        """
+        Load the pages and bring the vector store up to date.
+
+        Changed pages stream through an `IngestionPipeline` (split, embed and index run while
+        further pages are still downloading) and their chunks replace the previous ones. Chunks
+        of removed pages are deleted. The store is saved (if it has a `save()` method) before the
+        page state, so an interrupted run re-processes the pages instead of losing them. Pages
+        whose chunks are missing from the store (e.g. because it was deleted) are re-indexed.
+
+        Returns:
+            dict: Page counts per status, the number of pages re-indexed because their chunks
+                were missing, the number of new chunks, the elapsed seconds and the pipeline
+                statistics per stage.
+        """
+        from ingestion_pipeline import IngestionPipeline
+
+        result = self._new_result()
+        reindexed = self._forget_unindexed_pages(vector_store)
+
+        def replace_chunks():
+            # Old chunks of a page are deleted before its new chunks enter the pipeline
+            for document in self.lazy_load(result):
+                page = self.state[document.metadata["source"]]
+                if page.get("chunk_ids"):
+                    vector_store.delete(page["chunk_ids"])
+                page["chunk_ids"] = []
+                yield document
+
+        def record_ids(chunks, ids):
+            for chunk, chunk_id in zip(chunks, ids):
+                self.state[chunk.metadata["source"]]["chunk_ids"].append(chunk_id)
+
+        pipeline = IngestionPipeline(text_splitter, vector_store, batch_size=batch_size, on_indexed=record_ids)
+        stats = pipeline.run(replace_chunks())
+        for url in result["removed"]:
+            vector_store.delete(self.state.pop(url).get("chunk_ids", []))
+
+        if hasattr(vector_store, "save"):
+            vector_store.save()
+        self.save_state()
+        return {
+            "changed": result["changed"],
+            "unchanged": len(result["unchanged"]),
+            "removed": len(result["removed"]),
+            "failed": len(result["failed"]),
+            "reindexed": reindexed,
+            "chunks": stats["chunks"],
+            "seconds": stats["seconds"],
+            "pipeline": stats,
+        }
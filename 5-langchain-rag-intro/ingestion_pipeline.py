@@ -0,0 +1,245 @@
+"""
+Streaming load -> split -> embed -> index pipeline with backpressure.
+
+Loading all pages, then splitting all of them, then embedding and indexing
+every chunk keeps the whole document set in memory and leaves the network,
+the CPU and the embedding API idle in turn. `IngestionPipeline` runs the four
+stages at the same time, each in its own thread, connected by bounded queues:
+
+    documents --> [load] --q--> [split] --q--> [embed] --q--> [index] --> vector store
+
+  - load:  iterates the source, e.g. `IncrementalWebLoader.lazy_load()`, which
+           yields each page as soon as it is downloaded
+  - split: `text_splitter.split_documents()` per document
+  - embed: collects chunks into batches of `batch_size` and embeds each batch
+           in one call (through the vector store's embedding cache if it has one)
+  - index: adds each batch with its embeddings to the vector store
+
+When a stage is slower than the one before it, its input queue fills up and
+the upstream stage blocks on `put()`, so at most `queue_size` items wait
+between two stages and memory stays bounded however large the source is.
+
+`run()` returns statistics per stage: items in and out, busy seconds (time
+spent working rather than waiting), throughput while busy, and the mean and
+maximum depth of its input queue. The stage with the highest busy share is
+reported as the bottleneck; a full queue in front of it confirms it.
+
+    pipeline = IngestionPipeline(text_splitter, vector_store, batch_size=64)
+    stats = pipeline.run(loader.lazy_load())
+    print(format_stats(stats))
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()  # End of stream marker passed down the queues
+
+
+class _StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self.depth_max = 0
+
+    def sample_depth(self, depth):
+        self.depth_sum += depth
+        self.depth_samples += 1
+        self.depth_max = max(self.depth_max, depth)
+
+    def as_dict(self, seconds):
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": round(self.busy, 3),
+            "busy_share": round(self.busy / seconds, 3) if seconds else 0.0,
+            "items_per_second": round(self.items_in / self.busy, 1) if self.busy else None,
+            "queue_depth_mean": round(self.depth_sum / self.depth_samples, 2) if self.depth_samples else 0.0,
+            "queue_depth_max": self.depth_max,
+        }
+
+
+class IngestionPipeline:
+    """
+    Concurrent ingestion of documents into a vector store.
+
+    Args:
+        text_splitter (TextSplitter): Splits each document into chunks, e.g. RecursiveCharacterTextSplitter.
+        vector_store (VectorStore): Target store. With an `add_vectors(vectors, texts, metadatas)` method
+            (NumpyVectorStore) chunks are embedded in the embed stage, otherwise the index stage calls
+            `add_documents()` and the store embeds them itself.
+        batch_size (int): Chunks per embedding call and per index call.
+        queue_size (int): Capacity of each queue between two stages.
+        on_indexed (callable, optional): Called from the index stage with (chunks, ids) after each batch.
+    """
+
+    def __init__(self, text_splitter, vector_store, batch_size=64, queue_size=8, on_indexed=None):
+        self.text_splitter = text_splitter
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_indexed = on_indexed
+        self._error = None
+        self._failed = threading.Event()
+
+    def _embed(self, texts):
+        if hasattr(self.vector_store, "embed_texts"):
+            return self.vector_store.embed_texts(texts)
+        return self.vector_store.embeddings.embed_documents(texts)
+
+    # ------------------------------------------------------------------
+    # Queue helpers: a failing stage must not leave the others blocked forever
+    # ------------------------------------------------------------------
+
+    def _put(self, out_queue, item):
+        while not self._failed.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _items(self, in_queue, stats):
+        """Yield the items of a queue until the end marker, sampling the queue depth."""
+        while not self._failed.is_set():
+            try:
+                item = in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            stats.sample_depth(in_queue.qsize() + 1)
+            yield item
+
+    def _run_stage(self, work, stats, out_queue):
+        try:
+            work(stats)
+        except BaseException as e:
+            self._error = self._error or e
+            self._failed.set()
+        finally:
+            if out_queue is not None:
+                self._put(out_queue, _DONE)
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def run(self, documents):
+        """
+        Ingest an iterable of Documents and return per-stage statistics.
+
+        Raises the first exception of any stage after all stages have stopped.
+        """
+        self._error = None
+        self._failed.clear()
+        documents_queue, chunks_queue, batches_queue = (queue.Queue(self.queue_size) for _ in range(3))
+        stats = {name: _StageStats(name) for name in ("load", "split", "embed", "index")}
+        embeds_here = hasattr(self.vector_store, "add_vectors")
+
+        def load(stage):
+            iterator = iter(documents)
+            while True:
+                start = time.perf_counter()
+                document = next(iterator, _DONE)
+                stage.busy += time.perf_counter() - start
+                if document is _DONE or not self._put(documents_queue, document):
+                    return
+                stage.items_in += 1
+                stage.items_out += 1
+
+        def split(stage):
+            for document in self._items(documents_queue, stage):
+                start = time.perf_counter()
+                chunks = self.text_splitter.split_documents([document])
+                stage.busy += time.perf_counter() - start
+                stage.items_in += 1
+                for chunk in chunks:
+                    if not self._put(chunks_queue, chunk):
+                        return
+                stage.items_out += len(chunks)
+
+        def embed(stage):
+            batch = []
+
+            def flush():
+                start = time.perf_counter()
+                vectors = self._embed([chunk.page_content for chunk in batch]) if embeds_here else None
+                stage.busy += time.perf_counter() - start
+                stage.items_out += len(batch)
+                return self._put(batches_queue, (list(batch), vectors))
+
+            for chunk in self._items(chunks_queue, stage):
+                stage.items_in += 1
+                batch.append(chunk)
+                if len(batch) == self.batch_size:
+                    if not flush():
+                        return
+                    batch.clear()
+            if batch and not self._failed.is_set():
+                flush()
+
+        def index(stage):
+            for chunks, vectors in self._items(batches_queue, stage):
+                start = time.perf_counter()
+                if vectors is not None:
+                    ids = self.vector_store.add_vectors(
+                        vectors, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks],
+                        [chunk.id for chunk in chunks],
+                    )
+                else:
+                    ids = self.vector_store.add_documents(chunks)
+                if self.on_indexed is not None:
+                    self.on_indexed(chunks, ids)
+                stage.busy += time.perf_counter() - start
+                stage.items_in += len(chunks)
+                stage.items_out += len(chunks)
+
+        stages = [
+            (load, stats["load"], documents_queue),
+            (split, stats["split"], chunks_queue),
+            (embed, stats["embed"], batches_queue),
+            (index, stats["index"], None),
+        ]
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_stage, args=stage, name=f"ingest-{stage[1].name}", daemon=True)
+            for stage in stages
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+        result = {name: stage.as_dict(seconds) for name, stage in stats.items()}
+        return {
+            "seconds": round(seconds, 3),
+            "documents": stats["load"].items_out,
+            "chunks": stats["index"].items_out,
+            "bottleneck": max(result, key=lambda name: result[name]["busy_share"]),
+            "stages": result,
+        }
+
+
+def format_stats(stats):
+    """Human-readable table of the statistics returned by `IngestionPipeline.run()`."""
+    lines = [
+        f"Ingested {stats['documents']} documents as {stats['chunks']} chunks in {stats['seconds']:.2f} s "
+        f"(bottleneck: {stats['bottleneck']})",
+        f"  {'stage':<6} {'in':>7} {'out':>7} {'busy s':>8} {'busy %':>7} {'items/s':>9} {'queue avg':>10} {'max':>4}",
+    ]
+    for name, stage in stats["stages"].items():
+        rate = f"{stage['items_per_second']:>9.1f}" if stage["items_per_second"] is not None else f"{'-':>9}"
+        lines.append(
+            f"  {name:<6} {stage['items_in']:>7} {stage['items_out']:>7} {stage['busy_seconds']:>8.2f} "
+            f"{stage['busy_share']:>7.0%} {rate} {stage['queue_depth_mean']:>10.1f} {stage['queue_depth_max']:>4}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,284 @@
+"""
+LangChain vector store backed by one contiguous, normalized NumPy matrix.
+
+`InMemoryVectorStore` keeps every chunk in a dict and builds a fresh array of
+all embeddings on each search, and nothing survives a restart, so every run
+embeds the whole blog post again. `NumpyVectorStore` is a drop-in replacement:
+
+  - Embeddings are kept L2-normalized in a preallocated float32 matrix, so a
+    search is one matrix-vector product plus `np.argpartition` for the top-k,
+    which stays fast for millions of chunks.
+  - `save()` writes a snapshot (vectors-<id>.npy plus the texts, metadata and
+    the name of that vectors file in store.json) and `load()` restores it
+    without any embedding calls.
+  - Document embeddings can go through the shared `EmbeddingCache`, keyed by a
+    hash of the text, so re-adding unchanged chunks after a restart does not
+    call the embedding API either.
+
+Chunks added without ids get an id derived from their text and metadata, so
+adding the same chunk twice replaces it instead of storing a duplicate. The
+store is thread-safe, e.g. for the index stage of the ingestion pipeline.
+
+    store = NumpyVectorStore.load_or_create("./vector_store", embeddings, cache_dir="./embedding_cache")
+    store.add_documents(splits)
+    store.save()
+    docs = store.similarity_search("What is Task Decomposition?", k=4)
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+# Helpers shared between the demos live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from embedding_cache import EmbeddingCache
+
+VECTORS_FILE = "vectors.npy"  # Snapshots written before vectors files were named per snapshot
+DOCUMENTS_FILE = "store.json"
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1e-12
+    return vectors / norms
+
+
+def document_id(text, metadata):
+    """Stable id of a chunk: a hash of its text and metadata."""
+    payload = text + "\0" + json.dumps(metadata or {}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Cosine-similarity vector store on a contiguous NumPy matrix, with disk snapshots.
+
+    Args:
+        embedding (Embeddings): LangChain embedding model used for documents and queries.
+        path (str, optional): Snapshot directory used by `save()` when it is called without a path.
+        cache_dir (str, optional): Directory of an `EmbeddingCache` for document embeddings.
+        model_name (str, optional): Cache key of the embedding model. Defaults to the model's
+            `model` attribute or its class name.
+    """
+
+    def __init__(self, embedding, path=None, cache_dir=None, model_name=None):
+        self.embedding = embedding
+        self.path = path
+        self.model_name = model_name or getattr(embedding, "model", None) or type(embedding).__name__
+        self.embedding_cache = EmbeddingCache(cache_dir, self.model_name) if cache_dir else None
+
+        self._vectors = None  # (capacity, dim) float32, rows [0, len(self)) are in use
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._rows = {}  # id -> row
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    # ------------------------------------------------------------------
+    # Adding and removing documents
+    # ------------------------------------------------------------------
+
+    def embed_texts(self, texts):
+        """Embeddings of texts, through the embedding cache if there is one."""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(texts, self.embedding.embed_documents)
+        return np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self.embed_texts(texts), texts, metadatas, ids)
+
+    def add_vectors(self, vectors, texts, metadatas=None, ids=None):
+        """
+        Add (or replace, by id) documents with precomputed embeddings.
+
+        Returns:
+            list[str]: The ids of the documents.
+        """
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = [
+            doc_id if doc_id is not None else document_id(text, metadata)
+            for doc_id, text, metadata in zip(ids or [None] * len(texts), texts, metadatas)
+        ]
+        vectors = _normalize(vectors)
+        if vectors.shape[0] != len(texts):
+            raise ValueError(f"Got {vectors.shape[0]} embeddings for {len(texts)} texts")
+        with self._lock:
+            self._reserve(len(self) + len(texts), vectors.shape[1])
+            for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._texts.append(text)
+                    self._metadatas.append(metadata)
+                else:
+                    self._texts[row] = text
+                    self._metadatas[row] = metadata
+                self._vectors[row] = vector
+        return ids
+
+    def _reserve(self, size, dim):
+        """Make room for `size` rows, growing the matrix geometrically so appends are amortized O(1)."""
+        if self._vectors is None:
+            self._vectors = np.empty((max(size, 1024), dim), dtype=np.float32)
+        elif self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match the store's dimension {self._vectors.shape[1]}")
+        elif size > len(self._vectors):
+            grown = np.empty((max(size, 2 * len(self._vectors)), dim), dtype=np.float32)
+            grown[:len(self)] = self._vectors[:len(self)]
+            self._vectors = grown
+
+    def delete(self, ids=None, **kwargs):
+        """Delete documents by id. The last row is moved into each freed row, so the matrix stays contiguous."""
+        if ids is None:
+            return False
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._ids[row], self._texts[row], self._metadatas[row] = (
+                        moved_id, self._texts[last], self._metadatas[last]
+                    )
+                    self._vectors[row] = self._vectors[last]
+                    self._rows[moved_id] = row
+                self._ids.pop()
+                self._texts.pop()
+                self._metadatas.pop()
+        return True
+
+    def get_by_ids(self, ids):
+        with self._lock:
+            return [self._document(self._rows[doc_id]) for doc_id in ids if doc_id in self._rows]
+
+    def _document(self, row):
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        """
+        The k documents most similar to an embedding, with their cosine similarity.
+
+        Args:
+            filter (callable, optional): Function Document -> bool, as in InMemoryVectorStore.
+        """
+        with self._lock:
+            if not len(self) or k <= 0:
+                return []
+            scores = self._vectors[:len(self)] @ _normalize(embedding)
+
+            if filter is None:
+                k = min(k, len(scores))
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top], kind="stable")]
+                return [(self._document(row), float(scores[row])) for row in top]
+
+            # Walk down the ranking until k documents pass the filter
+            results = []
+            for row in np.argsort(-scores, kind="stable"):
+                document = self._document(row)
+                if filter(document):
+                    results.append((document, float(scores[row])))
+                    if len(results) == k:
+                        break
+            return results
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: min(1.0, max(0.0, (score + 1) / 2))
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def save(self, path=None):
+        """
+        Write the vectors and documents to a directory.
+
+        Each snapshot writes its vectors to a new file, and store.json, which names that file, is
+        replaced last. A crash at any point leaves the previous snapshot intact. Vectors files of
+        older snapshots are deleted afterwards.
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No snapshot path given")
+        os.makedirs(path, exist_ok=True)
+        vectors_file = f"vectors-{uuid.uuid4().hex}.npy"
+        with self._lock:
+            vectors = self._vectors[:len(self)] if self._vectors is not None else np.empty((0, 0), dtype=np.float32)
+            with open(os.path.join(path, vectors_file), "wb") as f:
+                np.save(f, vectors)
+            with open(os.path.join(path, DOCUMENTS_FILE + ".tmp"), "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "count": len(self), "vectors_file": vectors_file,
+                           "ids": self._ids, "texts": self._texts, "metadatas": self._metadatas}, f)
+            os.replace(os.path.join(path, DOCUMENTS_FILE + ".tmp"), os.path.join(path, DOCUMENTS_FILE))
+
+        # Remove the vectors of earlier snapshots, including ones orphaned by an interrupted save
+        for old_file in glob.glob(os.path.join(path, "vectors*.npy")):
+            if os.path.basename(old_file) != vectors_file:
+                os.remove(old_file)
+
+    @classmethod
+    def load(cls, path, embedding, **kwargs):
+        """Restore a snapshot written by `save()`. No embeddings are computed."""
+        with open(os.path.join(path, DOCUMENTS_FILE), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        vectors = np.load(os.path.join(path, snapshot.get("vectors_file", VECTORS_FILE)))
+        if len(vectors) != snapshot["count"]:
+            raise ValueError(f"Snapshot in {path} is incomplete: {len(vectors)} vectors for {snapshot['count']} documents")
+
+        store = cls(embedding, path=path, **kwargs)
+        if snapshot["model_name"] != store.model_name:
+            raise ValueError(f"Snapshot in {path} was built with '{snapshot['model_name']}', not '{store.model_name}'")
+        if snapshot["count"]:
+            store.add_vectors(vectors, snapshot["texts"], snapshot["metadatas"], snapshot["ids"])
+        return store
+
+    @classmethod
+    def load_or_create(cls, path, embedding, **kwargs):
+        """Load the snapshot in `path` if there is one, otherwise return an empty store that saves there."""
+        if os.path.exists(os.path.join(path, DOCUMENTS_FILE)):
+            return cls.load(path, embedding, **kwargs)
+        return cls(embedding, path=path, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,61 @@
+"""
+Benchmark: tail latency of a single provider vs. hedged requests across two providers.
+
+Uses StubChatModel, so no API keys are needed. The primary stub answers quickly
+but has a slow tail (a fraction of requests wait `--tail-latency` seconds for
+the first token); the second stub is a little slower but steady. Requests are
+sent one after another, first to the primary alone and then through the
+HedgedRouter.
+
+    python benchmark_hedging.py --requests 300 --tail-probability 0.03
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from hedged_router import HedgedRouter, StubChatModel
+
+
+async def measure(router, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await router.ainvoke("Explain LLM prompting in a concise way")
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--primary-latency", type=float, default=0.05, help="Usual first-token latency of the primary")
+    parser.add_argument("--tail-latency", type=float, default=1.5, help="First-token latency of slow primary requests")
+    parser.add_argument("--tail-probability", type=float, default=0.03)
+    parser.add_argument("--secondary-latency", type=float, default=0.1, help="First-token latency of the hedge provider")
+    args = parser.parse_args()
+
+    primary = StubChatModel(
+        first_token_latency=args.primary_latency,
+        tail_latency=args.tail_latency,
+        tail_probability=args.tail_probability,
+    )
+    secondary = StubChatModel(first_token_latency=args.secondary_latency)
+
+    routers = {
+        "primary only": HedgedRouter({"primary": primary}),
+        "hedged": HedgedRouter({"primary": primary, "secondary": secondary}, min_samples=20),
+    }
+    for name, router in routers.items():
+        latencies = asyncio.run(measure(router, args.requests))
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(
+            f"{name:<14} p50 {1000 * p50:7.1f} ms | p95 {1000 * p95:7.1f} ms | p99 {1000 * p99:7.1f} ms | "
+            f"hedged {router.hedged_requests} of {args.requests}, wins {router.wins}"
+        )
+
+
+if __name__ == "__main__":
+    main()
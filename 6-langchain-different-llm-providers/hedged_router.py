@@ -0,0 +1,254 @@
+"""
+Hedged, first-wins requests across several LangChain chat models.
+
+A single provider's slow tail (a cold start, a queue, a retry) ends up directly
+in the user's wait time. `HedgedRouter` sends the request to the primary model
+and, if no first token has arrived after a hedge delay, sends the same request
+to the next model as well. Whichever model streams its first token first wins:
+its answer is streamed to the caller and the other requests are cancelled.
+
+The hedge delay of each model comes from a histogram of its past time-to-first-
+token, by default its 95th percentile. So only about 5% of the requests are
+hedged, but exactly the slow ones.
+
+Any chat model with LangChain's `astream` works, e.g. models created with
+`init_chat_model`. `StubChatModel` is a local stand-in with configurable latency
+for trying the router without API keys.
+
+Usage:
+
+    router = HedgedRouter({"mistral": mistral_llm, "gemini": gemini_llm})
+    async for chunk in router.astream(prompt):
+        print(chunk.content, end="", flush=True)
+"""
+
+import asyncio
+import bisect
+import random
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LatencyHistogram:
+    """Latency samples of one provider counted in logarithmic buckets (10 ms to about 100 s)."""
+
+    def __init__(self, smallest=0.01, growth=1.25, buckets=42):
+        self.bounds = [smallest * growth ** i for i in range(buckets)]
+        self.counts = [0] * (buckets + 1)  # The last bucket counts everything above the largest bound
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket containing the q-quantile, or None without samples."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.bounds[-1]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class HedgedRouter:
+    """
+    Streams the answer of whichever chat model produces a first token first.
+
+    Args:
+        models (dict): Provider name -> chat model, in order of preference. The first one is the primary.
+        hedge_quantile (float): Time-to-first-token quantile of a model after which the next one is asked too.
+        default_hedge_delay (float): Hedge delay in seconds until a model has `min_samples` measurements.
+        min_hedge_delay (float): Lower limit of the hedge delay, so a fast history does not hedge everything.
+        max_hedge_delay (float): Upper limit of the hedge delay.
+        min_samples (int): Measurements needed before the histogram decides the hedge delay.
+    """
+
+    def __init__(self, models, hedge_quantile=0.95, default_hedge_delay=2.0, min_hedge_delay=0.05,
+                 max_hedge_delay=10.0, min_samples=20):
+        if not models:
+            raise ValueError("At least one model is required")
+        self.models = dict(models)
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.min_samples = min_samples
+        self.histograms = {name: LatencyHistogram() for name in self.models}
+        self.wins = {name: 0 for name in self.models}
+        self.failures = {name: 0 for name in self.models}
+        self.hedged_requests = 0
+        self.last_winner = None
+
+    def hedge_delay(self, name):
+        """Seconds to wait for the first token of `name` before asking the next model."""
+        histogram = self.histograms[name]
+        if histogram.count < self.min_samples:
+            return self.default_hedge_delay
+        delay = histogram.quantile(self.hedge_quantile)
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, delay))
+
+    async def _first_chunk(self, name, input, kwargs):
+        """Start streaming from one model and wait for its first chunk."""
+        stream = self.models[name].astream(input, **kwargs)
+        start = time.perf_counter()
+        try:
+            first = await stream.__anext__()
+        except BaseException:
+            await stream.aclose()
+            raise
+        self.histograms[name].record(time.perf_counter() - start)
+        return name, first, stream
+
+    async def astream(self, input, **kwargs):
+        """
+        Stream the answer of the first model to respond.
+
+        Args:
+            input: Prompt, as for the chat model's astream (a string or a list of messages).
+            **kwargs: Passed on to every model's astream.
+
+        Yields:
+            Chunks (AIMessageChunk) of the winning model. The winner is stored in `last_winner`.
+        """
+        names = list(self.models)
+        launched = 0
+        pending = set()
+        started = {}
+        errors = []
+
+        def launch():
+            nonlocal launched
+            name = names[launched]
+            launched += 1
+            started[name] = time.perf_counter()
+            pending.add(asyncio.create_task(self._first_chunk(name, input, kwargs), name=name))
+            return name
+
+        current = launch()
+        winner = None
+        try:
+            while winner is None:
+                timeout = self.hedge_delay(current) if launched < len(names) else None
+                done, pending_after = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                pending.clear()
+                pending.update(pending_after)
+
+                if not done:
+                    # No first token within the hedge delay: ask the next model as well
+                    current = launch()
+                    self.hedged_requests += 1
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        if winner is None:
+                            winner = task.result()
+                        else:
+                            # Two models answered at the same moment, keep the first
+                            await task.result()[2].aclose()
+                    else:
+                        self.failures[task.get_name()] += 1
+                        errors.append(task.exception())
+                if winner is None and not pending:
+                    if launched == len(names):
+                        raise RuntimeError(f"All providers failed: {errors}") from errors[-1]
+                    # Do not wait for the hedge delay when the running model failed
+                    current = launch()
+        finally:
+            # Cancel the losers (or everything, if the caller stopped early). A loser that ran past
+            # its own hedge delay was slow: its time so far is recorded as a lower bound, otherwise
+            # the slow requests that got hedged would be missing from the histogram and the hedge
+            # delay would drift down. A hedge cut short because another model won says nothing
+            # about its latency and is not recorded.
+            for task in pending:
+                task.cancel()
+                name = task.get_name()
+                elapsed = time.perf_counter() - started[name]
+                if elapsed >= self.hedge_delay(name):
+                    self.histograms[name].record(elapsed)
+            for task in pending:
+                try:
+                    name, _, stream = await task
+                    await stream.aclose()
+                except BaseException:
+                    pass
+
+        name, first, stream = winner
+        self.wins[name] += 1
+        self.last_winner = name
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def ainvoke(self, input, **kwargs):
+        """Return the complete answer of the first model to respond as a string."""
+        return "".join([chunk.content async for chunk in self.astream(input, **kwargs)])
+
+    def stats(self):
+        """Requests won, failures and time-to-first-token percentiles of every model."""
+        return {
+            name: {
+                "wins": self.wins[name],
+                "failures": self.failures[name],
+                "samples": histogram.count,
+                "p50_ttft": histogram.quantile(0.5),
+                "p95_ttft": histogram.quantile(0.95),
+                "hedge_delay": self.hedge_delay(name),
+            }
+            for name, histogram in self.histograms.items()
+        }
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Local chat model for trying the router without API keys.
+
+    Streams `response` word by word after a first-token latency. With probability
+    `tail_probability` the first token takes `tail_latency` instead, imitating a
+    provider's slow tail. With `fail=True` every request raises.
+    """
+
+    response: str = "Prompting means giving a language model clear instructions and context."
+    first_token_latency: float = 0.1
+    tail_latency: float = 2.0
+    tail_probability: float = 0.0
+    token_latency: float = 0.01
+    fail: bool = False
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _first_token_delay(self):
+        return self.tail_latency if random.random() < self.tail_probability else self.first_token_latency
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.fail:
+            raise RuntimeError("Stub provider failure")
+        time.sleep(self._first_token_delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._first_token_delay())
+        if self.fail:
+            raise RuntimeError("Stub provider failure")
+        for i, word in enumerate(self.response.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
@@ -1,42 +1,108 @@
+import argparse
+import asyncio
 import os
-from langchain.chat_models import init_chat_model
 
 # Comparing Mistral, OpenAI (Azure), and Gemini with langchain
 
-# API keys from environment variables
-if not os.environ.get('MISTRAL_API_KEY'):
-    raise ValueError("MISTRAL_API_KEY environment variable not set")
+# Our prompt
+DEFAULT_PROMPT = "Explain LLM prompting in a concise way"
 
-if not os.environ.get('AZURE_API_KEY'):
-    raise ValueError("AZURE_API_KEY environment variable not set")
+# Chat models are created on first use, so importing this module is fast and only
+# the API keys of the providers that are actually used have to be set
+_mistral_llm = None
+_gemini_llm = None
+_hedged_router = None
 
-if not os.environ.get('AZURE_ENDPOINT'):
-    raise ValueError("AZURE_ENDPOINT environment variable not set")
 
-if not os.environ.get('GEMINI_API_KEY'):
-    raise ValueError("GEMINI_API_KEY environment variable not set")
+def require_env(name):
+    """Return an API key (or other setting) from the environment, raising if it is not set."""
+    value = os.environ.get(name)
+    if not value:
+        raise ValueError(f"{name} environment variable not set")
+    return value
 
 
-# Our prompt
-prompt = "Explain LLM prompting in a concise way"
-
-# Example of how to initialize different LLMs using langchain's init_chat_model
-# Mistral model names here: https://docs.mistral.ai/getting-started/models/models_overview/
-mistral_llm = init_chat_model(
-    model="magistral-small-latest",
-    model_provider="mistral",
-    api_key=os.environ['MISTRAL_API_KEY'],
-    temperature=0.7,
-    max_retries=3
-)
-
-# Streaming output from mistral model
-for chunk in mistral_llm.stream(prompt):
-    print(chunk, end='', flush=True)
-
-# Get full response from mistral model
-#response = mistral_llm.invoke(prompt)
-
-# Your task, implement the same for Azure OpenAI and Google Gemini
-# Make sure to use the appropriate model names and parameters for each provider
+def get_mistral_llm():
+    global _mistral_llm
+    if _mistral_llm is None:
+        from langchain.chat_models import init_chat_model
+
+        # Example of how to initialize different LLMs using langchain's init_chat_model
+        # Mistral model names here: https://docs.mistral.ai/getting-started/models/models_overview/
+        _mistral_llm = init_chat_model(
+            model="magistral-small-latest",
+            model_provider="mistral",
+            api_key=require_env('MISTRAL_API_KEY'),
+            temperature=0.7,
+            max_retries=3
+        )
+    return _mistral_llm
+
+
+def get_gemini_llm():
+    global _gemini_llm
+    if _gemini_llm is None:
+        from langchain.chat_models import init_chat_model
+
+        _gemini_llm = init_chat_model(
+            model="gemini-2.5-flash-lite",
+            model_provider="google_genai",
+            api_key=require_env('GEMINI_API_KEY'),
+            temperature=0.7,
+        )
+    return _gemini_llm
+
+
+def stream_mistral(prompt):
+    # Streaming output from mistral model
+    for chunk in get_mistral_llm().stream(prompt):
+        print(chunk, end='', flush=True)
+
+    # Get full response from mistral model
+    #response = get_mistral_llm().invoke(prompt)
+
+# Your task, implement the same for Azure OpenAI (get_gemini_llm() above shows the pattern)
+# Make sure to use the appropriate model name and parameters for the provider
+# (the Azure model needs require_env('AZURE_API_KEY') and require_env('AZURE_ENDPOINT'))
 # See more information here: https://python.langchain.com/docs/integrations/chat/
+
+
+def get_hedged_router():
+    # One router per process, so its latency histograms grow with every hedged request
+    global _hedged_router
+    if _hedged_router is None:
+        from hedged_router import HedgedRouter
+
+        _hedged_router = HedgedRouter({"mistral": get_mistral_llm(), "gemini": get_gemini_llm()})
+    return _hedged_router
+
+
+async def stream_hedged(prompt):
+    # Hedged requests across providers
+    # The router streams from Mistral and, if no first token arrives within the hedge delay,
+    # asks Gemini as well. Whichever answers first is streamed, the other request is cancelled.
+    # The delay becomes each provider's measured time-to-first-token (95th percentile) once the
+    # router has 20 measurements. This script makes a single hedged request per run, so it
+    # always uses the default delay of 2 seconds; benchmark_hedging.py shows the adaptive delay.
+    router = get_hedged_router()
+    async for chunk in router.astream(prompt):
+        print(chunk.content, end='', flush=True)
+    print(f"\n\nAnswered by: {router.last_winner}")
+    print(f"Router stats: {router.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM providers with langchain")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--no-hedge", action="store_true", help="Skip the hedged Mistral/Gemini request")
+    args = parser.parse_args()
+
+    stream_mistral(args.prompt)
+
+    if not args.no_hedge:
+        print("\n\nHedged request (Mistral, Gemini as hedge):\n")
+        asyncio.run(stream_hedged(args.prompt))
+
+
+if __name__ == "__main__":
+    main()
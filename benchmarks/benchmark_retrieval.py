@@ -0,0 +1,371 @@
+"""
+Benchmark: retrieval backends across corpus sizes, with a machine-readable report.
+
+Retrieval is implemented several ways in the demos. This harness runs all of
+them on the same synthetic corpora and queries:
+
+  - sklearn:       ExactIndex from 1-local-hello-worldrag (brute-force NearestNeighbors)
+  - ivf:           IVFIndex from 1-local-hello-worldrag (approximate)
+  - int8, binary:  quantized backends of 1-local-hello-worldrag with exact rescoring
+  - numpy:         RetrievalEngine from 2-gemini-rag-hello-world (normalized matrix product)
+  - chroma:        a ChromaDB collection (HNSW), as in demos 3 to 4.1
+  - langchain:     NumpyVectorStore from 5-langchain-rag-intro (one query per LangChain call)
+
+The corpora are clustered, normalized 384-dimensional vectors (the size of
+all-MiniLM-L6-v2 embeddings), so no embedding model is needed and 1M documents
+fit in memory. For unit vectors, euclidean and cosine rankings are the same, so
+every backend is compared against the same exact top-k.
+
+For each backend and corpus size the report contains:
+
+  - build_seconds:      time to build the index
+  - memory_mb:          growth of the process RSS while building (needs psutil or /proc)
+  - single_ms:          p50/p95/p99 latency of one query per call
+  - batch_ms:           p50/p95/p99 latency of a call with --batch-size queries
+  - queries_per_second: throughput of the batched calls
+  - recall_at_k:        overlap with the exact top-k (brute force in float64 chunks)
+
+Results are written as JSON (--output). Passing an earlier report with
+--compare prints the change of every metric and flags regressions, so two runs
+(e.g. before and after a change) can be compared. Changes below a small
+absolute noise floor (1 ms per query, 10 MB, 0.01 recall, ...) are not flagged:
+
+    python benchmarks/benchmark_retrieval.py --sizes 1000 10000 100000 --output retrieval.json
+    python benchmarks/benchmark_retrieval.py --sizes 1000 10000 100000 --compare retrieval.json
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "1-local-hello-worldrag"))
+sys.path.append(os.path.join(ROOT, "2-gemini-rag-hello-world"))
+sys.path.append(os.path.join(ROOT, "5-langchain-rag-intro"))
+sys.path.append(os.path.join(ROOT, "common"))
+
+DIM = 384
+# Metric -> True when a higher value is better, used to flag regressions
+METRICS = {
+    "build_seconds": False,
+    "memory_mb": False,
+    "single_ms.p50": False,
+    "single_ms.p99": False,
+    "batch_ms.p50": False,
+    "batch_ms.p99": False,
+    "queries_per_second": True,
+    "recall_at_k": True,
+}
+# Changes smaller than these absolute amounts are timer or allocator noise and never count as a regression
+NOISE_FLOOR = {"build_seconds": 0.05, "memory_mb": 10, "single_ms": 1.0, "batch_ms": 2.0, "recall_at_k": 0.01,
+               # Throughput follows from the batch latencies, which are already checked
+               "queries_per_second": float("inf")}
+
+
+def rss_bytes():
+    """Resident set size of this process, or None when it cannot be measured."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def synthetic_corpus(count, dim=DIM, clusters=None, seed=0):
+    """Normalized float32 vectors around random cluster centres, like embeddings of topical documents."""
+    rng = np.random.default_rng(seed)
+    clusters = clusters or max(10, int(np.sqrt(count)))
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        size = min(100_000, count - start)
+        chunk = centres[rng.integers(0, clusters, size)] + rng.normal(scale=0.8, size=(size, dim)).astype(np.float32)
+        vectors[start:start + size] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_queries(corpus, count, seed=1):
+    """Perturbed copies of corpus vectors: each query has true neighbours in the corpus."""
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.choice(len(corpus), count, replace=len(corpus) < count)]
+    queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus, queries, k):
+    """Reference neighbours: exact inner-product top-k, chunked so 1M vectors do not need a full score matrix."""
+    best_scores = np.full((len(queries), 0), -np.inf)
+    best_indices = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(corpus), 100_000):
+        scores = queries.astype(np.float64) @ corpus[start:start + 100_000].T.astype(np.float64)
+        indices = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        indices = np.concatenate([best_indices, indices], axis=1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_indices = np.take_along_axis(indices, keep, axis=1)
+    return best_indices
+
+
+# ---------------------------------------------------------------------------
+# Backends: build(vectors), then search(queries, k) -> (n_queries, k) row numbers
+# ---------------------------------------------------------------------------
+
+class VectorIndexBackend:
+    """A backend of 1-local-hello-worldrag/vector_index.py."""
+
+    def __init__(self, name, **params):
+        self.name = name
+        self.params = params
+
+    def build(self, vectors):
+        from vector_index import create_index
+        self.index = create_index(self.name, **self.params).fit(vectors)
+
+    def search(self, queries, k):
+        return self.index.kneighbors(queries, n_neighbors=k)[1]
+
+
+class NumpyBackend:
+    """RetrievalEngine of 2-gemini-rag-hello-world/retrieval_engine.py."""
+
+    name = "numpy"
+
+    def build(self, vectors):
+        from retrieval_engine import RetrievalEngine
+        self.engine = RetrievalEngine(vectors)
+
+    def search(self, queries, k):
+        return self.engine.search(queries, top_k=k)[1]
+
+
+class ChromaBackend:
+    """A persistent ChromaDB collection with precomputed embeddings, as used by demos 3 to 4.1."""
+
+    name = "chroma"
+
+    def build(self, vectors):
+        from vector_store_manager import VectorStoreManager
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = VectorStoreManager()
+        self.collection = self.manager.get_collection(
+            self.directory.name, "retrieval_benchmark", create=True, embedding_function=None
+        )
+        batch_size = self.manager.get_client(self.directory.name).get_max_batch_size()
+        for start in range(0, len(vectors), batch_size):
+            end = min(start + batch_size, len(vectors))
+            self.collection.add(ids=[str(i) for i in range(start, end)], embeddings=vectors[start:end])
+
+    def search(self, queries, k):
+        results = self.collection.query(query_embeddings=queries, n_results=k, include=[])
+        return np.array([[int(doc_id) for doc_id in ids] for ids in results["ids"]])
+
+    def close(self):
+        self.manager.close()
+        self.directory.cleanup()
+
+
+class LangChainBackend:
+    """NumpyVectorStore of 5-langchain-rag-intro/numpy_vector_store.py, filled with precomputed embeddings."""
+
+    name = "langchain"
+
+    def build(self, vectors):
+        from numpy_vector_store import NumpyVectorStore
+        self.store = NumpyVectorStore(embedding=None, model_name="synthetic")
+        self.store.add_vectors(vectors, [""] * len(vectors), ids=[str(i) for i in range(len(vectors))])
+
+    def search(self, queries, k):
+        # The LangChain interface takes one query per call
+        return np.array([
+            [int(doc.id) for doc in self.store.similarity_search_by_vector(query, k=k)] for query in queries
+        ])
+
+
+BACKENDS = {
+    "sklearn": lambda: VectorIndexBackend("exact"),
+    "ivf": lambda: VectorIndexBackend("ivf"),
+    "int8": lambda: VectorIndexBackend("int8"),
+    "binary": lambda: VectorIndexBackend("binary", rescore_factor=30),
+    "numpy": NumpyBackend,
+    "chroma": ChromaBackend,
+    "langchain": LangChainBackend,
+}
+
+
+# Modules each backend needs, imported before measuring so that memory_mb does not include them
+BACKEND_MODULES = {
+    "sklearn": ["vector_index"], "ivf": ["vector_index"], "int8": ["vector_index"], "binary": ["vector_index"],
+    "numpy": ["retrieval_engine"], "chroma": ["vector_store_manager", "chromadb"],
+    "langchain": ["numpy_vector_store"],
+}
+
+
+def percentiles(timings):
+    timings_ms = 1000 * np.asarray(timings)
+    return {name: round(float(np.percentile(timings_ms, q)), 4) for name, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+
+def run_backend(name, corpus, queries, expected, k, batch_size):
+    backend = BACKENDS[name]()
+    gc.collect()  # Release what the previous backend left behind
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    backend.build(corpus)
+    build_seconds = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    try:
+        found = []
+        single = []
+        for query in queries:
+            start = time.perf_counter()
+            found.append(backend.search(query[None, :], k)[0])
+            single.append(time.perf_counter() - start)
+
+        batched = []
+        for start_row in range(0, len(queries), batch_size):
+            start = time.perf_counter()
+            backend.search(queries[start_row:start_row + batch_size], k)
+            batched.append(time.perf_counter() - start)
+    finally:
+        if hasattr(backend, "close"):
+            backend.close()
+
+    recall = np.mean([len(np.intersect1d(f, e)) / k for f, e in zip(found, expected)])
+    return {
+        "backend": name,
+        "documents": len(corpus),
+        "build_seconds": round(build_seconds, 4),
+        "memory_mb": round((rss_after - rss_before) / 2 ** 20, 1) if rss_before is not None else None,
+        "single_ms": percentiles(single),
+        "batch_ms": percentiles(batched),
+        "queries_per_second": round(len(queries) / sum(batched), 1),
+        "recall_at_k": round(float(recall), 4),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def metric(row, path):
+    value = row
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report, baseline, tolerance):
+    """Print the change of every metric against a baseline report and return the number of regressions."""
+    previous = {(row["backend"], row["documents"]): row for row in baseline["results"]}
+    regressions = 0
+    print(f"\nComparison with {baseline['environment'].get('git_commit')} ({baseline['environment'].get('date')}):")
+    for row in report["results"]:
+        old = previous.get((row["backend"], row["documents"]))
+        if old is None:
+            continue
+        changes = []
+        for path, higher_is_better in METRICS.items():
+            new_value, old_value = metric(row, path), metric(old, path)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            if path == "recall_at_k":
+                worse = new_value < old_value  # Recall is compared in absolute terms only
+            if abs(new_value - old_value) < NOISE_FLOOR.get(path.split(".")[0], 0):
+                worse = False
+            regressions += worse
+            changes.append(f"{path} {change:+.0%}{' REGRESSION' if worse else ''}")
+        print(f"  {row['backend']:<8} {row['documents']:>9}: " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Corpus sizes, e.g. 1000 10000 100000 1000000")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default="retrieval_report.json", help="JSON report to write")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown (or memory growth) counted as a regression")
+    args = parser.parse_args()
+
+    # Read the baseline before anything is written, so --output may overwrite the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    for name in args.backends:
+        for module in BACKEND_MODULES[name]:
+            __import__(module)
+
+    report = {"environment": environment(), "parameters": vars(args), "results": []}
+    print(f"{'backend':<8} {'docs':>9} {'build s':>8} {'mem MB':>7} {'1q p50':>8} {'1q p99':>8} "
+          f"{'batch p50':>10} {'q/s':>9} {'recall':>7}")
+    for size in args.sizes:
+        corpus = synthetic_corpus(size)
+        queries = synthetic_queries(corpus, args.queries)
+        k = min(args.k, size)
+        expected = exact_top_k(corpus, queries, k)
+        for name in args.backends:
+            try:
+                row = run_backend(name, corpus, queries, expected, k, args.batch_size)
+            except Exception as e:
+                print(f"{name:<8} {size:>9} failed: {type(e).__name__}: {e}")
+                report["results"].append({"backend": name, "documents": size, "error": repr(e)})
+                continue
+            report["results"].append(row)
+            memory = f"{row['memory_mb']:>7.1f}" if row["memory_mb"] is not None else f"{'n/a':>7}"
+            print(
+                f"{name:<8} {size:>9} {row['build_seconds']:>8.2f} {memory} {row['single_ms']['p50']:>8.2f} "
+                f"{row['single_ms']['p99']:>8.2f} {row['batch_ms']['p50']:>10.2f} "
+                f"{row['queries_per_second']:>9.0f} {row['recall_at_k']:>7.3f}"
+            )
+        del corpus
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        print(f"{regressions} regressions")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
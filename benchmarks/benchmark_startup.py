@@ -0,0 +1,117 @@
+"""
+Benchmark: import time and time-to-first-query of the RAG demo scripts.
+
+Every measurement runs in a fresh Python process, so module imports and model
+loading are not shared between runs. For each script it reports:
+
+  - import: time to import the script as a module. Models and API clients are
+    created on first use, so this should stay well below a second and must
+    work without any API keys set.
+  - first query: import, database initialization and one retrieval (no LLM call,
+    so no API key or network access to an LLM is needed). Includes loading the
+    embedding model on first use.
+
+The scripts run in a temporary working directory, so their databases and
+caches do not touch the demo folders.
+
+    python benchmarks/benchmark_startup.py --runs 3
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+QUESTION = "What does a purple checkered flag mean?"
+
+# name -> (demo folder, module name, first query or None)
+SCRIPTS = {
+    "gemini-rag-hello-world": (
+        "2-gemini-rag-hello-world", "gemini-rag-hello-world",
+        lambda module: module.retrieve_contexts([QUESTION]),
+    ),
+    "rag-with-vectordb": (
+        "4-rag-with-vectordb", "rag-with-vectordb",
+        lambda module: (module.initVectorDb(), module.queryVectorDb(QUESTION)),
+    ),
+    "rag-with-metadata": (
+        "4.1-rag-with-metadata", "rag-with-metadata",
+        lambda module: (module.initVectorDb(), module.queryVectorDb(QUESTION)),
+    ),
+    # The first query of this demo is an LLM call, only the import is measured
+    "langchain-different-llms": ("6-langchain-different-llm-providers", "langchain-different-llms", None),
+}
+
+API_KEYS = ("GEMINI_API_KEY", "MISTRAL_API_KEY", "AZURE_API_KEY", "AZURE_ENDPOINT")
+
+
+def measure_in_child(name, with_query):
+    """Runs in the child process: import the script (and run its first query), print timings as JSON."""
+    folder, module_name, first_query = SCRIPTS[name]
+    sys.path.insert(0, os.path.join(ROOT, folder))
+    result = {}
+    output = io.StringIO()  # The demos' progress messages
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            module = importlib.import_module(module_name)
+            result["import"] = time.perf_counter() - start
+            if with_query and first_query is not None:
+                first_query(module)
+                result["first_query"] = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}".splitlines()[0][:120]
+    print(json.dumps(result))
+
+
+def run_child(name, with_query, workdir):
+    # No API keys: importing a script must not require them
+    env = {key: value for key, value in os.environ.items() if key not in API_KEYS}
+    command = [sys.executable, os.path.abspath(__file__), "--child", name] + (["--with-query"] if with_query else [])
+    completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or ["no output"])[-1][:120]}
+    return json.loads(lines[-1])
+
+
+def median_ms(results, key):
+    values = [result[key] for result in results if key in result]
+    return f"{1000 * statistics.median(values):9.0f} ms" if values else f"{'n/a':>12}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement, the median is reported")
+    parser.add_argument("--scripts", nargs="+", choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument("--skip-query", action="store_true", help="Only measure the import time")
+    parser.add_argument("--child", choices=list(SCRIPTS), help=argparse.SUPPRESS)
+    parser.add_argument("--with-query", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_in_child(args.child, args.with_query)
+        return
+
+    print(f"{'script':<26} {'import':>12} {'first query':>12}")
+    for name in args.scripts:
+        with tempfile.TemporaryDirectory() as workdir:
+            imports = [run_child(name, False, workdir) for _ in range(args.runs)]
+            # The first run also creates the database, later runs measure a warm restart
+            queries = [] if args.skip_query else [run_child(name, True, workdir) for _ in range(args.runs)]
+        print(f"{name:<26} {median_ms(imports, 'import')} {median_ms(queries, 'first_query')}")
+        errors = {result["error"] for result in imports + queries if "error" in result}
+        for error in errors:
+            print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
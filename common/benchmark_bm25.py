@@ -0,0 +1,100 @@
+"""
+Benchmark: identifier lookups through the BM25 fast path vs. embedding + vector search.
+
+Builds a synthetic corpus where every document carries identifiers
+("DOC-000123", "Rule 12.3", "Mark OB-N7") and times lookups of those
+identifiers:
+
+  - lexical: HybridRetriever routes the query to the BM25 index (no embedding)
+  - vector:  embed the query with the shared embedding service and query the collection
+             (skipped with --skip-vector, the model is downloaded on first use)
+
+    python benchmark_bm25.py --documents 10000 --queries 500
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from bm25_index import BM25Index, HybridRetriever
+from vector_store_manager import VectorStoreManager
+
+WORDS = (
+    "boats must leave the mark to starboard on all windward legs the race committee may shorten "
+    "the course penalty scoring protest jury signal flag wind tide channel marker depth hazard"
+).split()
+
+
+def synthetic_corpus(count, seed=0):
+    rng = random.Random(seed)
+    ids, documents, lookups = [], [], []
+    for i in range(count):
+        rule = f"{i // 10 + 1}.{i % 10}"
+        mark = f"OB-N{i}"
+        text = " ".join(rng.choices(WORDS, k=40))
+        ids.append(f"DOC-{i:06d}")
+        documents.append(f"DOC-{i:06d}: Rule {rule}. Mark {mark}: {text}")
+        lookups.extend([f"DOC-{i:06d}", f"Rule {rule}", mark])
+    return ids, documents, lookups
+
+
+def summarize(name, timings):
+    timings_ms = 1000 * np.array(timings)
+    print(
+        f"{name:<24} p50 {np.percentile(timings_ms, 50):8.3f} ms | "
+        f"p99 {np.percentile(timings_ms, 99):8.3f} ms | mean {timings_ms.mean():8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--skip-vector", action="store_true", help="Only time the lexical path")
+    args = parser.parse_args()
+
+    ids, documents, lookups = synthetic_corpus(args.documents)
+    queries = random.Random(1).sample(lookups, min(args.queries, len(lookups)))
+
+    start = time.perf_counter()
+    index = BM25Index(ids, documents)
+    print(f"Built BM25 index over {args.documents} documents in {time.perf_counter() - start:.2f}s")
+
+    def no_vector_search(query, n_results, query_embedding):
+        raise AssertionError(f"Lookup {query!r} was not answered lexically")
+
+    retriever = HybridRetriever(index, no_vector_search)
+    timings, found = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        results = retriever.query(query, n_results=5)
+        timings.append(time.perf_counter() - start)
+        found += results["route"] == "lexical"
+    summarize("lexical (BM25)", timings)
+    print(f"{found} of {len(queries)} lookups answered from the lexical index")
+
+    if args.skip_vector:
+        return
+
+    from embedding_service import get_embedding_service
+    embedding_function = get_embedding_service()
+    with tempfile.TemporaryDirectory() as path:
+        manager = VectorStoreManager()
+        collection = manager.get_collection(path, "bm25_benchmark", create=True)
+        for batch_start in range(0, len(ids), 1000):
+            batch_end = batch_start + 1000
+            collection.add(ids=ids[batch_start:batch_end], documents=documents[batch_start:batch_end])
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            collection.query(query_embeddings=embedding_function([query]), n_results=5)
+            timings.append(time.perf_counter() - start)
+        manager.close()
+    summarize("embedding + vector", timings)
+
+
+if __name__ == "__main__":
+    main()
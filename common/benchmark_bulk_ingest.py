@@ -0,0 +1,73 @@
+"""
+Benchmark: ingesting documents with a single collection.add call vs. the parallel bulk loader.
+
+Generates synthetic documents and loads them into two fresh collections in a
+temporary directory:
+
+  - single call: collection.add(ids, documents, metadatas), which embeds every
+    document with Chroma's default embedding function on one core (what
+    initVectorDb used to do)
+  - bulk loader: bulk_upsert with size-capped batches embedded in a process pool
+    by the onnx embedding service (common/embedding_service.py)
+
+The two rows therefore compare two embedding paths as well as the loading
+strategy. Both run all-MiniLM-L6-v2 on onnxruntime, downloaded on first use,
+but through different code.
+
+    python benchmark_bulk_ingest.py --documents 5000 --workers 4
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+from bulk_loader import bulk_upsert
+from vector_store_manager import VectorStoreManager
+
+WORDS = (
+    "sail boat wind harbour anchor mast keel rudder tack jibe reef buoy chart "
+    "tide current knot mooring hull bow stern port starboard halyard sheet winch"
+).split()
+
+
+def synthetic_documents(count, words_per_document, seed=0):
+    rng = random.Random(seed)
+    ids = [f"DOC-{i:06d}" for i in range(count)]
+    documents = [" ".join(rng.choices(WORDS, k=words_per_document)) for _ in range(count)]
+    metadatas = [{"source": f"synthetic-{i % 10}"} for i in range(count)]
+    return ids, documents, metadatas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=60, help="Words per document")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None, help="Embedding processes (default: all cores)")
+    args = parser.parse_args()
+
+    ids, documents, metadatas = synthetic_documents(args.documents, args.words)
+
+    with tempfile.TemporaryDirectory() as path:
+        manager = VectorStoreManager()
+
+        collection = manager.get_collection(path, "single_call", create=True)
+        start = time.perf_counter()
+        collection.add(ids=ids, documents=documents, metadatas=metadatas)
+        single_seconds = time.perf_counter() - start
+
+        collection = manager.get_collection(path, "bulk_loader", create=True)
+        result = bulk_upsert(collection, ids, documents, metadatas, batch_size=args.batch_size, workers=args.workers)
+        manager.close()
+
+    single_rate = args.documents / single_seconds
+    print(f"{args.documents} documents of {args.words} words")
+    print(f"{'collection.add (Chroma default embedding)':<44} {single_seconds:7.1f}s {single_rate:8.0f} docs/s")
+    print(f"{'bulk_upsert (onnx embedding service)':<44} {result.seconds:7.1f}s "
+          f"{result.documents_per_second:8.0f} docs/s")
+    print(f"Speedup: {result.documents_per_second / single_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: embedding throughput (sentences/sec on CPU) and parity of the embedding backends.
+
+Encodes the same synthetic sentences (mixed lengths, 5 to 60 words) with:
+
+  - torch:      sentence-transformers on PyTorch (the reference)
+  - onnx:       EmbeddingService on onnxruntime
+  - onnx-int8:  EmbeddingService on an int8 quantized copy of the model
+  - chroma:     ChromaDB's built-in embedding function (onnxruntime, every text padded to 256 tokens)
+
+and reports sentences/sec plus the cosine similarity of each backend's vectors
+to the torch vectors (parity: min cosine should be > 0.99, > 0.999 without
+quantization). Backends whose dependencies or model files are not available
+are skipped.
+
+    python benchmark_embedding_service.py --sentences 2000 --threads 4
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from embedding_service import EmbeddingService
+
+WORDS = (
+    "boats must leave the mark to starboard on all windward legs the race committee may shorten "
+    "the course penalty scoring protest jury signal flag wind tide channel marker depth hazard"
+).split()
+
+
+def synthetic_sentences(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(5, 60))) for _ in range(count)]
+
+
+def chroma_encoder():
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+    embedding_function = DefaultEmbeddingFunction()
+    return lambda texts: np.asarray(embedding_function(texts), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads per backend (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8", "chroma"])
+    args = parser.parse_args()
+
+    sentences = synthetic_sentences(args.sentences)
+    factories = {
+        "torch": lambda: EmbeddingService("torch", threads=args.threads, max_batch_size=args.batch_size).encode,
+        "onnx": lambda: EmbeddingService("onnx", threads=args.threads, max_batch_size=args.batch_size).encode,
+        "onnx-int8": lambda: EmbeddingService(
+            "onnx", quantize=True, threads=args.threads, max_batch_size=args.batch_size
+        ).encode,
+        "chroma": chroma_encoder,
+    }
+
+    reference = None
+    print(f"{'backend':<10} {'sentences/s':>12} {'min cosine':>11} {'mean cosine':>12}")
+    for name in args.backends:
+        try:
+            encode = factories[name]()
+            encode(sentences[:8])  # Warm-up: model loading and first-run graph optimizations
+            start = time.perf_counter()
+            vectors = encode(sentences)
+            seconds = time.perf_counter() - start
+        except Exception as e:
+            print(f"{name:<10} skipped: {type(e).__name__}: {str(e).splitlines()[0][:80] if str(e) else ''}")
+            continue
+
+        if name == "torch":
+            reference = vectors
+        if reference is not None:
+            cosines = np.einsum("ij,ij->i", reference, vectors)
+            parity = f"{cosines.min():>11.5f} {cosines.mean():>12.5f}"
+        else:
+            parity = f"{'n/a':>11} {'n/a':>12}"
+        print(f"{name:<10} {len(sentences) / seconds:>12.0f} {parity}")
+
+
+if __name__ == "__main__":
+    main()
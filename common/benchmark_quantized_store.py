@@ -0,0 +1,104 @@
+"""
+Benchmark: recall and memory of quantized embedding storage with rescoring.
+
+Generates clustered, normalized embeddings (MiniLM size, 384 dimensions by
+default) and writes them to a memory-mapped .npy file, as a large knowledge
+base would be stored. For "int8" and "binary" codes and several rescore
+factors it reports:
+
+  - recall@k against exact float32 search,
+  - query latency (shortlist from the codes + exact rescoring from the memmap),
+  - RAM used by the codes, extrapolated to 10M vectors.
+
+    python benchmark_quantized_store.py --vectors 200000 --queries 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from quantized_store import QuantizedVectorStore
+
+TARGET_VECTORS = 10_000_000
+
+
+def clustered_vectors(path, count, dim, clusters=500, spread=0.8, seed=0):
+    """Normalized vectors around random cluster centers, written to a .npy memmap."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = open_memmap(path, mode="w+", dtype=np.float32, shape=(count, dim))
+    for start in range(0, count, 50_000):
+        size = min(50_000, count - start)
+        chunk = centers[rng.integers(0, clusters, size)] + rng.normal(scale=spread, size=(size, dim)).astype(np.float32)
+        vectors[start:start + size] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    vectors.flush()
+    return vectors
+
+
+def exact_top_k(vectors, queries, k):
+    """Reference results: exact cosine top-k, computed chunk by chunk."""
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_indices = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), 65536):
+        scores = queries @ np.asarray(vectors[start:start + 65536]).T
+        indices = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        indices = np.concatenate([best_indices, indices], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_indices = np.take_along_axis(indices, keep, axis=1)
+    return best_indices
+
+
+def recall(found, expected):
+    return np.mean([len(np.intersect1d(f, e)) / len(e) for f, e in zip(found, expected)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4, 10, 30])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Writing {args.vectors} x {args.dim} float32 vectors to a memmap...")
+        vectors = clustered_vectors(os.path.join(directory, "vectors.npy"), args.vectors, args.dim)
+        rng = np.random.default_rng(1)
+        # Queries are perturbed copies of stored vectors, like questions close to known passages
+        queries = np.asarray(vectors[np.sort(rng.choice(args.vectors, args.queries, replace=False))])
+        queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+        expected = exact_top_k(vectors, queries, args.k)
+
+        full_bytes = args.vectors * args.dim * 4
+        print(
+            f"float32: {full_bytes / 2**20:8.1f} MB "
+            f"({full_bytes / args.vectors * TARGET_VECTORS / 2**30:.1f} GB for {TARGET_VECTORS:,} vectors)\n"
+        )
+        print(f"{'kind':<7} {'rescore':>7} {f'recall@{args.k}':>10} {'ms/query':>9} {'codes MB':>9} {'10M codes GB':>13}")
+        for kind in ("int8", "binary"):
+            start = time.perf_counter()
+            store = QuantizedVectorStore(kind, metric="cosine").fit(vectors)
+            fit_seconds = time.perf_counter() - start
+            for factor in args.rescore_factors:
+                store.rescore_factor = factor
+                start = time.perf_counter()
+                _, found = store.search(queries, k=args.k)
+                latency_ms = 1000 * (time.perf_counter() - start) / len(queries)
+                print(
+                    f"{kind:<7} {factor:>7} {recall(found, expected):>10.3f} {latency_ms:>9.2f} "
+                    f"{store.code_bytes / 2**20:>9.1f} {store.code_bytes / args.vectors * TARGET_VECTORS / 2**30:>13.2f}"
+                )
+            print(f"  ({kind} encoding took {fit_seconds:.1f}s)")
+            del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Microbenchmark: overhead of the tracing spans per instrumented query.
+
+Runs a query-shaped block of five nested spans (rag_query with embed_query,
+vector_search, prompt_assembly and llm) many times:
+
+  - baseline: the same code without any spans
+  - disabled: spans with tracing off (what the demos do by default)
+  - enabled:  spans with an exporter that drops the finished traces, so only
+              the cost of creating and timing spans is measured
+
+    python benchmark_tracing.py --queries 100000
+"""
+
+import argparse
+import time
+
+from tracing import Tracer
+
+
+class DiscardExporter:
+    def export(self, spans):
+        pass
+
+
+def traced_query(tracer):
+    with tracer.span("rag_query", question="q") as root:
+        with tracer.span("embed_query"):
+            pass
+        with tracer.span("vector_search", n_results=5):
+            pass
+        with tracer.span("prompt_assembly") as span:
+            span.set(prompt_tokens=100)
+        with tracer.span("llm", model="m") as span:
+            span.first_token()
+        root.set(cache_hit=False)
+
+
+def plain_query(tracer):
+    pass
+
+
+def time_per_query_us(query_fn, tracer, queries):
+    start = time.perf_counter()
+    for _ in range(queries):
+        query_fn(tracer)
+    return (time.perf_counter() - start) / queries * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    baseline = time_per_query_us(plain_query, Tracer(), args.queries)
+    disabled = time_per_query_us(traced_query, Tracer(), args.queries)
+    enabled = time_per_query_us(traced_query, Tracer([DiscardExporter()]), args.queries)
+
+    print(f"{'mode':<10} {'us/query':>10} {'overhead us':>12}")
+    for name, value in (("baseline", baseline), ("disabled", disabled), ("enabled", enabled)):
+        print(f"{name:<10} {value:>10.2f} {value - baseline:>12.2f}")
+    print("\nFor comparison, one query embedding takes about 5 ms and a Gemini call several hundred ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmark: per-query overhead of opening ChromaDB on every query vs. the shared VectorStoreManager.
+
+Builds a small collection in a temporary directory and runs the same queries
+two ways:
+
+  - before: a new PersistentClient + get_collection for every query (what the demos used to do)
+  - after:  the collection handle cached by VectorStoreManager
+
+Queries use precomputed random embeddings, so the embedding model is not part
+of the measurement and nothing has to be downloaded.
+
+    python benchmark_vector_store_manager.py --documents 100 --queries 200
+"""
+
+import argparse
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from vector_store_manager import VectorStoreManager
+
+COLLECTION_NAME = "benchmark"
+
+
+def percentile_ms(timings, q):
+    return 1000 * float(np.percentile(timings, q))
+
+
+def time_queries(query_fn, query_embeddings):
+    timings = []
+    for embedding in query_embeddings:
+        start = time.perf_counter()
+        query_fn(embedding)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(args.documents, args.dim)).astype(np.float32)
+    query_embeddings = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as path:
+        manager = VectorStoreManager()
+        collection = manager.get_collection(path, COLLECTION_NAME, create=True)
+        collection.add(
+            ids=[str(i) for i in range(args.documents)],
+            documents=[f"document {i}" for i in range(args.documents)],
+            embeddings=embeddings.tolist(),
+        )
+
+        def query_reopening(embedding):
+            client = chromadb.PersistentClient(path=path)
+            client.get_collection(name=COLLECTION_NAME).query(query_embeddings=[embedding.tolist()], n_results=5)
+
+        def query_shared(embedding):
+            manager.get_collection(path, COLLECTION_NAME).query(query_embeddings=[embedding.tolist()], n_results=5)
+
+        results = {
+            "before (new client per query)": time_queries(query_reopening, query_embeddings),
+            "after (shared manager)": time_queries(query_shared, query_embeddings),
+        }
+        manager.close()
+
+    print(f"{args.queries} queries against {args.documents} documents")
+    for name, timings in results.items():
+        print(
+            f"{name:<32} mean {1000 * np.mean(timings):7.2f} ms | "
+            f"p50 {percentile_ms(timings, 50):7.2f} ms | p99 {percentile_ms(timings, 99):7.2f} ms"
+        )
+    before, after = (np.mean(timings) for timings in results.values())
+    print(f"Per-query overhead removed: {1000 * (before - after):.2f} ms ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+BM25 inverted index and a query router for lexical, vector and hybrid retrieval.
+
+Many questions are exact identifiers ("Rule 14.2", "DOC-004", "Sun-Ray 1",
+"OB-N1"). An embedding model is slow for these and not even good at them: the
+embedding of "OB-N1" says little about which document contains that marker.
+A lexical index answers them in microseconds.
+
+  - `BM25Index` is an inverted index with BM25 scoring, built at ingest time
+    over the same documents as the vector collection. Its tokenizer keeps
+    identifiers such as "14.2", "doc-004" or "ob-n1" intact (and also indexes
+    the words of hyphenated terms).
+  - `HybridRetriever` routes each query:
+      * identifier lookups (short queries with an identifier that the index
+        knows) are answered from the BM25 index alone, without embedding,
+      * queries without identifiers go to vector search,
+      * mixed queries run both and merge the rankings with reciprocal rank
+        fusion (RRF).
+
+Results have the shape of a ChromaDB query result for a single query (ids,
+documents, metadatas), plus `scores` and the `route` that was taken.
+"""
+
+import math
+import re
+from collections import Counter
+
+# Words, numbers and identifiers joined by "-", "." or "/" (e.g. "OB-N1", "14.2", "DOC-004")
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+(?:[-./][A-Za-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by does do for from has have how i in is it its last me of on or the this "
+    "to was what when where which who why will with".split()
+)
+
+
+def tokenize(text):
+    """Lowercased tokens. Joined identifiers are kept whole, their word parts are added as well."""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group().lower()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part.isalpha() and len(part) > 1 and part not in STOPWORDS)
+    return tokens
+
+
+def identifiers(text):
+    """Identifier-like tokens of a query: letters and digits mixed, joined terms, numbers like 14.2 or all-caps codes."""
+    found = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        has_digit = any(c.isdigit() for c in token)
+        has_alpha = any(c.isalpha() for c in token)
+        joined = any(c in "-./" for c in token)
+        if (has_digit and has_alpha) or joined or (token.isupper() and len(token) > 1):
+            found.append(token.lower())
+    return found
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring.
+
+    Args:
+        ids (list[str]): Document ids.
+        documents (list[str]): Document texts.
+        metadatas (list[dict], optional): Returned with the results.
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+    """
+
+    def __init__(self, ids, documents, metadatas=None, k1=1.5, b=0.75):
+        self.ids = list(ids)
+        self.positions = {doc_id: number for number, doc_id in enumerate(self.ids)}
+        self.documents = list(documents)
+        self.metadatas = list(metadatas) if metadatas is not None else [None] * len(self.ids)
+        self.k1 = k1
+        self.b = b
+
+        self.postings = {}  # term -> {document number: term frequency}
+        self.lengths = []
+        for number, document in enumerate(self.documents):
+            counts = Counter(tokenize(document))
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[number] = frequency
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        count = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    @classmethod
+    def from_collection(cls, collection, text=None, **kwargs):
+        """
+        Build the index from the documents stored in a ChromaDB collection.
+
+        Args:
+            text (callable, optional): Function (document, metadata) -> text to index, e.g. to
+                index a section title along with the document. Defaults to the document itself.
+        """
+        data = collection.get(include=["documents", "metadatas"])
+        texts = data["documents"]
+        if text is not None:
+            texts = [text(document, metadata) for document, metadata in zip(data["documents"], data["metadatas"])]
+        index = cls(data["ids"], texts, data["metadatas"], **kwargs)
+        index.documents = data["documents"]  # Return the stored documents, not the indexed text
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, term):
+        return term in self.postings
+
+    def search(self, query, top_k=5, candidates=None):
+        """
+        Return [(score, document number)] of the best matches, best first.
+
+        Args:
+            candidates (set, optional): Only score these document numbers.
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            numbers = postings if candidates is None else (n for n in candidates if n in postings)
+            for number in numbers:
+                frequency = postings[number]
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[number] / self.average_length)
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(((score, number) for number, score in scores.items()), key=lambda item: -item[0])[:top_k]
+
+    def containing_all(self, terms):
+        """Numbers of the documents that contain every term, intersecting the shortest posting lists first."""
+        postings = sorted((self.postings.get(term, {}) for term in terms), key=len)
+        if not postings:
+            return set()
+        numbers = set(postings[0])
+        for other in postings[1:]:
+            numbers.intersection_update(other)
+        return numbers
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Merge rankings (lists of ids, best first). Returns [(score, id)], best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(((score, doc_id) for doc_id, score in scores.items()), key=lambda item: -item[0])
+
+
+class HybridRetriever:
+    """
+    Routes queries to the BM25 index, to vector search or to both.
+
+    Args:
+        lexical_index (BM25Index): Index over the same documents as the vector collection.
+        vector_search (callable): Function (query, n_results, query_embedding) -> ChromaDB query result.
+        max_lookup_terms (int): Queries with at most this many terms (besides stopwords) and an
+            identifier are treated as lookups and answered lexically.
+        rrf_k (float): Constant of reciprocal rank fusion.
+        embed (callable, optional): Function list[str] -> embeddings used when a query needs
+            vector search and the caller did not pass an embedding, e.g. a lookup that matched no
+            document. Without it, `vector_search` gets no embedding.
+    """
+
+    def __init__(self, lexical_index, vector_search, max_lookup_terms=4, rrf_k=60, embed=None):
+        self.lexical_index = lexical_index
+        self.vector_search = vector_search
+        self.max_lookup_terms = max_lookup_terms
+        self.rrf_k = rrf_k
+        self.embed = embed
+
+    def route(self, query):
+        """Return "lexical", "hybrid" or "vector"."""
+        known = [token for token in identifiers(query) if token in self.lexical_index]
+        if not known:
+            return "vector"
+        terms = [term for term in _TOKEN_PATTERN.findall(query) if term.lower() not in STOPWORDS]
+        if len(terms) <= self.max_lookup_terms:
+            return "lexical"
+        return "hybrid"
+
+    def query(self, query, n_results=5, query_embedding=None):
+        """
+        Retrieve documents for a query along the route chosen by `route()`.
+
+        Results of vector search carry the query embedding under "query_embedding", also when it
+        was computed here with `embed`, so the caller can reuse it.
+        """
+        route = self.route(query)
+        if route == "lexical":
+            # A lookup returns the documents that contain all of its identifiers. Identifiers are
+            # rare terms, so only a few documents have to be scored. If no document contains
+            # them all, the query is answered by both indexes instead.
+            candidates = self.lexical_index.containing_all(identifiers(query))
+            hits = self.lexical_index.search(query, n_results, candidates) if candidates else []
+            if hits:
+                return self._results(hits, route)
+            route = "hybrid"
+
+        if query_embedding is None and self.embed is not None:
+            query_embedding = self.embed([query])[0]
+        vector_results = self.vector_search(query, n_results, query_embedding)
+        if route == "vector":
+            vector_results["route"] = route
+            vector_results["query_embedding"] = query_embedding
+            return vector_results
+
+        lexical_ids = [self.lexical_index.ids[number] for _, number in self.lexical_index.search(query, n_results)]
+        fused = reciprocal_rank_fusion([lexical_ids, vector_results["ids"][0]], self.rrf_k)[:n_results]
+        positions = self.lexical_index.positions
+        results = self._results([(score, positions[doc_id]) for score, doc_id in fused], route)
+        results["query_embedding"] = query_embedding
+        return results
+
+    def _results(self, hits, route):
+        index = self.lexical_index
+        return {
+            "ids": [[index.ids[number] for _, number in hits]],
+            "documents": [[index.documents[number] for _, number in hits]],
+            "metadatas": [[index.metadatas[number] for _, number in hits]],
+            "scores": [[score for score, _ in hits]],
+            "route": route,
+        }
@@ -0,0 +1,238 @@
+"""
+Parallel bulk ingestion into a ChromaDB collection.
+
+`collection.add(documents=...)` embeds every document with Chroma's built-in
+ONNX all-MiniLM-L6-v2 model on a single core before writing anything. The bulk
+loader instead:
+
+  - splits the documents into batches capped by document count and text size,
+  - computes the embeddings of the batches in a process pool using all cores
+    (with all-MiniLM-L6-v2 on onnxruntime from the shared embedding service,
+    the same model as Chroma's built-in one, so query_texts keep working),
+  - upserts each batch with its precomputed embeddings as soon as it is ready,
+  - shows progress and reports documents/sec,
+  - retries failed batches and records finished ones in an optional journal
+    file. When a run still ends with failed batches (or is interrupted),
+    running it again with the same documents resumes where it stopped instead
+    of starting over.
+
+Called through `sync_collection(..., upsert=bulk_upsert)` no journal is
+needed: documents that were not written have no content hash in the
+collection yet, so the next sync picks them up again.
+
+Usage:
+
+    from bulk_loader import bulk_upsert
+
+    bulk_upsert(collection, ids, documents, metadatas)
+"""
+
+import functools
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+def default_embedding_function(threads=None):
+    """all-MiniLM-L6-v2 on onnxruntime, the same model as Chroma's built-in embedding function."""
+    from embedding_service import EmbeddingService
+    return EmbeddingService(threads=threads)
+
+
+@dataclass
+class BulkLoadResult:
+    documents: int = 0
+    batches: int = 0
+    skipped_batches: int = 0
+    failed_batches: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def documents_per_second(self):
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.documents} documents in {self.batches} batches, {self.seconds:.1f}s "
+            f"({self.documents_per_second:.0f} docs/s), {self.skipped_batches} batches already done, "
+            f"{len(self.failed_batches)} failed"
+        )
+
+
+def make_batches(ids, documents, metadatas=None, max_documents=256, max_chars=100_000):
+    """Split documents into (ids, documents, metadatas) batches with at most `max_documents` and about `max_chars` each."""
+    batch = ([], [], [])
+    batch_chars = 0
+    for i, (doc_id, document) in enumerate(zip(ids, documents)):
+        if batch[0] and (len(batch[0]) >= max_documents or batch_chars + len(document) > max_chars):
+            yield batch
+            batch = ([], [], [])
+            batch_chars = 0
+        batch[0].append(doc_id)
+        batch[1].append(document)
+        batch[2].append(metadatas[i] if metadatas else None)
+        batch_chars += len(document)
+    if batch[0]:
+        yield batch
+
+
+def batch_key(ids, documents):
+    """Identifies a batch by its content, so the journal stays valid only for identical batches."""
+    digest = hashlib.sha256()
+    for doc_id, document in zip(ids, documents):
+        digest.update(doc_id.encode("utf-8") + b"\0" + document.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+# Each worker process loads its own copy of the embedding model once
+_worker_embedding_function = None
+
+
+def _init_worker(embedding_function_factory):
+    global _worker_embedding_function
+    _worker_embedding_function = embedding_function_factory()
+
+
+def _embed(documents):
+    return np.asarray(_worker_embedding_function(documents), dtype=np.float32)
+
+
+class _Journal:
+    """Append-only file of finished batch keys."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def add(self, key):
+        self.done.add(key)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(key + "\n")
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def bulk_upsert(
+    collection,
+    ids,
+    documents,
+    metadatas=None,
+    batch_size=256,
+    max_batch_chars=100_000,
+    workers=None,
+    max_retries=2,
+    journal_path=None,
+    embedding_function_factory=default_embedding_function,
+    show_progress=True,
+):
+    """
+    Embed documents in parallel and upsert them with their embeddings.
+
+    Args:
+        collection: ChromaDB collection.
+        ids (list[str]): Unique document ids.
+        documents (list[str]): Document texts.
+        metadatas (list[dict], optional): Document metadata.
+        batch_size (int): Maximum documents per batch.
+        max_batch_chars (int): Approximate maximum text size of a batch, in characters.
+        workers (int, optional): Embedding processes. Defaults to the number of CPU cores.
+        max_retries (int): How often a failed batch is retried before it is given up.
+        journal_path (str, optional): File recording finished batches, used to resume an
+            interrupted or partially failed run. Removed once every batch succeeded.
+        embedding_function_factory (callable): Top-level function that returns the
+            embedding function used in the workers. Must produce the same embeddings
+            as the collection's embedding function.
+        show_progress (bool): Print a progress line while loading.
+
+    Returns:
+        BulkLoadResult
+    """
+    start = time.perf_counter()
+    journal = _Journal(journal_path)
+    result = BulkLoadResult()
+    total = len(ids)
+
+    pending = []
+    for batch in make_batches(ids, documents, metadatas, batch_size, max_batch_chars):
+        key = batch_key(batch[0], batch[1])
+        if key in journal.done:
+            result.skipped_batches += 1
+            total -= len(batch[0])
+        else:
+            pending.append((key, batch))
+    result.batches = len(pending)
+
+    def write(key, batch, embeddings):
+        batch_ids, batch_documents, batch_metadatas = batch
+        collection.upsert(
+            ids=batch_ids,
+            documents=batch_documents,
+            metadatas=batch_metadatas if metadatas else None,
+            embeddings=embeddings,
+        )
+        journal.add(key)
+        result.documents += len(batch_ids)
+        if show_progress:
+            rate = result.documents / (time.perf_counter() - start)
+            print(f"\rIngested {result.documents}/{total} documents ({rate:.0f} docs/s)", end="", flush=True)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) <= 1:
+        # Not worth starting a process pool
+        embedding_function = embedding_function_factory()
+        for key, batch in pending:
+            for attempt in range(max_retries + 1):
+                try:
+                    write(key, batch, np.asarray(embedding_function(batch[1]), dtype=np.float32))
+                    break
+                except Exception as e:
+                    if attempt == max_retries:
+                        result.failed_batches.append((batch[0][0], repr(e)))
+    else:
+        if embedding_function_factory is default_embedding_function:
+            # Split the cores between the workers instead of every worker using all of them
+            embedding_function_factory = functools.partial(
+                default_embedding_function, threads=max(1, (os.cpu_count() or 1) // workers)
+            )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(embedding_function_factory,)) as pool:
+            queue = list(reversed(pending))
+            attempts = {}
+            in_flight = {}
+            while queue or in_flight:
+                # Keep a bounded number of batches in flight so that memory stays flat
+                while queue and len(in_flight) < 2 * workers:
+                    key, batch = queue.pop()
+                    in_flight[pool.submit(_embed, batch[1])] = (key, batch)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, batch = in_flight.pop(future)
+                    try:
+                        write(key, batch, future.result())
+                    except Exception as e:
+                        attempts[key] = attempts.get(key, 0) + 1
+                        if attempts[key] <= max_retries:
+                            queue.append((key, batch))
+                        else:
+                            result.failed_batches.append((batch[0][0], repr(e)))
+
+    if show_progress and pending:
+        print()
+        for first_id, error in result.failed_batches:
+            print(f"Batch starting at {first_id} failed: {error}")
+    result.seconds = time.perf_counter() - start
+    if not result.failed_batches:
+        journal.remove()
+    return result
+
@@ -0,0 +1,110 @@
+"""
+Hash-based incremental sync of a document set into a ChromaDB collection.
+
+Each document is stored with a content hash in its metadata. Syncing compares
+the hashes in the collection with the hashes of the source documents and
+applies only the difference:
+
+  - added:   ids that are not in the collection yet
+  - updated: ids whose text or metadata changed since the last sync
+  - deleted: ids in the collection that are no longer in the source documents
+
+Added and updated documents are written with batched upserts, so only they get
+embedded again. Removed ones are deleted in batches. Unchanged documents are
+not touched at all.
+
+Documents need stable ids for this to work (e.g. "DOC-001" or a source URL
+rather than their position in a list).
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+
+CONTENT_HASH_KEY = "content_hash"
+
+
+def content_hash(text, metadata=None):
+    """Hash of a document's text and metadata."""
+    payload = json.dumps([text, metadata or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SyncResult:
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    def __str__(self):
+        return f"{self.added} added, {self.updated} updated, {self.deleted} deleted, {self.unchanged} unchanged"
+
+
+def stored_hashes(collection, page_size=10000):
+    """Return {id: content hash} for every document in the collection, read page by page."""
+    hashes = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            hashes[doc_id] = (metadata or {}).get(CONTENT_HASH_KEY)
+        if len(page["ids"]) < page_size:
+            return hashes
+        offset += page_size
+
+
+def upsert_batches(collection, ids, documents, metadatas, batch_size=5000):
+    """Upsert documents in batches of at most `batch_size`."""
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.upsert(ids=ids[start:end], documents=documents[start:end], metadatas=metadatas[start:end])
+
+
+def sync_collection(collection, ids, documents, metadatas=None, batch_size=5000, upsert=upsert_batches):
+    """
+    Make the collection contain exactly the given documents, writing only what changed.
+
+    Args:
+        collection: ChromaDB collection.
+        ids (list[str]): Stable, unique id of each document.
+        documents (list[str]): Document texts.
+        metadatas (list[dict], optional): Metadata of each document.
+        batch_size (int): Maximum number of documents per upsert or delete call.
+        upsert (callable): Function called as upsert(collection, ids, documents, metadatas,
+            batch_size=...) to write added and updated documents.
+
+    Returns:
+        SyncResult: Number of added, updated, deleted and unchanged documents.
+    """
+    if len(set(ids)) != len(ids):
+        raise ValueError("Document ids must be unique")
+    metadatas = metadatas or [{} for _ in ids]
+
+    existing = stored_hashes(collection)
+    result = SyncResult()
+    changed_ids, changed_documents, changed_metadatas = [], [], []
+
+    for doc_id, document, metadata in zip(ids, documents, metadatas):
+        digest = content_hash(document, metadata)
+        if doc_id not in existing:
+            result.added += 1
+        elif existing.pop(doc_id) == digest:
+            result.unchanged += 1
+            continue
+        else:
+            result.updated += 1
+        changed_ids.append(doc_id)
+        changed_documents.append(document)
+        changed_metadatas.append({**metadata, CONTENT_HASH_KEY: digest})
+
+    if changed_ids:
+        upsert(collection, changed_ids, changed_documents, changed_metadatas, batch_size=batch_size)
+
+    # Whatever is left in `existing` is no longer in the source documents
+    deleted_ids = list(existing)
+    for start in range(0, len(deleted_ids), batch_size):
+        collection.delete(ids=deleted_ids[start:start + batch_size])
+    result.deleted = len(deleted_ids)
+
+    return result
@@ -0,0 +1,239 @@
+"""
+Content-addressed on-disk cache for text embeddings.
+
+Embeddings are stored per embedding model and looked up by a hash of the text,
+so restarting a demo only encodes documents that are new or have changed since
+the last run. The vectors live in a raw float32 file that is memory-mapped on
+load; when a corpus is unchanged its embeddings are returned as a zero-copy view
+of that file.
+
+Cache layout (one directory per model):
+
+    <cache_dir>/<model name>/keys.bin      16-byte text hashes, one per row
+    <cache_dir>/<model name>/vectors.f32   float32 embeddings, one row per key
+    <cache_dir>/<model name>/meta.json     embedding dimension and row count
+
+Rows are only ever appended, and the row count in meta.json is written last,
+so an interrupted write never exposes a half-written row. The cache is meant to
+be used by one process at a time.
+
+`hits` and `misses` count the texts served from the cache and the texts that
+had to be encoded; `stats()` returns them with the hit rate.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+KEY_DTYPE = np.dtype("S16")
+
+
+def hash_texts(texts):
+    """Return the 16-byte BLAKE2b hash of each text as a NumPy byte-string array."""
+    return np.array(
+        [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for text in texts],
+        dtype=KEY_DTYPE,
+    )
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for a single embedding model.
+
+    Args:
+        cache_dir (str): Root directory of the cache. Created if missing.
+        model_name (str): Name of the embedding model. Embeddings from different
+            models are kept in separate subdirectories.
+    """
+
+    def __init__(self, cache_dir, model_name):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+
+        self._keys_path = os.path.join(self.path, "keys.bin")
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def __len__(self):
+        return self.count
+
+    def stats(self):
+        """Texts served from the cache and texts encoded so far, with the hit rate and cache size."""
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": self.count,
+        }
+
+    def _load(self):
+        meta = {"dim": None, "count": 0}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+
+        if self.count:
+            self._keys = np.fromfile(self._keys_path, dtype=KEY_DTYPE, count=self.count)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        else:
+            self._keys = np.empty(0, dtype=KEY_DTYPE)
+            self._vectors = None
+
+        # Sorted copy of the keys for vectorized lookups with np.searchsorted
+        self._order = np.argsort(self._keys, kind="stable")
+        self._sorted_keys = self._keys[self._order]
+
+    def _lookup(self, keys):
+        """Row number of each key in the cache, or -1 when the key is not cached."""
+        if not len(self._sorted_keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_keys, keys)
+        positions = np.minimum(positions, len(self._sorted_keys) - 1)
+        found = self._sorted_keys[positions] == keys
+        return np.where(found, self._order[positions], -1)
+
+    def _check_dim(self, vectors):
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match the cached dimension {self.dim} "
+                f"for model '{self.model_name}'"
+            )
+
+    def _append(self, keys, vectors):
+        self._check_dim(vectors)
+        self._write_rows(keys, vectors)
+        self._load()
+
+    def _write_rows(self, keys, vectors):
+        """Append rows to the cache files and commit them, without refreshing the lookup index."""
+        self._append_rows(self._vectors_path, vectors, row_bytes=4 * self.dim)
+        self._append_rows(self._keys_path, keys, row_bytes=KEY_DTYPE.itemsize)
+        self.count += len(keys)
+
+        with open(self._meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "count": self.count}, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+
+    def _append_rows(self, file_path, array, row_bytes):
+        committed_size = self.count * row_bytes
+        with open(file_path, "ab") as f:
+            # Drop rows past the committed count, left behind by an interrupted write
+            if f.tell() > committed_size:
+                f.truncate(committed_size)
+            f.write(array.tobytes())
+
+    def encode(self, texts, encode_fn):
+        """
+        Return embeddings for `texts`, encoding only the texts that are not cached yet.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            encode_fn (callable): Function that takes a list of texts and returns
+                their embeddings, e.g. `model.encode` of a SentenceTransformer.
+
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dim). When all texts are
+            cached in the same order as requested, this is a read-only view of the
+            memory-mapped cache file.
+        """
+        texts = list(texts)
+        keys = hash_texts(texts)
+        rows = self._lookup(keys)
+
+        missing = np.flatnonzero(rows < 0)
+        encoded = 0
+        if len(missing):
+            # Encode each distinct new text only once, even if it appears several times,
+            # and keep their order, so an unchanged corpus maps to one contiguous block of rows
+            _, first = np.unique(keys[missing], return_index=True)
+            new_rows = missing[np.sort(first)]
+            new_keys = keys[new_rows]
+            new_texts = [texts[i] for i in new_rows]
+            new_vectors = np.ascontiguousarray(encode_fn(new_texts), dtype=np.float32)
+            self._append(new_keys, new_vectors)
+            rows = self._lookup(keys)
+            encoded = len(new_texts)
+        # Repeats of a new text are served from its single new row and count as hits
+        self.hits += len(texts) - encoded
+        self.misses += encoded
+
+        if not len(texts):
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        if rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+            # Unchanged corpus: the rows are one contiguous block, no copy needed
+            return self._vectors[rows[0]:rows[-1] + 1]
+        return np.asarray(self._vectors[rows])
+
+    def encode_stream(self, batches, encode_fn):
+        """
+        Streaming version of `encode` for corpora that don't fit in memory.
+
+        Takes an iterable of text batches and yields one embedding array per batch.
+        New embeddings are committed to disk batch by batch. A text repeated within
+        a batch is encoded and stored once, but the lookup index is only refreshed
+        once at the end, so a text repeated in a later batch of the same stream may
+        be encoded again.
+        """
+        for texts in batches:
+            texts = list(texts)
+            keys = hash_texts(texts)
+            rows = self._lookup(keys)
+            missing = np.flatnonzero(rows < 0)
+
+            if not len(missing):
+                self.hits += len(texts)
+                yield np.asarray(self._vectors[rows])
+                continue
+
+            # Encode each distinct new text of the batch once, in order of first appearance;
+            # `inverse` maps every missing text to its row in `new_vectors`
+            _, first, inverse = np.unique(keys[missing], return_index=True, return_inverse=True)
+            order = np.argsort(first)
+            first = first[order]
+            inverse = np.argsort(order)[inverse.ravel()]
+            new_keys = keys[missing[first]]
+            new_vectors = np.ascontiguousarray(
+                encode_fn([texts[missing[i]] for i in first]), dtype=np.float32
+            )
+            self._check_dim(new_vectors)
+            self.hits += len(texts) - len(new_keys)
+            self.misses += len(new_keys)
+
+            vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+            cached = np.flatnonzero(rows >= 0)
+            if len(cached):
+                vectors[cached] = self._vectors[rows[cached]]
+            vectors[missing] = new_vectors[inverse]
+            self._write_rows(new_keys, new_vectors)
+            yield vectors
+
+        self._load()
+
+    def compact(self, texts):
+        """Rewrite the cache so it only holds the embeddings of `texts`, dropping stale rows."""
+        keys = hash_texts(texts)
+        rows = self._lookup(keys)
+        _, first = np.unique(keys[rows >= 0], return_index=True)
+        keep = np.flatnonzero(rows >= 0)[np.sort(first)]
+        keys = keys[keep]
+        vectors = np.array(self._vectors[rows[keep]]) if len(keep) else None
+
+        self._vectors = None
+        for file_path in (self._meta_path, self._keys_path, self._vectors_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self._load()
+        if vectors is not None:
+            self._append(keys, vectors)
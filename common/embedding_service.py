@@ -0,0 +1,326 @@
+"""
+Shared sentence embedding service with an ONNX Runtime CPU backend.
+
+Demos 1 and 2 used to load all-MiniLM-L6-v2 through PyTorch
+(sentence-transformers), while ChromaDB in demos 3 to 4.1 runs the same model
+through onnxruntime. `EmbeddingService` gives every demo the same model on the
+same runtime:
+
+  - "onnx" backend (default): the ONNX export of all-MiniLM-L6-v2 from the
+    Hugging Face hub, run with onnxruntime on the CPU. With `quantize=True`
+    the weights are quantized to int8 once (needs the `onnx` package) and the
+    quantized model is cached next to the original.
+  - "torch" backend: the sentence-transformers model, kept as the reference
+    for parity checks and benchmarks.
+
+Both backends produce mean-pooled, L2-normalized 384-dimensional vectors, the
+same as sentence-transformers and ChromaDB's built-in embedding function.
+
+Batching: `encode()` sorts the texts by length and pads each batch only to its
+longest text, instead of padding everything to the maximum sequence length.
+`submit()` adds dynamic batching across threads: requests that arrive within
+`max_wait` seconds of each other are encoded together in one model call.
+`threads` sets the number of CPU threads the backend uses.
+
+Usage:
+
+    from embedding_service import get_embedding_service
+
+    service = get_embedding_service()
+    vectors = service.encode(["first text", "second text"])  # float32 array (2, 384)
+    vector = service.submit(["a question"]).result()[0]       # from any thread
+
+Like a ChromaDB embedding function, `service(texts)` returns a list of float32 vectors.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+HF_REPO_ID = "sentence-transformers/all-MiniLM-L6-v2"
+BACKENDS = ("onnx", "torch")
+MAX_SEQUENCE_LENGTH = 256  # Same limit as sentence-transformers and ChromaDB
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1e-12
+    return (vectors / norms).astype(np.float32)
+
+
+def quantize_model(model_path, quantized_path=None):
+    """
+    Write an int8 dynamically quantized copy of an ONNX model (once) and return its path.
+
+    Weights are stored as int8 and activations are quantized on the fly, which makes the
+    matrix multiplications of the transformer layers cheaper on CPUs with int8 support.
+    """
+    quantized_path = quantized_path or os.path.splitext(model_path)[0] + "_int8.onnx"
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic  # Needs the onnx package
+
+        print(f"Quantizing {model_path} to int8...")
+        temporary_path = quantized_path + ".tmp"
+        quantize_dynamic(model_path, temporary_path, weight_type=QuantType.QInt8)
+        os.replace(temporary_path, quantized_path)
+    return quantized_path
+
+
+class OnnxBackend:
+    """
+    all-MiniLM-L6-v2 on onnxruntime.
+
+    Args:
+        model_path (str, optional): Path of the .onnx model. Downloaded from the Hugging Face hub by default.
+        tokenizer_path (str, optional): Path of the matching tokenizer.json.
+        quantize (bool): Use an int8 quantized copy of the model.
+        threads (int, optional): Intra-op threads of onnxruntime. Defaults to one per core.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path=None, tokenizer_path=None, quantize=False, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if model_path is None or tokenizer_path is None:
+            from huggingface_hub import hf_hub_download
+
+            model_path = model_path or hf_hub_download(HF_REPO_ID, "onnx/model.onnx")
+            tokenizer_path = tokenizer_path or hf_hub_download(HF_REPO_ID, "tokenizer.json")
+        if quantize:
+            model_path = quantize_model(model_path)
+        self.model_path = model_path
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        self.tokenizer.no_padding()  # Batches are padded to their own longest text in embed()
+
+        options = ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def embed(self, texts):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(encodings), length), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = encoding.attention_mask
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": np.zeros_like(input_ids)}
+        last_hidden_state = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+
+        # Mean pooling over the real tokens
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(pooled)
+
+
+class TorchBackend:
+    """
+    all-MiniLM-L6-v2 through sentence-transformers on PyTorch (the reference backend).
+
+    Args:
+        threads (int, optional): Number of PyTorch CPU threads.
+    """
+
+    name = "torch"
+
+    def __init__(self, threads=None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(MODEL_NAME, device="cpu")
+
+    def embed(self, texts):
+        texts = list(texts)
+        return self.model.encode(
+            texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
+
+class EmbeddingService:
+    """
+    Batched sentence embeddings on a selectable backend.
+
+    Args:
+        backend (str): "onnx" (default) or "torch".
+        quantize (bool): With "onnx", run an int8 quantized copy of the model.
+        threads (int, optional): CPU threads used by the backend. Defaults to all cores.
+        max_batch_size (int): Texts per model call.
+        max_wait (float): How long `submit()` waits for more requests before running a batch.
+        **backend_options: Passed to the backend, e.g. model_path and tokenizer_path for "onnx".
+    """
+
+    def __init__(self, backend="onnx", quantize=False, threads=None, max_batch_size=64, max_wait=0.005,
+                 **backend_options):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+        if backend == "onnx":
+            self.backend = OnnxBackend(quantize=quantize, threads=threads, **backend_options)
+        else:
+            self.backend = TorchBackend(threads=threads, **backend_options)
+        self.quantize = quantize
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._dimension = None
+        self._model_lock = threading.Lock()  # One model call at a time, the backend uses all its threads
+        self._requests = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        """Name of the model as used for caches: quantized vectors differ slightly and are cached separately."""
+        return MODEL_NAME + ("-int8" if self.quantize else "")
+
+    @property
+    def dimension(self):
+        if self._dimension is None:
+            self._dimension = self.encode(["dimension probe"]).shape[1]
+        return self._dimension
+
+    def get_sentence_embedding_dimension(self):
+        """Same name as in sentence-transformers, so the service can replace a SentenceTransformer."""
+        return self.dimension
+
+    def encode(self, texts, **kwargs):
+        """
+        Embed texts in length-sorted batches.
+
+        Extra keyword arguments of sentence-transformers' `encode` (batch_size,
+        convert_to_numpy, ...) are accepted and ignored, so the service can be used
+        wherever a SentenceTransformer was.
+
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dim), normalized, in input order.
+        """
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        if not texts:
+            return np.empty((0, self._dimension or 0), dtype=np.float32)
+
+        # Similar lengths in one batch keep the padding small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = None
+        for start in range(0, len(order), self.max_batch_size):
+            rows = order[start:start + self.max_batch_size]
+            with self._model_lock:
+                vectors = self.backend.embed([texts[i] for i in rows])
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                self._dimension = vectors.shape[1]
+            result[rows] = vectors
+        return result
+
+    def __call__(self, input):
+        """ChromaDB embedding function interface: list of texts -> list of vectors."""
+        return list(self.encode(input))
+
+    def submit(self, texts):
+        """
+        Queue texts for embedding and return a Future of their (len(texts), dim) array.
+
+        Requests from several threads that arrive close together are embedded in one batch.
+        """
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        future = Future()
+        self._ensure_worker()
+        self._requests.put((texts, future))
+        return future
+
+    def close(self):
+        """Stop the batching thread of `submit()`."""
+        with self._worker_lock:
+            if self._worker is not None:
+                self._requests.put(None)
+                self._worker.join()
+                self._worker = None
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _batch_loop(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            batch = [request]
+            size = len(request[0])
+            stop = False
+            # Collect more requests until the batch is full or max_wait has passed
+            while size < self.max_batch_size:
+                try:
+                    request = self._requests.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = self.encode(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                start = 0
+                for request_texts, future in batch:
+                    future.set_result(vectors[start:start + len(request_texts)])
+                    start += len(request_texts)
+            if stop:
+                return
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def get_embedding_service(backend="onnx", quantize=False, threads=None):
+    """Return the process-wide EmbeddingService, creating it on first use."""
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = EmbeddingService(backend=backend, quantize=quantize, threads=threads)
+        elif (_default_service.backend.name, _default_service.quantize) != (backend, quantize):
+            raise ValueError(
+                f"The embedding service already runs backend '{_default_service.backend.name}' "
+                f"(quantize={_default_service.quantize})"
+            )
+        return _default_service
+
+
+def parity(texts, reference, candidate):
+    """
+    Compare the embeddings of two services (e.g. torch vs. onnx) on the same texts.
+
+    Returns:
+        dict: Minimum and mean cosine similarity of matching vectors, and the maximum
+            absolute difference of any component.
+    """
+    expected = reference.encode(texts)
+    found = candidate.encode(texts)
+    cosines = np.einsum("ij,ij->i", expected, found)
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "max_abs_diff": float(np.abs(expected - found).max()),
+    }
@@ -0,0 +1,221 @@
+"""
+Quantized embedding storage with full-precision rescoring.
+
+A float32 MiniLM embedding takes 384 * 4 = 1536 bytes, so 10M of them need
+about 15 GB of RAM. `QuantizedVectorStore` keeps only compact codes in memory:
+
+  - "int8":   scalar quantization, one byte per dimension (4x smaller, ~3.8 GB for 10M).
+              Every dimension is mapped linearly from its [min, max] range to 256 levels.
+  - "binary": one sign bit per dimension (32x smaller, ~480 MB for 10M). Similarity
+              is estimated by the Hamming distance between the codes.
+
+A search first scores all codes approximately and keeps a shortlist of
+`k * rescore_factor` candidates. Only those are then read from the full-precision
+vectors, which can stay on disk as a memory-mapped .npy file (or an
+EmbeddingCache memmap), and scored exactly. The returned top k are therefore
+ranked by the true metric. Only candidates that were dropped from the
+shortlist cost recall, which `benchmark_quantized_store.py` measures.
+
+Usage:
+
+    store = QuantizedVectorStore("binary", metric="cosine").fit(np.load("vectors.npy", mmap_mode="r"))
+    scores, indices = store.search(query_embeddings, k=10)
+"""
+
+import numpy as np
+
+QUANTIZATION_KINDS = ("int8", "binary")
+
+# Rows processed at a time, so that encoding and scoring 10M vectors never needs a
+# float32 copy of the whole matrix
+CHUNK_ROWS = 65536
+
+
+def _normalize(vectors):
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _popcount(values):
+    """Number of set bits of every value (uint64 words with numpy >= 2.0, else uint8 bytes)."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values]
+
+
+def _words(codes):
+    """View packed bit codes as uint64 words when possible: 8x fewer xor/popcount operations."""
+    if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+        return np.ascontiguousarray(codes).view(np.uint64)
+    return codes
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class QuantizedVectorStore:
+    """
+    Compact in-memory codes plus exact rescoring against full-precision vectors.
+
+    Args:
+        kind (str): "int8" or "binary".
+        metric (str): "cosine" (higher score is better) or "euclidean" (squared distance, lower is better).
+        rescore_factor (int): Shortlist size as a multiple of k. Larger means better recall
+            and more full-precision rows read per query.
+    """
+
+    def __init__(self, kind="int8", metric="cosine", rescore_factor=10):
+        if kind not in QUANTIZATION_KINDS:
+            raise ValueError(f"Unknown quantization '{kind}'. Choose one of: {', '.join(QUANTIZATION_KINDS)}")
+        if metric not in ("cosine", "euclidean"):
+            raise ValueError(f"Unknown metric '{metric}'")
+        self.kind = kind
+        self.metric = metric
+        self.rescore_factor = rescore_factor
+        self.vectors = None  # Full-precision vectors, may be a memmap
+        self.codes = None
+        self._low = None     # int8: per-dimension minimum
+        self._step = None    # int8: per-dimension quantization step
+        self._center = None  # binary: per-dimension mean, the sign is taken after centering
+        self._sq_norms = None  # euclidean: exact squared norm of every vector (4 bytes each)
+
+    def fit(self, vectors):
+        """
+        Encode `vectors` (array or memmap of shape (n, dim)). The array itself is kept,
+        not copied, and is only read again for rescoring.
+        """
+        self.vectors = vectors
+        n, dim = vectors.shape
+
+        if self.kind == "int8":
+            low = np.full(dim, np.inf, dtype=np.float32)
+            high = np.full(dim, -np.inf, dtype=np.float32)
+            for chunk in self._chunks(vectors):
+                low = np.minimum(low, chunk.min(axis=0))
+                high = np.maximum(high, chunk.max(axis=0))
+            self._low = low
+            self._step = np.maximum(high - low, 1e-12) / 255.0
+            self.codes = np.empty((n, dim), dtype=np.uint8)
+        else:
+            total = np.zeros(dim, dtype=np.float64)
+            for chunk in self._chunks(vectors):
+                total += chunk.sum(axis=0)
+            self._center = (total / max(n, 1)).astype(np.float32)
+            self.codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+
+        if self.metric == "euclidean":
+            self._sq_norms = np.empty(n, dtype=np.float32)
+        for start, chunk in self._chunks(vectors, with_start=True):
+            self.codes[start:start + len(chunk)] = self._encode(chunk)
+            if self.metric == "euclidean":
+                self._sq_norms[start:start + len(chunk)] = np.einsum("ij,ij->i", chunk, chunk)
+        return self
+
+    def __len__(self):
+        return 0 if self.codes is None else len(self.codes)
+
+    @property
+    def code_bytes(self):
+        """RAM used by the codes."""
+        return self.codes.nbytes
+
+    @property
+    def full_precision_bytes(self):
+        """Size of the full-precision vectors (on disk when memory-mapped)."""
+        return self.vectors.shape[0] * self.vectors.shape[1] * 4
+
+    def search(self, queries, k=10):
+        """
+        Top-k search: approximate shortlist from the codes, exact rescoring of the shortlist.
+
+        Returns:
+            tuple: (scores, indices) of shape (n_queries, k), best first. Scores are cosine
+                similarities for "cosine" and squared euclidean distances for "euclidean".
+        """
+        queries = np.array(queries, dtype=np.float32, ndmin=2)
+        if self.metric == "cosine":
+            queries = _normalize(queries)
+        k = min(k, len(self))
+        shortlist_size = min(len(self), k * self.rescore_factor)
+        shortlists = self.shortlist(queries, shortlist_size)
+
+        all_scores = np.empty((len(queries), k), dtype=np.float32)
+        all_indices = np.empty((len(queries), k), dtype=np.int64)
+        for row, (query, candidates) in enumerate(zip(queries, shortlists)):
+            candidates = np.sort(candidates)  # Sequential reads from the memmap
+            exact = self._exact_scores(query, np.asarray(self.vectors[candidates], dtype=np.float32))
+            top = np.argsort(-exact if self.metric == "cosine" else exact)[:k]
+            all_scores[row] = exact[top]
+            all_indices[row] = candidates[top]
+        return all_scores, all_indices
+
+    def shortlist(self, queries, size):
+        """Indices of the `size` best candidates per query by approximate score (unordered)."""
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_indices = np.empty((len(queries), 0), dtype=np.int64)
+        prepared = self._prepare_queries(queries)
+
+        for start in range(0, len(self.codes), CHUNK_ROWS):
+            codes = self.codes[start:start + CHUNK_ROWS]
+            scores = self._approximate_scores(prepared, codes, start)  # Higher is better
+            scores = np.concatenate([best_scores, scores], axis=1)
+            indices = np.concatenate(
+                [best_indices, np.broadcast_to(np.arange(start, start + len(codes)), (len(queries), len(codes)))],
+                axis=1,
+            )
+            if scores.shape[1] > size:
+                keep = np.argpartition(scores, -size, axis=1)[:, -size:]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                indices = np.take_along_axis(indices, keep, axis=1)
+            best_scores, best_indices = scores, indices
+        return best_indices
+
+    def exact_scores(self, queries):
+        """Exact scores of every query against every vector, read chunk by chunk (for small stores)."""
+        queries = np.array(queries, dtype=np.float32, ndmin=2)
+        if self.metric == "cosine":
+            queries = _normalize(queries)
+        return np.concatenate(
+            [np.stack([self._exact_scores(q, chunk) for q in queries]) for chunk in self._chunks(self.vectors)],
+            axis=1,
+        )
+
+    def _chunks(self, vectors, with_start=False):
+        for start in range(0, len(vectors), CHUNK_ROWS):
+            chunk = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+            if self.metric == "cosine":
+                chunk = _normalize(chunk)
+            yield (start, chunk) if with_start else chunk
+
+    def _encode(self, chunk):
+        if self.kind == "int8":
+            return np.clip(np.rint((chunk - self._low) / self._step), 0, 255).astype(np.uint8)
+        return np.packbits(chunk > self._center, axis=1)
+
+    def _prepare_queries(self, queries):
+        if self.kind == "int8":
+            # q.x ~= q.low + (q * step).code, so the constant q.low can be dropped for ranking
+            return queries * self._step
+        return _words(np.packbits(queries > self._center, axis=1))
+
+    def _approximate_scores(self, prepared, codes, start):
+        if self.kind == "int8":
+            # Approximate q.x up to a per-query constant
+            scores = prepared @ codes.T.astype(np.float32)
+            if self.metric == "euclidean":
+                # -|q - x|^2 = 2 q.x - |x|^2 - |q|^2, the last term does not change the ranking
+                scores = 2 * scores - self._sq_norms[start:start + len(codes)]
+            return scores
+        # Fewer differing sign bits means a smaller angle. For euclidean search this shortlists by
+        # angle, which matches the distance ranking for normalized embeddings such as MiniLM's.
+        codes = _words(codes)
+        hamming = np.stack([_popcount(np.bitwise_xor(codes, q)).sum(axis=1, dtype=np.int32) for q in prepared])
+        return -hamming.astype(np.float32)
+
+    def _exact_scores(self, query, vectors):
+        if self.metric == "cosine":
+            return _normalize(vectors) @ query
+        difference = vectors - query
+        return np.einsum("ij,ij->i", difference, difference)
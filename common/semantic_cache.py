@@ -0,0 +1,218 @@
+"""
+Semantic answer cache for LLM calls.
+
+Users ask the same questions again and again in slightly different words
+("Who won last year?" vs "Who won the regatta last year"). Instead of sending
+each of them to the LLM, `SemanticCache` stores answers together with the
+embedding of the question and the ids of the context they were generated
+from. A new question gets the stored answer when
+
+  - its embedding has at least `similarity_threshold` cosine similarity with a
+    cached question, and
+  - retrieval returned the same context documents. If the documents changed
+    (or a filter selected different ones), the old answer is not reused.
+
+Questions answered without an embedding (e.g. identifier lookups answered by
+the BM25 index) are stored with `embedding=None` and only match the same
+question text, compared after lowercasing and collapsing whitespace, with the
+same context.
+
+Entries expire after `ttl_seconds`, the least recently used entry is evicted
+when the cache is full, and the cache is saved to a JSON file so it survives
+restarts. `stats()` reports hits, misses and the hit rate.
+
+Usage:
+
+    cache = SemanticCache("./answer_cache.json")
+    answer = cache.lookup(question_embedding, context_ids)
+    if answer is None:
+        answer = call_llm(prompt)
+        cache.store(question, question_embedding, context_ids, answer)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from chroma_sync import CONTENT_HASH_KEY
+
+
+def retrieved_context_ids(results):
+    """
+    Ids of the documents in a ChromaDB query result, for the first query.
+
+    When the documents carry a content hash (see chroma_sync.py) it is part of the
+    id, so editing a document invalidates the answers generated from it.
+    """
+    metadatas = results.get("metadatas") or [[None] * len(results["ids"][0])]
+    return [
+        f"{doc_id}@{metadata[CONTENT_HASH_KEY]}" if metadata and CONTENT_HASH_KEY in metadata else doc_id
+        for doc_id, metadata in zip(results["ids"][0], metadatas[0])
+    ]
+
+
+def normalize_question(question):
+    """Key of a question for exact matches: lowercased, whitespace collapsed."""
+    return " ".join(question.lower().split())
+
+
+def _normalize(embedding):
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Answers keyed by question similarity and retrieved context.
+
+    Args:
+        path (str, optional): JSON file to load from and save to. In-memory only when None.
+        similarity_threshold (float): Minimum cosine similarity between questions for a hit.
+        ttl_seconds (float): Lifetime of an entry.
+        max_entries (int): Entries kept before the least recently used one is evicted.
+        autosave (bool): Save to `path` after every store.
+    """
+
+    def __init__(self, path=None, similarity_threshold=0.9, ttl_seconds=24 * 3600, max_entries=1000,
+                 autosave=True):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.autosave = autosave
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry id -> entry, least recently used first
+        self._next_id = 0
+        self._matrix = None            # stacked question embeddings, rebuilt after changes
+        self._matrix_ids = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def lookup(self, embedding, context_ids, question=None):
+        """
+        Return the cached answer for a similar question with the same context, or None.
+
+        Without an embedding, only an entry with the same `question` text (see
+        `normalize_question`) and the same context matches.
+        """
+        context_key = sorted(context_ids)
+        if embedding is None:
+            return self._lookup_text(question, context_key)
+        query = _normalize(embedding)
+        with self._lock:
+            self._expire()
+            best_id, best_similarity = None, self.similarity_threshold
+            if self._entries and len(self._embedding_matrix()):
+                similarities = self._embedding_matrix() @ query
+                # Most similar first, stop at the first candidate with the same context
+                for position in np.argsort(-similarities):
+                    if similarities[position] < best_similarity:
+                        break
+                    entry_id = self._matrix_ids[position]
+                    if self._entries[entry_id]["context_ids"] == context_key:
+                        best_id = entry_id
+                        break
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id]["answer"]
+
+    def _lookup_text(self, question, context_key):
+        key = normalize_question(question or "")
+        with self._lock:
+            self._expire()
+            for entry_id, entry in reversed(self._entries.items()):
+                if entry["context_ids"] == context_key and normalize_question(entry["question"]) == key:
+                    self.hits += 1
+                    self._entries.move_to_end(entry_id)
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, question, embedding, context_ids, answer):
+        """
+        Add an answer, evicting the least recently used entries when the cache is full.
+
+        `embedding` may be None for questions that were answered without embedding them.
+        """
+        with self._lock:
+            self._entries[self._next_id] = {
+                "question": question,
+                "embedding": _normalize(embedding).tolist() if embedding is not None else None,
+                "context_ids": sorted(context_ids),
+                "answer": answer,
+                "created_at": time.time(),
+            }
+            self._next_id += 1
+            self._expire()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+        if self.autosave and self.path:
+            self.save()
+
+    def stats(self):
+        """Hit and miss counts, hit rate and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def save(self):
+        """Write the entries to `path`, replacing the file atomically."""
+        with self._lock:
+            entries = list(self._entries.values())
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """Read the entries saved in `path`, skipping expired ones."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["entries"]
+        with self._lock:
+            self._entries.clear()
+            for entry in entries:  # Saved in LRU order
+                self._entries[self._next_id] = entry
+                self._next_id += 1
+            self._expire()
+            self._matrix = None
+
+    def _expire(self):
+        oldest_allowed = time.time() - self.ttl_seconds
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry["created_at"] < oldest_allowed]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self.expirations += len(expired)
+            self._matrix = None
+
+    def _embedding_matrix(self):
+        if self._matrix is None:
+            # Entries stored without an embedding only match by question text
+            self._matrix_ids = [i for i, entry in self._entries.items() if entry["embedding"] is not None]
+            self._matrix = np.array([self._entries[i]["embedding"] for i in self._matrix_ids], dtype=np.float32)
+        return self._matrix
@@ -0,0 +1,314 @@
+"""
+Per-stage latency tracing for the RAG pipelines.
+
+A trace is a tree of spans: the whole question (`rag_query`) and its stages,
+e.g. `embed_query`, `vector_search`, `prompt_assembly` and `llm`. Each span
+records its duration and attributes such as token counts, the query route or
+whether an answer came from the cache. The `llm` span also records the
+time-to-first-token of streamed responses.
+
+    from tracing import get_tracer
+
+    tracer = get_tracer()
+    with tracer.span("rag_query", question=question) as root:
+        with tracer.span("embed_query"):
+            embedding = embed(question)
+        with tracer.span("llm", model=MODEL) as llm_span:
+            for chunk in stream(prompt):
+                llm_span.first_token()  # Only the first call is recorded
+                ...
+        root.set(cache_hit=False)
+
+When a trace is finished (its root span ends), all of its spans are passed to
+the exporters:
+
+  - "console": an indented tree with durations and attributes on stdout
+  - "jsonl":   one JSON object per span, appended to a file
+  - "otlp":    one OTLP/JSON `resourceSpans` document per trace, appended to a
+               file. This is the OpenTelemetry protocol's JSON encoding, which
+               the OpenTelemetry Collector can read (otlpjsonfile receiver) and
+               forward to Jaeger, Tempo, etc.
+
+Tracing is off unless exporters are configured, either in code with
+`configure_tracing(["console"])` or with the environment variables
+RAG_TRACE=console,jsonl and RAG_TRACE_FILE=traces.jsonl. When it is off,
+`span()` returns a shared no-op span, so instrumented code costs about one
+method call per stage (see benchmark_tracing.py).
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+
+SERVICE_NAME = "rag-demos"
+DEFAULT_TRACE_FILES = {"jsonl": "traces.jsonl", "otlp": "traces.otlp.jsonl"}
+
+# The span that is open in the current thread or asyncio task
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage of a trace. Use it through `Tracer.span()`."""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent", "attributes", "events",
+                 "start_ns", "end_ns", "_start", "_duration", "_token", "_children")
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = attributes
+        self.events = []
+        self.start_ns = self.end_ns = None
+        self._start = self._duration = None
+        self._token = None
+        # Finished spans of the whole trace are collected on the root span
+        self._children = [] if parent is None else parent._children
+
+    @property
+    def duration_ms(self):
+        return self._duration * 1000 if self._duration is not None else None
+
+    def set(self, **attributes):
+        """Add attributes, e.g. span.set(prompt_tokens=120, cache_hit=False)."""
+        self.attributes.update(attributes)
+        return self
+
+    def event(self, name, **attributes):
+        """Record a point in time within the span, e.g. the first streamed token."""
+        offset_ms = (time.perf_counter() - self._start) * 1000
+        self.events.append({"name": name, "time_ns": time.time_ns(), "offset_ms": offset_ms, **attributes})
+        return offset_ms
+
+    def first_token(self):
+        """Record the time-to-first-token of a streamed response. Later calls are ignored."""
+        if "time_to_first_token_ms" not in self.attributes:
+            self.attributes["time_to_first_token_ms"] = round(self.event("first_token"), 3)
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self._duration * 1e9)
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self._children.append(self)
+        if self.parent is None:
+            self.tracer._export(self._children)
+        return False
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start_time_ns": self.start_ns,
+            "end_time_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class _NoopSpan:
+    """Returned by `Tracer.span()` while tracing is off: every method does nothing."""
+
+    __slots__ = ()
+    duration_ms = None
+
+    def set(self, **attributes):
+        return self
+
+    def event(self, name, **attributes):
+        return 0.0
+
+    def first_token(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+# ---------------------------------------------------------------------------
+# Exporters: export(spans) receives the finished spans of one trace, root last
+# ---------------------------------------------------------------------------
+
+class ConsoleExporter:
+    """Prints each trace as an indented tree of span durations."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def export(self, spans):
+        children = {}
+        for span in spans:
+            children.setdefault(span.parent.span_id if span.parent is not None else None, []).append(span)
+        lines = []
+
+        def walk(span, depth):
+            attributes = ", ".join(f"{key}={value}" for key, value in span.attributes.items())
+            lines.append(f"{'  ' * depth}{span.name:<{max(1, 24 - 2 * depth)}} {span.duration_ms:>9.1f} ms"
+                         + (f"  ({attributes})" if attributes else ""))
+            for child in sorted(children.get(span.span_id, []), key=lambda s: s.start_ns):
+                walk(child, depth + 1)
+
+        walk(spans[-1], 0)
+        print("[trace]\n" + "\n".join(lines), file=self.stream or sys.stdout, flush=True)
+
+
+class JsonlExporter:
+    """Appends one JSON object per span to a file."""
+
+    def __init__(self, path=DEFAULT_TRACE_FILES["jsonl"]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # int64 values are strings in OTLP/JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class OtlpJsonExporter:
+    """
+    Appends each trace as one line of OTLP/JSON (`ExportTraceServiceRequest`).
+
+    Args:
+        path (str): File to append to.
+        service_name (str): Value of the `service.name` resource attribute.
+    """
+
+    def __init__(self, path=DEFAULT_TRACE_FILES["otlp"], service_name=SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def to_otlp(self, spans):
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{
+                "scope": {"name": "tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent.span_id if span.parent is not None else "",
+                    "name": span.name,
+                    "kind": 1,  # SPAN_KIND_INTERNAL
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": _otlp_attributes(span.attributes),
+                    "events": [{
+                        "timeUnixNano": str(event["time_ns"]),
+                        "name": event["name"],
+                        "attributes": _otlp_attributes(
+                            {k: v for k, v in event.items() if k not in ("name", "time_ns")}
+                        ),
+                    } for event in span.events],
+                    "status": {"code": 2, "message": span.attributes["error"]} if "error" in span.attributes else {},
+                } for span in spans],
+            }],
+        }]}
+
+    def export(self, spans):
+        line = json.dumps(self.to_otlp(spans)) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+EXPORTERS = {"console": ConsoleExporter, "jsonl": JsonlExporter, "otlp": OtlpJsonExporter}
+
+
+class Tracer:
+    """
+    Creates spans and hands finished traces to the exporters.
+
+    Args:
+        exporters (list): Exporter objects (with an `export(spans)` method) or names from EXPORTERS.
+            No exporters means tracing is off.
+    """
+
+    def __init__(self, exporters=None):
+        self.exporters = [EXPORTERS[e]() if isinstance(e, str) else e for e in exporters or []]
+
+    @property
+    def enabled(self):
+        return bool(self.exporters)
+
+    def span(self, name, **attributes):
+        """Open a span as a child of the current one. Returns a no-op span while tracing is off."""
+        if not self.exporters:
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), attributes)
+
+    def current_span(self):
+        """The innermost open span, or the no-op span, e.g. to add attributes from a helper."""
+        span = _current_span.get()
+        return span if span is not None and self.exporters else NOOP_SPAN
+
+    def _export(self, spans):
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:  # Tracing must never break a query
+                print(f"Trace export with {type(exporter).__name__} failed: {e}", file=sys.stderr)
+
+
+_tracer = None
+
+
+def exporters_from_env():
+    """Exporters named in RAG_TRACE (comma separated), writing to RAG_TRACE_FILE if set."""
+    exporters = []
+    path = os.environ.get("RAG_TRACE_FILE")
+    for name in filter(None, (n.strip() for n in os.environ.get("RAG_TRACE", "").split(","))):
+        if name not in EXPORTERS:
+            raise ValueError(f"Unknown trace exporter '{name}' in RAG_TRACE. Choose from: {', '.join(EXPORTERS)}")
+        exporters.append(EXPORTERS[name](path) if path and name != "console" else EXPORTERS[name]())
+    return exporters
+
+
+def get_tracer():
+    """Return the process-wide tracer, configured from the environment on first use."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(exporters_from_env())
+    return _tracer
+
+
+def configure_tracing(exporters):
+    """Replace the exporters of the process-wide tracer, e.g. configure_tracing(["console", "otlp"])."""
+    tracer = get_tracer()
+    tracer.exporters = Tracer(exporters).exporters
+    return tracer
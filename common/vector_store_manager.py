@@ -0,0 +1,103 @@
+"""
+Process-wide manager for ChromaDB clients and collection handles.
+
+Creating a `chromadb.PersistentClient` opens the on-disk database and looking up
+a collection is another round trip, which is expensive compared to querying a
+small collection. The demos used to do both on every query. `VectorStoreManager`
+opens each persistent path once, caches the collection handles and hands the
+same objects out to every caller. It is safe to use from several threads and
+closes its clients when the process exits.
+
+Usage:
+
+    from vector_store_manager import get_vector_store_manager
+
+    collection = get_vector_store_manager().get_collection("./chroma_db_data", "sailing_knowledge_base")
+"""
+
+import atexit
+import os
+import threading
+
+
+class VectorStoreManager:
+    """Opens each ChromaDB persistent path once and caches its collection handles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}      # absolute path -> PersistentClient
+        self._collections = {}  # (absolute path, collection name) -> Collection
+
+    def get_client(self, path):
+        """Return the shared PersistentClient for `path`, opening it on first use."""
+        key = os.path.abspath(path)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # Imported on first use: importing chromadb takes about a second, which
+                # scripts that import this module without opening a database should not pay
+                import chromadb
+
+                client = chromadb.PersistentClient(path=path)
+                self._clients[key] = client
+            return client
+
+    def get_collection(self, path, name, create=False, **kwargs):
+        """
+        Return a cached handle to a collection.
+
+        Args:
+            path (str): Path of the persistent database.
+            name (str): Collection name.
+            create (bool): Create the collection when it does not exist yet
+                (get_or_create_collection). Otherwise a missing collection raises.
+            **kwargs: Passed on to get_collection / get_or_create_collection
+                (e.g. embedding_function) when the handle is first created.
+        """
+        key = (os.path.abspath(path), name)
+        with self._lock:
+            collection = self._collections.get(key)
+        if collection is not None:
+            return collection
+
+        client = self.get_client(path)
+        with self._lock:
+            # Another thread may have opened it in the meantime
+            collection = self._collections.get(key)
+            if collection is None:
+                if create:
+                    collection = client.get_or_create_collection(name=name, **kwargs)
+                else:
+                    collection = client.get_collection(name=name, **kwargs)
+                self._collections[key] = collection
+            return collection
+
+    def forget_collection(self, path, name):
+        """Drop a cached handle, e.g. after the collection was deleted."""
+        with self._lock:
+            self._collections.pop((os.path.abspath(path), name), None)
+
+    def close(self):
+        """Close all clients and drop every cached handle."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._collections.clear()
+        for client in clients:
+            close = getattr(client, "close", None)  # Only available in newer chromadb versions
+            if close is not None:
+                close()
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_vector_store_manager():
+    """Return the process-wide VectorStoreManager, creating it on first use."""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = VectorStoreManager()
+            atexit.register(_default_manager.close)
+        return _default_manager
@@ -0,0 +1,90 @@
+"""
+Load generator for the continuous-batching server.
+
+Sends the same set of prompts from many concurrent clients to two servers:
+
+  - baseline: ContinuousBatchingServer with max_batch_size=1, i.e. one prompt
+    is generated at a time like `generate_stream` in llama3-base.py
+  - batched:  ContinuousBatchingServer with a larger max_batch_size
+
+and reports aggregate generated tokens/sec and p50/p99 request latency and
+time to first token for both. Runs on CPU with a tiny model:
+
+    python benchmark_batching.py --model HuggingFaceTB/SmolLM2-135M --requests 64 --concurrency 16
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from continuous_batching import ContinuousBatchingServer
+
+PROMPTS = [
+    "The quickest way to learn sailing is",
+    "Once upon a time in a small harbour town,",
+    "The three most important rules of racing are",
+    "Write a short note to the race committee about",
+    "Retrieval-augmented generation works by",
+    "A good weather forecast for a regatta includes",
+]
+
+
+def run_load(server, num_requests, concurrency, max_new_tokens):
+    """Send `num_requests` prompts from `concurrency` client threads and collect the finished requests."""
+    def client(i):
+        request = server.submit(PROMPTS[i % len(PROMPTS)], max_new_tokens=max_new_tokens)
+        for _ in request:  # Consume the stream like a real client would
+            pass
+        return request
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        requests = list(pool.map(client, range(num_requests)))
+    return requests, time.perf_counter() - start
+
+
+def summarize(name, requests, elapsed):
+    latencies = np.array([r.latency for r in requests])
+    ttfts = np.array([r.time_to_first_token for r in requests if r.first_token_at is not None])
+    tokens = sum(len(r.token_ids) for r in requests)
+    print(
+        f"{name:>10}: {tokens / elapsed:8.1f} tokens/s | "
+        f"latency p50 {np.percentile(latencies, 50):6.2f}s p99 {np.percentile(latencies, 99):6.2f}s | "
+        f"TTFT p50 {np.percentile(ttfts, 50):6.2f}s p99 {np.percentile(ttfts, 99):6.2f}s | "
+        f"{len(requests)} requests in {elapsed:.1f}s"
+    )
+    return tokens / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-135M")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"Loading {args.model} on CPU...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+
+    # Warm up once so that the first measured requests don't pay for lazy initialization
+    with ContinuousBatchingServer(model, tokenizer, max_batch_size=1) as server:
+        server.submit(PROMPTS[0], max_new_tokens=2).result()
+
+    results = {}
+    for name, max_batch_size in (("baseline", 1), ("batched", args.max_batch_size)):
+        with ContinuousBatchingServer(model, tokenizer, max_batch_size=max_batch_size) as server:
+            requests, elapsed = run_load(server, args.requests, args.concurrency, args.max_new_tokens)
+        results[name] = summarize(name, requests, elapsed)
+
+    print(f"Throughput speedup: {results['batched'] / results['baseline']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
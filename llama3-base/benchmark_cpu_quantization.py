@@ -0,0 +1,92 @@
+"""
+Compare float32 and dynamic int8 CPU inference.
+
+Each variant is loaded in its own process so that the resident memory of one
+does not include the other. For each variant the script reports the resident
+memory after loading and the greedy decoding speed in tokens/sec:
+
+    python benchmark_cpu_quantization.py --model HuggingFaceTB/SmolLM2-135M --new-tokens 64
+"""
+
+import argparse
+import multiprocessing
+import time
+
+import torch
+
+from cpu_backend import load_cpu_model_and_tokenizer
+
+PROMPT = "The Emerald Bay Championship is a sailing regatta where"
+
+
+def resident_memory_mb():
+    """Resident memory of this process in MB (peak resident memory when psutil is not installed)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_variant(model_name, quantize, new_tokens, runs, num_threads, results):
+    tokenizer, model = load_cpu_model_and_tokenizer(model_name, quantize=quantize, num_threads=num_threads)
+    memory = resident_memory_mb()
+
+    inputs = tokenizer(PROMPT, return_tensors="pt")
+    generation_kwargs = dict(
+        **inputs,
+        max_new_tokens=new_tokens,
+        min_new_tokens=new_tokens,  # Always generate the same number of tokens
+        do_sample=False,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+    with torch.no_grad():
+        model.generate(**{**generation_kwargs, "max_new_tokens": 4, "min_new_tokens": 4})  # Warm-up
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.generate(**generation_kwargs)
+            timings.append(time.perf_counter() - start)
+
+    results["int8" if quantize else "fp32"] = {
+        "tokens_per_second": new_tokens / min(timings),
+        "resident_memory_mb": memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-135M")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        for quantize in (False, True):
+            process = context.Process(
+                target=run_variant,
+                args=(args.model, quantize, args.new_tokens, args.runs, args.threads, results),
+            )
+            process.start()
+            process.join()
+        results = dict(results)
+
+    print(f"\n{'variant':<8}{'tokens/s':>12}{'resident MB':>14}")
+    for name, result in results.items():
+        print(f"{name:<8}{result['tokens_per_second']:>12.1f}{result['resident_memory_mb']:>14.0f}")
+    if "fp32" in results and "int8" in results:
+        print(
+            f"int8 vs fp32: {results['int8']['tokens_per_second'] / results['fp32']['tokens_per_second']:.2f}x speed, "
+            f"{results['int8']['resident_memory_mb'] / results['fp32']['resident_memory_mb']:.2f}x memory"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Continuous-batching generation server for causal language models.
+
+`generate_stream` in llama3-base.py serves one prompt at a time: every other
+prompt waits until `model.generate` has finished the current one. This module
+runs a scheduler thread that keeps several requests "in flight" in a single
+decoding batch instead:
+
+  - New requests are taken from a queue between decode steps. Their prompt is
+    prefilled on its own and then joined to the running batch.
+  - Every decode step runs one forward pass for the whole batch and produces
+    the next token of every in-flight request.
+  - Finished requests (end-of-sequence token or max_new_tokens reached) leave
+    the batch right away, so their slot is free for the next request.
+  - Each request streams its own text back through its own queue.
+
+The key/value cache of the batch is left-padded to the longest sequence, with
+an attention mask that hides the padding. Runs on CPU with small models, e.g.
+"HuggingFaceTB/SmolLM2-135M".
+"""
+
+import queue
+import threading
+import time
+
+import torch
+from transformers import DynamicCache
+
+
+def _cache_layers(past_key_values):
+    """Return the key/value tensors of a cache as a list of (keys, values) per layer."""
+    if hasattr(past_key_values, "layers"):  # transformers >= 4.56
+        return [(layer.keys, layer.values) for layer in past_key_values.layers]
+    if hasattr(past_key_values, "key_cache"):
+        return list(zip(past_key_values.key_cache, past_key_values.value_cache))
+    return [tuple(layer) for layer in past_key_values]
+
+
+def _build_cache(layers):
+    cache = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(layers):
+        cache.update(keys, values, layer_idx)
+    return cache
+
+
+def _left_pad(tensor, length, dim):
+    """Pad `tensor` with zeros at the start of dimension `dim` up to `length`."""
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    pad_shape = list(tensor.shape)
+    pad_shape[dim] = missing
+    return torch.cat([tensor.new_zeros(pad_shape), tensor], dim=dim)
+
+
+class GenerationRequest:
+    """
+    A prompt submitted to the server. Iterate over it to receive the generated
+    text piece by piece; iteration ends when the request is finished.
+    """
+
+    _DONE = object()
+
+    def __init__(self, prompt: str, max_new_tokens: int, temperature: float):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.token_ids = []
+        self.text = ""
+        self.error = None
+        self.submitted_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self._pieces = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            piece = self._pieces.get()
+            if piece is self._DONE:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield piece
+
+    def result(self):
+        """Wait until the request is finished and return the full generated text."""
+        for _ in self:
+            pass
+        return self.text
+
+    @property
+    def latency(self):
+        return self.finished_at - self.submitted_at
+
+    @property
+    def time_to_first_token(self):
+        return self.first_token_at - self.submitted_at
+
+    def _add_token(self, token_id, text):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.token_ids.append(token_id)
+        # Decode the whole output again so that multi-token characters and words come out right,
+        # and hold back text that ends in an incomplete character
+        if not text.endswith("\ufffd") and len(text) > len(self.text):
+            self._pieces.put(text[len(self.text):])
+            self.text = text
+
+    def _finish(self, error=None):
+        self.error = error
+        self.finished_at = time.perf_counter()
+        self._pieces.put(self._DONE)
+
+
+class ContinuousBatchingServer:
+    """
+    Scheduler that decodes many requests together in one batch.
+
+    Args:
+        model: A Hugging Face causal language model.
+        tokenizer: The tokenizer of the model.
+        max_batch_size (int): Maximum number of requests decoded together.
+            With max_batch_size=1 the server handles one prompt at a time,
+            which is the single-prompt baseline.
+        eos_token_ids (Optional[List[int]]): Tokens that end a request. Defaults
+            to the tokenizer's end-of-sequence token.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size: int = 8, eos_token_ids=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        if eos_token_ids is None:
+            eos_token_ids = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+        self.eos_token_ids = set(eos_token_ids)
+        self.device = next(model.parameters()).device
+
+        self._waiting = queue.Queue()
+        self._running = False
+        self._thread = None
+
+        # State of the running batch, one row per in-flight request
+        self._requests = []
+        self._layers = []          # per layer: (keys, values) of shape (batch, heads, seq, head_dim)
+        self._attention_mask = None
+        self._lengths = None       # number of real (non-padding) tokens in the cache of each row
+        self._next_tokens = None   # token each row feeds into the next decode step
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, prompt: str, max_new_tokens: int = 64, temperature: float = 0.0):
+        """Queue a prompt for generation and return its GenerationRequest right away."""
+        request = GenerationRequest(prompt, max_new_tokens, temperature)
+        self._waiting.put(request)
+        return request
+
+    def _run(self):
+        while self._running:
+            self._admit_waiting_requests()
+            if self._requests:
+                try:
+                    self._decode_step()
+                except Exception as e:
+                    for request in self._requests:
+                        request._finish(error=e)
+                    self._reset_batch()
+
+        # Don't leave clients waiting forever on requests that will never run
+        stopped = RuntimeError("Server stopped before the request finished")
+        for request in self._requests:
+            request._finish(error=stopped)
+        self._reset_batch()
+        while not self._waiting.empty():
+            self._waiting.get_nowait()._finish(error=stopped)
+
+    def _admit_waiting_requests(self):
+        while len(self._requests) < self.max_batch_size:
+            try:
+                # Block briefly only when there is nothing to decode
+                request = self._waiting.get(timeout=0.05) if not self._requests else self._waiting.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self._prefill(request)
+            except Exception as e:
+                request._finish(error=e)
+
+    @torch.no_grad()
+    def _prefill(self, request):
+        input_ids = self.tokenizer(request.prompt, return_tensors="pt")["input_ids"].to(self.device)
+        outputs = self.model(input_ids=input_ids, use_cache=True)
+        token_id = self._sample(outputs.logits[:, -1, :], [request])[0]
+        if self._emit(request, token_id):
+            return
+
+        layers = _cache_layers(outputs.past_key_values)
+        attention_mask = torch.ones_like(input_ids)
+        lengths = torch.tensor([input_ids.shape[1]], device=self.device)
+        next_tokens = torch.tensor([token_id], device=self.device)
+
+        if not self._requests:
+            self._layers, self._attention_mask, self._lengths, self._next_tokens = layers, attention_mask, lengths, next_tokens
+        else:
+            # Left-pad the new request or the running batch so that both have the same cache length
+            seq_len = max(self._attention_mask.shape[1], attention_mask.shape[1])
+            self._layers = [
+                (
+                    torch.cat([_left_pad(k, seq_len, 2), _left_pad(nk, seq_len, 2)]),
+                    torch.cat([_left_pad(v, seq_len, 2), _left_pad(nv, seq_len, 2)]),
+                )
+                for (k, v), (nk, nv) in zip(self._layers, layers)
+            ]
+            self._attention_mask = torch.cat([_left_pad(self._attention_mask, seq_len, 1), _left_pad(attention_mask, seq_len, 1)])
+            self._lengths = torch.cat([self._lengths, lengths])
+            self._next_tokens = torch.cat([self._next_tokens, next_tokens])
+        self._requests.append(request)
+
+    @torch.no_grad()
+    def _decode_step(self):
+        batch_size = len(self._requests)
+        attention_mask = torch.cat([self._attention_mask, self._attention_mask.new_ones((batch_size, 1))], dim=1)
+        outputs = self.model(
+            input_ids=self._next_tokens[:, None],
+            attention_mask=attention_mask,
+            position_ids=self._lengths[:, None],
+            past_key_values=_build_cache(self._layers),
+            use_cache=True,
+        )
+        self._layers = _cache_layers(outputs.past_key_values)
+        self._attention_mask = attention_mask
+        self._lengths = self._lengths + 1
+
+        token_ids = self._sample(outputs.logits[:, -1, :], self._requests)
+        self._next_tokens = torch.tensor(token_ids, device=self.device)
+        finished = [self._emit(request, token_id) for request, token_id in zip(self._requests, token_ids)]
+        if any(finished):
+            self._remove_rows([row for row, done in enumerate(finished) if not done])
+
+    def _sample(self, logits, requests):
+        token_ids = []
+        for row, request in enumerate(requests):
+            if request.temperature > 0:
+                probs = torch.softmax(logits[row].float() / request.temperature, dim=-1)
+                token_ids.append(int(torch.multinomial(probs, 1)))
+            else:
+                token_ids.append(int(torch.argmax(logits[row])))
+        return token_ids
+
+    def _emit(self, request, token_id):
+        """Stream a generated token to its request. Returns True when the request is finished."""
+        is_eos = token_id in self.eos_token_ids
+        if not is_eos:
+            text = self.tokenizer.decode(request.token_ids + [token_id], skip_special_tokens=True)
+            request._add_token(token_id, text)
+        if is_eos or len(request.token_ids) >= request.max_new_tokens:
+            request._finish()
+            return True
+        return False
+
+    def _remove_rows(self, keep_rows):
+        if not keep_rows:
+            self._reset_batch()
+            return
+        keep = torch.tensor(keep_rows, device=self.device)
+        attention_mask = self._attention_mask[keep]
+        # Drop leading columns that are padding for every remaining row
+        first_column = int(attention_mask.any(dim=0).nonzero()[0])
+        self._attention_mask = attention_mask[:, first_column:]
+        self._layers = [(k[keep, :, first_column:], v[keep, :, first_column:]) for k, v in self._layers]
+        self._lengths = self._lengths[keep]
+        self._next_tokens = self._next_tokens[keep]
+        self._requests = [self._requests[row] for row in keep_rows]
+
+    def _reset_batch(self):
+        self._requests = []
+        self._layers = []
+        self._attention_mask = None
+        self._lengths = None
+        self._next_tokens = None
+
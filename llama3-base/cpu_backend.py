@@ -0,0 +1,99 @@
+"""
+CPU inference backend for machines without a GPU.
+
+The CUDA path in llama3-base.py relies on bitsandbytes 4-bit quantization and a
+CUDA device map, neither of which works on a CPU-only machine. This backend
+instead loads the model in float32 on the CPU and applies PyTorch dynamic int8
+quantization to its Linear layers: the weights are stored as int8 (about 4x
+smaller than float32) and the matrix multiplications run through the int8 CPU
+kernels (fbgemm / oneDNN on x86, qnnpack on ARM).
+"""
+
+import os
+from typing import Optional
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+
+def detect_device() -> str:
+    """Return "cuda" when a CUDA GPU is available, otherwise "cpu"."""
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def available_cpu_cores() -> int:
+    """Number of CPU cores this process may run on, preferring physical cores when psutil is installed."""
+    try:
+        import psutil
+        physical = psutil.cpu_count(logical=False)
+        if physical:
+            return physical
+    except ImportError:
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_cpu_threads(num_threads: Optional[int] = None) -> int:
+    """
+    Set the number of threads PyTorch uses for CPU inference.
+
+    Args:
+        num_threads (Optional[int]): Threads for intra-op parallelism. Defaults to the
+            number of available (physical) cores. Can also be set with the
+            TORCH_NUM_THREADS environment variable.
+
+    Returns:
+        int: The number of threads in use.
+    """
+    num_threads = num_threads or int(os.environ.get("TORCH_NUM_THREADS", 0)) or available_cpu_cores()
+    torch.set_num_threads(num_threads)
+    try:
+        # Generation runs one op after another, so inter-op parallelism only adds overhead
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Can only be set once, before any parallel work has started
+    return num_threads
+
+
+def quantize_int8(model):
+    """Apply dynamic int8 weight quantization to all Linear layers of a model."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_cpu_model_and_tokenizer(
+    model_name_or_path: str,
+    use_auth_token: Optional[str] = None,
+    quantize: bool = True,
+    num_threads: Optional[int] = None,
+    low_cpu_mem_usage: bool = True,
+):
+    """
+    Loads a causal language model for CPU inference.
+
+    Args:
+        model_name_or_path (str): The name or path of the model.
+        use_auth_token (Optional[str], optional): Hugging Face authentication token.
+        quantize (bool): Apply dynamic int8 quantization. When False the model runs in float32.
+        num_threads (Optional[int]): CPU threads to use, see `configure_cpu_threads`.
+        low_cpu_mem_usage (bool): Try to use less CPU memory while loading.
+
+    Returns:
+        tuple: (tokenizer, model)
+    """
+    threads = configure_cpu_threads(num_threads)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, token=use_auth_token)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name_or_path,
+        token=use_auth_token,
+        torch_dtype=torch.float32,  # The int8 CPU kernels take float32 activations
+        low_cpu_mem_usage=low_cpu_mem_usage,
+    )
+    model.eval()
+
+    if quantize:
+        model = quantize_int8(model)
+    print(f"CPU backend: {'int8 dynamic quantization' if quantize else 'float32'}, {threads} threads")
+    return tokenizer, model
@@ -2,6 +2,9 @@ import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM, TextStreamer, BitsAndBytesConfig
 from typing import Optional, List
 import os
+import time
+from prefix_cache import PrefixCache, crop_cache
+from cpu_backend import detect_device, load_cpu_model_and_tokenizer
 
 
 #Load .env file and set environment variables
@@ -15,21 +18,42 @@ def load_model_and_tokenizer(
     model_name_or_path: str,
     use_auth_token: Optional[str] = None,
     low_cpu_mem_usage: bool = True,
+    device: str = "auto",
+    cpu_quantize: bool = True,
+    num_threads: Optional[int] = None,
 ):
     """
     Loads the Llama 3.1 model and tokenizer with quantization and CPU offloading.
 
+    On a GPU the model is loaded with bitsandbytes 4-bit quantization. Without a GPU
+    it is loaded on the CPU with dynamic int8 quantization (see cpu_backend.py).
+
     Args:
         model_name_or_path (str): The name or path of the Llama 3 model.
         use_auth_token (Optional[str], optional): Hugging Face authentication token.
         low_cpu_mem_usage (bool): Try to use less CPU memory.
+        device (str): "cuda", "cpu" or "auto" to use a GPU when one is available.
+        cpu_quantize (bool): Use dynamic int8 quantization on the CPU (float32 otherwise).
+        num_threads (Optional[int]): CPU threads to use. Defaults to the number of cores.
 
     Returns:
         tuple: (tokenizer, model)
             - tokenizer: The tokenizer for the Llama 3 model.
             - model: The Llama 3 model. Returns None if there's an error.
     """
+    if device == "auto":
+        device = detect_device()
+
     try:
+        if device == "cpu":
+            return load_cpu_model_and_tokenizer(
+                model_name_or_path,
+                use_auth_token=use_auth_token,
+                quantize=cpu_quantize,
+                num_threads=num_threads,
+                low_cpu_mem_usage=low_cpu_mem_usage,
+            )
+
         # Clear GPU memory cache
         torch.cuda.empty_cache()
 
@@ -77,6 +101,7 @@ def generate_stream(
     repetition_penalty: float = 1.1,
     do_sample: bool = True,
     eos_token_ids: Optional[List[int]] = None,
+    prefix_cache: Optional[PrefixCache] = None,
 ):
     """
     Generates text using the Llama 3 model with streaming output.
@@ -92,12 +117,15 @@ def generate_stream(
         repetition_penalty (float, optional): Repetition penalty.
         do_sample (bool, optional): Whether to use sampling.
         eos_token_ids (Optional[List[int]]): List of end-of-sequence token ids.
+        prefix_cache (Optional[PrefixCache]): Session cache of prompt key/values. When the
+            prompt starts with a prefix seen in an earlier prompt, its cached key/values are
+            reused and only the rest of the prompt is prefilled.
 
     Yields:
         str: The generated text, streamed token by token.
     """
-    # Determine device for inputs (use GPU if available, else CPU)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    # Put the inputs on the device of the model's input embeddings (GPU or CPU)
+    device = model.get_input_embeddings().weight.device
     
     # Tokenize the prompt and move to the appropriate device
     inputs = tokenizer(prompt, return_tensors="pt").to(device)
@@ -124,13 +152,40 @@ def generate_stream(
     if eos_token_ids is not None:
         generation_kwargs["eos_token_id"] = eos_token_ids
 
+    prompt_token_ids = input_ids[0].tolist()
+    if prefix_cache is not None:
+        past_key_values, cached_tokens = prefix_cache.lookup(prompt_token_ids)
+        if past_key_values is not None:
+            generation_kwargs["past_key_values"] = past_key_values
+        # Needed to get the key/values of this prompt back from generate()
+        generation_kwargs["return_dict_in_generate"] = True
+        print(f"[prefix cache] reusing {cached_tokens} of {len(prompt_token_ids)} prompt tokens")
+
     # Run the generation with no gradient computation
+    start_time = time.perf_counter()
     with torch.no_grad():
-        _ = model.generate(**generation_kwargs)
+        outputs = model.generate(**generation_kwargs)
+
+    if prefix_cache is not None:
+        # The returned cache also holds the generated tokens, keep only the prompt part
+        prefix_cache.store(prompt_token_ids, crop_cache(outputs.past_key_values, len(prompt_token_ids)))
+        print(f"[prefix cache] generation took {time.perf_counter() - start_time:.2f}s, "
+              f"{len(prefix_cache)} prefixes cached ({prefix_cache.total_bytes / 1024 ** 2:.0f} MB)")
 
 def main():
     model_name = "meta-llama/Llama-3.1-8B"
 
+    # Session mode: the key/values of earlier prompts are kept and reused when a new prompt
+    # starts with the same text. SESSION_PREFIX_FILE can point to a text file (e.g. a system
+    # prompt or RAG context) that is put in front of every prompt, so its prefill is done only once.
+    session_mode = True
+    prefix_cache_max_bytes = 2 * 1024 ** 3
+    session_prefix = ""
+    session_prefix_file = os.environ.get("SESSION_PREFIX_FILE")
+    if session_prefix_file:
+        with open(session_prefix_file, "r", encoding="utf-8") as f:
+            session_prefix = f.read()
+
     hf_token = os.environ.get("HF_TOKEN")
     if not hf_token:
         print("HF_TOKEN environment variable not set. Please set it and try again.")
@@ -146,14 +201,15 @@ def main():
         return
 
     # Check if the model was loaded successfully
-    print(f"Model successfully loaded with device map")
+    print(f"Model successfully loaded on {model.device}")
+    prefix_cache = PrefixCache(max_bytes=prefix_cache_max_bytes) if session_mode else None
     while True:
         prompt = input("Enter your prompt (or type 'exit' to quit): ")
         if prompt.lower() == "exit":
             break
 
         # Generate and stream the output
-        generate_stream(model, tokenizer, prompt)
+        generate_stream(model, tokenizer, session_prefix + prompt, prefix_cache=prefix_cache)
         print("\n")  # Add a newline for better readability
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+"""
+Prefix key/value cache for causal language models.
+
+Generating from a prompt starts with a "prefill" pass that computes the
+attention keys and values of every prompt token. When several prompts start
+with the same text (a shared system prompt or RAG context), that work is
+repeated for every prompt. `PrefixCache` keeps the key/value states of earlier
+prompts and hands out the longest one that matches the start of a new prompt,
+so only the new tail of the prompt has to be prefilled.
+
+Entries are evicted in least-recently-used order once their total size exceeds
+`max_bytes`.
+"""
+
+import copy
+from collections import OrderedDict
+
+
+def _cache_tensors(past_key_values):
+    """Yield every key/value tensor held by a transformers cache object or legacy tuple."""
+    if hasattr(past_key_values, "layers"):  # transformers >= 4.56
+        for layer in past_key_values.layers:
+            for tensor in (getattr(layer, "keys", None), getattr(layer, "values", None)):
+                if tensor is not None:
+                    yield tensor
+    elif hasattr(past_key_values, "key_cache"):
+        yield from past_key_values.key_cache
+        yield from past_key_values.value_cache
+    else:
+        for layer in past_key_values:
+            yield from layer
+
+
+def cache_nbytes(past_key_values):
+    """Memory used by the key/value tensors of a cache, in bytes."""
+    return sum(tensor.numel() * tensor.element_size() for tensor in _cache_tensors(past_key_values))
+
+
+def crop_cache(past_key_values, num_tokens):
+    """Return a cache that only covers the first `num_tokens` tokens (modifies cache objects in place)."""
+    if hasattr(past_key_values, "crop"):
+        # A negative value removes tokens from the end, which every transformers version understands
+        extra_tokens = past_key_values.get_seq_length() - num_tokens
+        if extra_tokens > 0:
+            past_key_values.crop(-extra_tokens)
+        return past_key_values
+    return tuple(tuple(tensor[:, :, :num_tokens] for tensor in layer) for layer in past_key_values)
+
+
+def common_prefix_length(a, b):
+    """Number of leading items that two sequences have in common."""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class PrefixCache:
+    """
+    LRU cache of prompt-prefix key/value states, bounded by memory.
+
+    Args:
+        max_bytes (int): Maximum total size of the cached key/value tensors.
+        min_prefix_tokens (int): Shorter shared prefixes are not worth reusing.
+    """
+
+    def __init__(self, max_bytes=2 * 1024 ** 3, min_prefix_tokens=16):
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # tuple of token ids -> (past_key_values, nbytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, token_ids):
+        """
+        Find the longest cached prefix of `token_ids`.
+
+        Args:
+            token_ids (List[int]): Token ids of the new prompt.
+
+        Returns:
+            tuple: (past_key_values, num_cached_tokens). past_key_values is a private
+            copy that can be passed to `model.generate`, or None on a cache miss.
+        """
+        best_key, best_length = None, 0
+        for key in self._entries:
+            length = common_prefix_length(key, token_ids)
+            if length > best_length:
+                best_key, best_length = key, length
+
+        # At least one prompt token must be left uncached, the model needs it to predict the next token
+        best_length = min(best_length, len(token_ids) - 1)
+        if best_key is None or best_length < self.min_prefix_tokens:
+            self.misses += 1
+            return None, 0
+
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        # generate() appends to the cache it is given, so never hand out the stored object itself
+        past_key_values = copy.deepcopy(self._entries[best_key][0])
+        if best_length < len(best_key):
+            past_key_values = crop_cache(past_key_values, best_length)
+        return past_key_values, best_length
+
+    def store(self, token_ids, past_key_values):
+        """
+        Cache the key/value states of a prompt.
+
+        Args:
+            token_ids (List[int]): Token ids of the prompt.
+            past_key_values: Cache covering exactly these tokens. It is kept as is,
+                so the caller must not modify it afterwards.
+        """
+        key = tuple(token_ids)
+        if len(key) < self.min_prefix_tokens:
+            return
+        nbytes = cache_nbytes(past_key_values)
+        if nbytes > self.max_bytes:
+            return
+
+        # Entries that are a prefix of the new one are covered by it and can go
+        for old_key in [k for k in self._entries if common_prefix_length(k, key) == len(k)]:
+            self._remove(old_key)
+
+        self._entries[key] = (past_key_values, nbytes)
+        self.total_bytes += nbytes
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, nbytes = self._entries.pop(key)
+        self.total_bytes -= nbytes